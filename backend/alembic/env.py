@@ -21,6 +21,9 @@ from app.models.kategori import Kategori
 from app.models.surat_masuk import SuratMasuk
 from app.models.surat_keluar import SuratKeluar
 from app.models.disposisi import Disposisi
+from app.models.ocr_job import OcrJob
+from app.models.upload_session import UploadSession
+from app.models.file_blob import FileBlob, FileBlobRef
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,36 @@
+"""add DRAFT to statussurat
+
+Revision ID: a6d3e9f20b84
+Revises: f1c8a3e5d702
+Create Date: 2026-10-17 15:04:37.118260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3e9f20b84'
+down_revision = 'f1c8a3e5d702'
+branch_labels = None
+depends_on = None
+
+OLD_STATUSES = ('BARU', 'PROSES', 'SELESAI', 'ARSIP')
+NEW_STATUSES = ('DRAFT',) + OLD_STATUSES
+
+
+def upgrade() -> None:
+    for table in ('surat_masuk', 'surat_keluar'):
+        op.alter_column(table, 'status',
+                        existing_type=sa.Enum(*OLD_STATUSES, name='statussurat'),
+                        type_=sa.Enum(*NEW_STATUSES, name='statussurat'),
+                        existing_nullable=False)
+
+
+def downgrade() -> None:
+    for table in ('surat_masuk', 'surat_keluar'):
+        op.execute(f"UPDATE {table} SET status = 'BARU' WHERE status = 'DRAFT'")
+        op.alter_column(table, 'status',
+                        existing_type=sa.Enum(*NEW_STATUSES, name='statussurat'),
+                        type_=sa.Enum(*OLD_STATUSES, name='statussurat'),
+                        existing_nullable=False)
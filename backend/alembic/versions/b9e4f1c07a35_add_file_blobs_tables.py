@@ -0,0 +1,58 @@
+"""add file_blobs and file_blob_refs tables
+
+Revision ID: b9e4f1c07a35
+Revises: a6d3e9f20b84
+Create Date: 2026-10-17 16:08:12.517349
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e4f1c07a35'
+down_revision = 'a6d3e9f20b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('file_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('file_path', sa.String(length=500), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('file_path')
+    )
+    op.create_index(op.f('ix_file_blobs_id'), 'file_blobs', ['id'], unique=False)
+    op.create_index(op.f('ix_file_blobs_sha256'), 'file_blobs', ['sha256'], unique=False)
+    op.create_index(op.f('ix_file_blobs_ref_count'), 'file_blobs', ['ref_count'], unique=False)
+    op.create_table('file_blob_refs',
+    sa.Column('blob_id', sa.Integer(), nullable=False),
+    sa.Column('record_type', sa.String(length=20), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['blob_id'], ['file_blobs.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('record_type', 'record_id', name='uq_file_blob_refs_record')
+    )
+    op.create_index(op.f('ix_file_blob_refs_id'), 'file_blob_refs', ['id'], unique=False)
+    op.create_index(op.f('ix_file_blob_refs_blob_id'), 'file_blob_refs', ['blob_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_file_blob_refs_blob_id'), table_name='file_blob_refs')
+    op.drop_index(op.f('ix_file_blob_refs_id'), table_name='file_blob_refs')
+    op.drop_table('file_blob_refs')
+    op.drop_index(op.f('ix_file_blobs_ref_count'), table_name='file_blobs')
+    op.drop_index(op.f('ix_file_blobs_sha256'), table_name='file_blobs')
+    op.drop_index(op.f('ix_file_blobs_id'), table_name='file_blobs')
+    op.drop_table('file_blobs')
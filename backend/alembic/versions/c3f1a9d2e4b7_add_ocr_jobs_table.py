@@ -0,0 +1,52 @@
+"""add ocr_jobs table
+
+Revision ID: c3f1a9d2e4b7
+Revises: bda8ff67029d
+Create Date: 2026-10-16 09:12:44.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f1a9d2e4b7'
+down_revision = 'bda8ff67029d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('ocr_jobs',
+    sa.Column('job_id', sa.String(length=36), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('method', sa.String(length=20), nullable=False),
+    sa.Column('file_path', sa.String(length=500), nullable=False),
+    sa.Column('file_type', sa.String(length=100), nullable=False),
+    sa.Column('file_size', sa.Integer(), nullable=False),
+    sa.Column('original_filename', sa.String(length=255), nullable=False),
+    sa.Column('status', sa.Enum('QUEUED', 'RUNNING', 'DONE', 'FAILED', name='statusjob'), nullable=False),
+    sa.Column('progress', sa.Integer(), nullable=False),
+    sa.Column('stage', sa.String(length=50), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ocr_jobs_id'), 'ocr_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_ocr_jobs_job_id'), 'ocr_jobs', ['job_id'], unique=True)
+    op.create_index(op.f('ix_ocr_jobs_status'), 'ocr_jobs', ['status'], unique=False)
+    op.create_index(op.f('ix_ocr_jobs_created_by'), 'ocr_jobs', ['created_by'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ocr_jobs_created_by'), table_name='ocr_jobs')
+    op.drop_index(op.f('ix_ocr_jobs_status'), table_name='ocr_jobs')
+    op.drop_index(op.f('ix_ocr_jobs_job_id'), table_name='ocr_jobs')
+    op.drop_index(op.f('ix_ocr_jobs_id'), table_name='ocr_jobs')
+    op.drop_table('ocr_jobs')
@@ -0,0 +1,24 @@
+"""add ocr_jobs.surat_id
+
+Revision ID: c5e2a7f91d46
+Revises: b9e4f1c07a35
+Create Date: 2026-10-17 19:41:06.302517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2a7f91d46'
+down_revision = 'b9e4f1c07a35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('ocr_jobs', sa.Column('surat_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('ocr_jobs', 'surat_id')
@@ -0,0 +1,26 @@
+"""add ocr_jobs.mode
+
+Revision ID: d7e2b8c41f05
+Revises: c3f1a9d2e4b7
+Create Date: 2026-10-16 11:02:18.564120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e2b8c41f05'
+down_revision = 'c3f1a9d2e4b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('ocr_jobs', sa.Column('mode', sa.String(length=20), nullable=False, server_default='detect'))
+    op.create_index(op.f('ix_ocr_jobs_file_path'), 'ocr_jobs', ['file_path'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ocr_jobs_file_path'), table_name='ocr_jobs')
+    op.drop_column('ocr_jobs', 'mode')
@@ -0,0 +1,28 @@
+"""add surat_masuk extracted_fields
+
+Revision ID: e4a9c7d2b1f3
+Revises: d7e2b8c41f05
+Create Date: 2026-10-17 08:41:05.927311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a9c7d2b1f3'
+down_revision = 'd7e2b8c41f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('surat_masuk', sa.Column('extracted_fields', sa.JSON(), nullable=True))
+    op.add_column('surat_masuk', sa.Column('extraction_version', sa.String(length=20), nullable=True))
+    op.create_index(op.f('ix_surat_masuk_extraction_version'), 'surat_masuk', ['extraction_version'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_surat_masuk_extraction_version'), table_name='surat_masuk')
+    op.drop_column('surat_masuk', 'extraction_version')
+    op.drop_column('surat_masuk', 'extracted_fields')
@@ -0,0 +1,52 @@
+"""add upload_sessions table
+
+Revision ID: f1c8a3e5d702
+Revises: e4a9c7d2b1f3
+Create Date: 2026-10-17 13:26:51.402937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c8a3e5d702'
+down_revision = 'e4a9c7d2b1f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('upload_sessions',
+    sa.Column('upload_id', sa.String(length=36), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('original_filename', sa.String(length=255), nullable=False),
+    sa.Column('upload_length', sa.BigInteger(), nullable=False),
+    sa.Column('upload_offset', sa.BigInteger(), nullable=False),
+    sa.Column('status', sa.Enum('UPLOADING', 'FINALIZED', name='statusupload'), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('file_path', sa.String(length=500), nullable=True),
+    sa.Column('file_type', sa.String(length=100), nullable=True),
+    sa.Column('file_sha256', sa.String(length=64), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_upload_sessions_id'), 'upload_sessions', ['id'], unique=False)
+    op.create_index(op.f('ix_upload_sessions_upload_id'), 'upload_sessions', ['upload_id'], unique=True)
+    op.create_index(op.f('ix_upload_sessions_status'), 'upload_sessions', ['status'], unique=False)
+    op.create_index(op.f('ix_upload_sessions_expires_at'), 'upload_sessions', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_upload_sessions_created_by'), 'upload_sessions', ['created_by'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_upload_sessions_created_by'), table_name='upload_sessions')
+    op.drop_index(op.f('ix_upload_sessions_expires_at'), table_name='upload_sessions')
+    op.drop_index(op.f('ix_upload_sessions_status'), table_name='upload_sessions')
+    op.drop_index(op.f('ix_upload_sessions_upload_id'), table_name='upload_sessions')
+    op.drop_index(op.f('ix_upload_sessions_id'), table_name='upload_sessions')
+    op.drop_table('upload_sessions')
@@ -21,6 +21,7 @@ from app.core.security import (
     get_password_hash,
 )
 from app.api.deps import get_current_user, get_current_active_admin
+from app.core.executors import cpu_executor
 
 router = APIRouter()
 
@@ -47,8 +48,8 @@ async def login(
             User.deleted_at == None
         ).first()
     
-    # Check if user exists and password is correct
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Check if user exists and password is correct (Argon2 runs in the CPU pool)
+    if not user or not await cpu_executor.run(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username/email or password",
@@ -104,7 +105,7 @@ async def change_password(
     Requires current password verification
     """
     # Verify current password
-    if not verify_password(request.current_password, current_user.hashed_password):
+    if not await cpu_executor.run(verify_password, request.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
@@ -128,7 +129,7 @@ async def change_password(
     username = current_user.username
     
     # Update password
-    current_user.hashed_password = get_password_hash(request.new_password)
+    current_user.hashed_password = await cpu_executor.run(get_password_hash, request.new_password)
     
     # Log audit trail in same transaction before commit
     from app.models.audit_log import AuditLog
@@ -189,7 +190,7 @@ async def admin_reset_password(
     target_username = target_user.username
     
     # Update password and log audit in same transaction
-    target_user.hashed_password = get_password_hash(new_password)
+    target_user.hashed_password = await cpu_executor.run(get_password_hash, new_password)
     
     from app.models.audit_log import AuditLog
     audit = AuditLog(
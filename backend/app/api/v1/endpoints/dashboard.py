@@ -64,7 +64,8 @@ def get_dashboard_stats(
     
     # Total surat masuk
     total_surat_masuk = db.query(func.count(SuratMasuk.id)).filter(
-        SuratMasuk.deleted_at == None
+        SuratMasuk.deleted_at == None,
+        SuratMasuk.status != StatusSurat.DRAFT
     ).scalar() or 0
     
     # Total surat keluar
@@ -75,6 +76,7 @@ def get_dashboard_stats(
     # Surat masuk this month
     surat_masuk_bulan_ini = db.query(func.count(SuratMasuk.id)).filter(
         SuratMasuk.deleted_at == None,
+        SuratMasuk.status != StatusSurat.DRAFT,
         SuratMasuk.created_at >= first_day_of_month
     ).scalar() or 0
     
@@ -146,6 +148,7 @@ def get_surat_by_kategori(
         model, model.kategori_id == Kategori.id
     ).filter(
         model.deleted_at == None,
+        model.status != StatusSurat.DRAFT,
         Kategori.deleted_at == None
     ).group_by(Kategori.id, Kategori.nama, Kategori.color)
     
@@ -182,6 +185,7 @@ def get_surat_by_month(
         func.count(SuratMasuk.id).label('count')
     ).filter(
         SuratMasuk.deleted_at == None,
+        SuratMasuk.status != StatusSurat.DRAFT,
         SuratMasuk.created_at >= start_date
     ).group_by('year', 'month').all()
 
@@ -220,6 +224,7 @@ def get_surat_trend(
         func.count(SuratMasuk.id).label('count')
     ).filter(
         SuratMasuk.deleted_at == None,
+        SuratMasuk.status != StatusSurat.DRAFT,
         SuratMasuk.created_at >= start_date
     ).group_by('year', 'month').all()
 
@@ -269,7 +274,8 @@ def get_recent_activity(
     
     # Recent surat masuk
     recent_masuk = db.query(SuratMasuk).filter(
-        SuratMasuk.deleted_at == None
+        SuratMasuk.deleted_at == None,
+        SuratMasuk.status != StatusSurat.DRAFT
     ).order_by(SuratMasuk.created_at.desc()).limit(limit).all()
     
     for surat in recent_masuk:
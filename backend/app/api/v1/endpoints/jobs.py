@@ -0,0 +1,80 @@
+"""
+Background Job API Endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.models.ocr_job import OcrJob, StatusJob
+from app.schemas.ocr_job import OcrJobResponse
+from app.services.file_service import file_service
+from app.tasks.detect_jobs import job_to_response
+from app.tasks.queue import job_queue
+from app.api.deps import get_current_user
+
+router = APIRouter(prefix="/jobs")
+
+
+@router.get("/{job_id}", response_model=OcrJobResponse)
+def get_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Get status/progress of a background detect job.
+    Once status is 'done', `result` holds the same payload as a
+    synchronous /detect (ocr_text, ocr_confidence, keywords, detected).
+    """
+    job = db.query(OcrJob).filter(
+        OcrJob.job_id == job_id,
+        OcrJob.deleted_at == None
+    ).first()
+    
+    if not job or (job.created_by != current_user.id and current_user.role != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    return job_to_response(job)
+
+
+@router.post("/{job_id}/retry", response_model=OcrJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def retry_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Re-queue a failed bulk job. It resumes after the last committed batch
+    and tries the letters that failed before again.
+    """
+    job = db.query(OcrJob).filter(
+        OcrJob.job_id == job_id,
+        OcrJob.deleted_at == None
+    ).first()
+    
+    if not job or (job.created_by != current_user.id and current_user.role != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    if job.mode != "bulk" or job.status != StatusJob.FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Only failed bulk jobs can be retried"
+        )
+    if not file_service.file_exists(job.file_path):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The uploaded archive is no longer available, please upload it again"
+        )
+    
+    job.status = StatusJob.QUEUED
+    job.stage = None
+    job.error = None
+    db.commit()
+    db.refresh(job)
+    job_queue.enqueue(job.job_id)
+    return job_to_response(job)
@@ -0,0 +1,38 @@
+"""
+Metrics API Endpoints
+Runtime counters for the OCR/extraction pipeline (admin only)
+"""
+from fastapi import APIRouter, Depends
+
+from app.core.executors import cpu_executor, io_executor
+from app.models.user import User
+from app.api.deps import get_current_active_admin
+from app.services.ai_cache import ai_cache
+from app.services.ai_payload import payload_stats
+from app.services.ai_resilience import ai_resilience
+from app.services.detection_service import detection_service
+from app.services.ocr_cache import ocr_cache
+from app.services.ocr_engine import page_ocr
+from app.services import tesseract_backend
+
+router = APIRouter(prefix="/metrics")
+
+
+@router.get("")
+def get_metrics(
+    admin_user: User = Depends(get_current_active_admin),
+):
+    """
+    Get pipeline metrics (Admin only)
+    Counters are per worker process and reset on restart.
+    """
+    return {
+        "ocr_cache": ocr_cache.stats(),
+        "ocr_engine": page_ocr.stats(),
+        "ocr_backend": tesseract_backend.get_backend().name,
+        "ai_cache": ai_cache.stats(),
+        "ai_payload": payload_stats.stats(),
+        "ai_resilience": ai_resilience.stats(),
+        "hybrid": detection_service.hybrid_stats(),
+        "executors": {"io": io_executor.stats(), "cpu": cpu_executor.stats()},
+    }
@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
 from app.database import get_db
-from app.models.surat_masuk import SuratMasuk
+from app.models.surat_masuk import StatusSurat, SuratMasuk
 from app.models.surat_keluar import SuratKeluar
 from app.services.export_service import ExportService
 from app.api.deps import get_current_user
@@ -29,7 +29,10 @@ def export_surat_masuk_excel(
     Export Surat Masuk to Excel
     Filter by date range and category
     """
-    query = db.query(SuratMasuk).filter(SuratMasuk.deleted_at == None)
+    query = db.query(SuratMasuk).filter(
+        SuratMasuk.deleted_at == None,
+        SuratMasuk.status != StatusSurat.DRAFT
+    )
     
     # Date filters
     if start_date:
@@ -115,7 +118,10 @@ def export_surat_masuk_pdf(
     Export Surat Masuk to PDF
     Filter by date range and category
     """
-    query = db.query(SuratMasuk).filter(SuratMasuk.deleted_at == None)
+    query = db.query(SuratMasuk).filter(
+        SuratMasuk.deleted_at == None,
+        SuratMasuk.status != StatusSurat.DRAFT
+    )
     
     # Date filters
     if start_date:
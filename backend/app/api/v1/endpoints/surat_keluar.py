@@ -2,12 +2,13 @@
 Surat Keluar API Endpoints
 """
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Response
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pathlib import Path
-import os, re
+import os
 from app.database import get_db
 from app.models.surat_keluar import SuratKeluar
 from app.schemas.surat_keluar import (
@@ -16,11 +17,13 @@ from app.schemas.surat_keluar import (
     SuratKeluarResponse,
     SuratKeluarList,
 )
+from app.services.blob_service import blob_service
 from app.services.file_service import file_service
 from app.services.ocr_service import ocr_service
-from app.services.extraction_service import extraction_service
-from app.services.ai_extraction_service import ai_extraction_service
+from app.services.detection_service import detection_service
+from app.tasks.detect_jobs import attach_enrichment, attach_fulltext, detect_upload
 from app.api.deps import get_current_user
+from app.utils.sse import sse_response
 from datetime import date, datetime
 
 router = APIRouter(prefix="/surat-keluar")
@@ -73,105 +76,76 @@ def list_surat_keluar(
 
 @router.post("/detect")
 async def detect_surat_keluar_fields(
+    response: Response,
     file: UploadFile = File(...),
     method: str = Form("regex"),
+    background: bool = Form(False),
+    header_first: bool = Form(False),
+    db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
     Step 1 of the auto-detect flow for surat keluar.
     Upload a document, run OCR, and return detected fields for review.
     Nomor surat is NOT extracted here — it is auto-generated on confirm.
+    With background=true a job is queued instead; poll GET /jobs/{job_id}.
+    With header_first=true only page 1 is OCR'd up front; the full text
+    follows from job `fulltext_job_id`. A hybrid detect waits at most
+    HYBRID_LATENCY_BUDGET_SECONDS for the AI; a later answer comes from
+    job `enrich_job_id` (ai_pending=true). Pass both ids on to confirm.
     """
-    file_path, mime_type, file_size = await file_service.save_upload_file(
+    # Save the file into temp storage
+    stored = await file_service.ingest_upload(
         file,
         file_type="surat_keluar",
         date=datetime.now().date(),
     )
+    payload, queued = await detect_upload(
+        db, "surat_keluar", stored, file.filename, method, current_user.id,
+        header_first=header_first, background=background,
+    )
+    if queued:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return payload
 
-    ocr_result = ocr_service.process_file(file_path, mime_type)
-    ocr_text = ocr_result.get("text", "")
-
-    # ── Route by detection method ──────────────────────────────
-    ai_error = None
-
-    if method == "manual" or method == "ocr_only":
-        empty = lambda: {"value": None, "detected": False}  # noqa: E731
-        detected = {
-            "penerima":      empty(),
-            "perihal":       empty(),
-            "tanggal_surat": empty(),
-            "isi_singkat":   empty(),
-        }
-    elif method == "ai":
-        if not ai_extraction_service.available:
-            ai_error = {"code": 0, "message": "OPENROUTER_API_KEY tidak dikonfigurasi di server"}
-            detected = {f: {"value": None, "detected": False} for f in
-                        ["penerima", "perihal", "tanggal_surat", "isi_singkat"]}
-        else:
-            ai_result = ai_extraction_service.extract_from_file(file_path, ocr_text)
-            ai_error  = ai_result.pop("_error", None)
-            detected = {
-                "penerima":      ai_result.get("penerima",      {"value": None, "detected": False}),
-                "perihal":       ai_result.get("perihal",       {"value": None, "detected": False}),
-                "tanggal_surat": ai_result.get("tanggal_surat", {"value": None, "detected": False}),
-                "isi_singkat":   ai_result.get("isi_singkat",   {"value": None, "detected": False}),
-            }
-    elif method == "hybrid":
-        if ai_extraction_service.available:
-            ai_result    = ai_extraction_service.extract_from_file(file_path, ocr_text)
-            ai_error     = ai_result.pop("_error", None)
-            regex_result = extraction_service.extract_all(ocr_text)
-            def _merge(key: str, regex_key: str | None = None):
-                rkey = regex_key or key
-                ai_f = ai_result.get(key,  {"value": None, "detected": False})
-                rg_f = regex_result.get(rkey, {"value": None, "detected": False})
-                return ai_f if ai_f["detected"] else rg_f
-            detected = {
-                "penerima":      _merge("penerima"),
-                "perihal":       _merge("perihal"),
-                "tanggal_surat": _merge("tanggal_surat"),
-                "isi_singkat":   _merge("isi_singkat"),
-            }
-        else:
-            extracted = extraction_service.extract_all(ocr_text)
-            penerima = extracted.get("penerima", {"value": None, "detected": False})
-            if not penerima["detected"] and ocr_text:
-                m = re.search(r"(?:Kepada\s+Yth\.?|Kepada|Yth\.)\s*[:\.]?\s*(.+?)(?:\n|$)", ocr_text, re.IGNORECASE)
-                if m:
-                    penerima = {"value": m.group(1).strip(), "detected": True}
-            detected = {
-                "penerima":      penerima,
-                "perihal":       extracted["perihal"],
-                "tanggal_surat": extracted["tanggal_surat"],
-                "isi_singkat":   extracted.get("isi_singkat", {"value": None, "detected": False}),
-            }
-    else:
-        extracted = extraction_service.extract_all(ocr_text)
-        penerima = extracted.get("penerima", {"value": None, "detected": False})
-        if not penerima["detected"] and ocr_text:
-            m = re.search(r"(?:Kepada\s+Yth\.?|Kepada|Yth\.)\s*[:\.]?\s*(.+?)(?:\n|$)", ocr_text, re.IGNORECASE)
-            if m:
-                penerima = {"value": m.group(1).strip(), "detected": True}
-        detected = {
-            "penerima":      penerima,
-            "perihal":       extracted["perihal"],
-            "tanggal_surat": extracted["tanggal_surat"],
-            "isi_singkat":   extracted.get("isi_singkat", {"value": None, "detected": False}),
-        }
 
-    response = {
+@router.post("/detect/stream")
+async def detect_surat_keluar_fields_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    method: str = Form("regex"),
+    current_user = Depends(get_current_user),
+):
+    """
+    Same as /detect, but streams progress as Server-Sent Events:
+        uploaded  {file_token, file_size, sha256, original_filename, mime_type}
+        ocr_start {pages, ocr_pages[, cached]}
+        page      {page, source, text, confidence[, escalated]}  (per page)
+        ocr_done  {ocr_text, ocr_confidence, keywords}
+        done      the /detect payload
+    Disconnecting stops OCR of the remaining pages.
+    """
+    stored = await file_service.ingest_upload(
+        file,
+        file_type="surat_keluar",
+        date=datetime.now().date(),
+    )
+    file_path, mime_type, file_size = stored.file_path, stored.mime_type, stored.file_size
+    uploaded = {
         "file_token": file_path,
         "file_size": file_size,
+        "sha256": stored.sha256,
         "original_filename": file.filename,
         "mime_type": mime_type,
-        "ocr_text": ocr_text,
-        "ocr_confidence": ocr_result.get("confidence"),
-        "keywords": ocr_result.get("keywords", []),
-        "detected": detected,
     }
-    if ai_error:
-        response["ai_error"] = ai_error
-    return response
+
+    def produce(cancel):
+        for event, data in detection_service.iter_run(
+            "surat_keluar", file_path, mime_type, method, cancel=cancel, file_hash=stored.sha256
+        ):
+            yield event, ({**uploaded, **data} if event == "done" else data)
+
+    return sse_response(request, produce, first=[("uploaded", uploaded)])
 
 
 # ─────────────────────────────────────────────────────────────
@@ -195,6 +169,9 @@ async def create_surat_keluar(
     # OCR data forwarded from detect step
     ocr_text: Optional[str] = Form(None),
     ocr_confidence: Optional[float] = Form(None),
+    # Jobs returned by detect (header-first / over-budget hybrid)
+    fulltext_job_id: Optional[str] = Form(None),
+    enrich_job_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
@@ -202,6 +179,8 @@ async def create_surat_keluar(
     Step 2 — Confirm and save surat keluar.
     Accepts file_token from /detect step (no re-upload needed).
     Nomor surat is auto-generated server-side.
+    fulltext_job_id / enrich_job_id from detect link those jobs to the
+    new record; their results are attached now or when they finish.
     """
     # Resolve file
     if file_token:
@@ -223,7 +202,8 @@ async def create_surat_keluar(
         )
         original_filename = file.filename
         if not ocr_text:
-            ocr_result = ocr_service.process_file(final_file_path, final_mime_type)
+            # Off the event loop: OCR of a multi-page scan takes seconds
+            ocr_result = await run_in_threadpool(ocr_service.process_file, final_file_path, final_mime_type)
             ocr_text = ocr_result.get("text", "") or None
             ocr_confidence = ocr_result.get("confidence") or None
     else:
@@ -260,7 +240,14 @@ async def create_surat_keluar(
     )
 
     db.add(db_surat)
+    db.flush()
+    blob_service.acquire(db, "surat_keluar", db_surat.id, final_file_path)
     db.commit()
+    # Header-first / over-budget hybrid detect: full OCR text or AI fields may be waiting
+    if file_token and fulltext_job_id:
+        attach_fulltext(db, fulltext_job_id, db_surat)
+    if file_token and enrich_job_id:
+        attach_enrichment(db, enrich_job_id, db_surat)
     db.refresh(db_surat)
     return db_surat
 
@@ -336,7 +323,7 @@ def delete_surat_keluar(
             detail="Surat not found"
         )
     
-    # Soft delete
+    # Soft delete; the row keeps its blob reference, so the file stays restorable
     db_surat.soft_delete()
     db.commit()
     
@@ -6,18 +6,25 @@ import os
 from pathlib import Path
 from datetime import datetime, date
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
 from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from app.core.config import settings
 
 from app.database import get_db
-from app.models.surat_masuk import SuratMasuk
+from app.models.surat_masuk import PrioritySurat, StatusSurat, SuratMasuk
 from app.schemas.surat_masuk import SuratMasukCreate, SuratMasukResponse, SuratMasukUpdate, SuratMasukList, OCRResult
+from app.services.blob_service import blob_service
 from app.services.file_service import file_service
 from app.services.ocr_service import ocr_service
-from app.services.extraction_service import extraction_service
-from app.services.ai_extraction_service import ai_extraction_service
+from app.services.detection_service import detection_service
+from app.tasks.detect_jobs import (
+    attach_enrichment, attach_fulltext, create_job, detect_upload, job_to_response,
+)
+from app.tasks.queue import job_queue
 from app.api.deps import get_current_user
+from app.utils.sse import sse_response
 
 
 router = APIRouter(prefix="/surat-masuk")
@@ -35,6 +42,7 @@ def list_surat_masuk(
 ):
     """
     Get list of surat masuk with filtering
+    Drafts (watch folder, awaiting review) are only listed with status=draft
     """
     query = db.query(SuratMasuk).filter(SuratMasuk.deleted_at == None)
     
@@ -52,6 +60,8 @@ def list_surat_masuk(
     
     if status:
         query = query.filter(SuratMasuk.status == status)
+    else:
+        query = query.filter(SuratMasuk.status != StatusSurat.DRAFT)
     
     # Order by newest first
     query = query.order_by(SuratMasuk.created_at.desc())
@@ -66,8 +76,12 @@ def list_surat_masuk(
 
 @router.post("/detect")
 async def detect_surat_fields(
+    response: Response,
     file: UploadFile = File(...),
     method: str = Form("regex"),
+    background: bool = Form(False),
+    header_first: bool = Form(False),
+    db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
     """
@@ -77,71 +91,135 @@ async def detect_surat_fields(
 
     Returns:
         file_token: temporary file path to use in the confirm step
+        sha256: digest of the stored file (computed while it was written)
         detected fields: nomor_surat, perihal, tanggal_surat, pengirim
         ocr_text: full extracted text
+
+    With background=true the file is stored, a job is queued and
+    202 {job_id, ...} is returned at once; poll GET /jobs/{job_id}.
+
+    With header_first=true only the first page is OCR'd before fields are
+    detected (ocr_complete=false in the response); the remaining pages are
+    OCR'd by job `fulltext_job_id`; pass it to confirm and the full text is
+    attached to the saved surat masuk.
+
+    A hybrid detect waits at most HYBRID_LATENCY_BUDGET_SECONDS for the AI
+    after OCR. If it is slower, the regex fields are returned with
+    ai_pending=true; poll job `enrich_job_id` for the AI fields. Passed to
+    confirm, it also fills blank nomor_surat / isi_singkat on the saved
+    surat masuk.
     """
     # Save the file into temp storage
-    file_path, mime_type, file_size = await file_service.save_upload_file(
+    stored = await file_service.ingest_upload(
         file,
         file_type="surat_masuk",
         date=datetime.now().date(),
     )
+    payload, queued = await detect_upload(
+        db, "surat_masuk", stored, file.filename, method, current_user.id,
+        header_first=header_first, background=background,
+    )
+    if queued:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return payload
 
-    # Run OCR — non-fatal
-    ocr_result = ocr_service.process_file(file_path, mime_type)
-    ocr_text = ocr_result.get("text", "")
-
-    # ── Route by detection method ──────────────────────────────
-    ai_error = None  # populated if AI returns an error
-
-    if method == "manual" or method == "ocr_only":
-        # No field extraction — return empty detected fields
-        empty = lambda: {"value": None, "detected": False}  # noqa: E731
-        detected = {
-            "nomor_surat":   empty(),
-            "perihal":       empty(),
-            "tanggal_surat": empty(),
-            "pengirim":      empty(),
-            "penerima":      empty(),
-            "isi_singkat":   empty(),
-        }
-    elif method == "ai":
-        if not ai_extraction_service.available:
-            ai_error = {"code": 0, "message": "OPENROUTER_API_KEY tidak dikonfigurasi di server"}
-            detected = {f: {"value": None, "detected": False} for f in
-                        ["nomor_surat", "perihal", "tanggal_surat", "pengirim", "penerima", "isi_singkat"]}
-        else:
-            detected = ai_extraction_service.extract_from_file(file_path, ocr_text)
-            ai_error = detected.pop("_error", None)  # pull error out of detected dict
-    elif method == "hybrid":
-        if ai_extraction_service.available:
-            # AI from file + fill gaps with regex
-            ai_result    = ai_extraction_service.extract_from_file(file_path, ocr_text)
-            ai_error     = ai_result.pop("_error", None)
-            regex_result = extraction_service.extract_all(ocr_text)
-            detected = {}
-            for key in ["nomor_surat", "perihal", "tanggal_surat", "pengirim", "penerima", "isi_singkat"]:
-                ai_field = ai_result.get(key, {"value": None, "detected": False})
-                detected[key] = ai_field if ai_field["detected"] else regex_result.get(key, {"value": None, "detected": False})
-        else:
-            detected = extraction_service.extract_all(ocr_text)
-    else:
-        # Default: regex
-        detected = extraction_service.extract_all(ocr_text)
 
-    response = {
+@router.post("/detect/stream")
+async def detect_surat_fields_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    method: str = Form("regex"),
+    current_user = Depends(get_current_user),
+):
+    """
+    Same as /detect, but streams progress as Server-Sent Events:
+        uploaded  {file_token, file_size, sha256, original_filename, mime_type}
+        ocr_start {pages, ocr_pages[, cached]}
+        page      {page, source, text, confidence[, escalated]}  (per page)
+        ocr_done  {ocr_text, ocr_confidence, keywords}
+        done      the /detect payload
+    Disconnecting stops OCR of the remaining pages.
+    """
+    stored = await file_service.ingest_upload(
+        file,
+        file_type="surat_masuk",
+        date=datetime.now().date(),
+    )
+    file_path, mime_type, file_size = stored.file_path, stored.mime_type, stored.file_size
+    uploaded = {
         "file_token": file_path,
         "file_size": file_size,
+        "sha256": stored.sha256,
         "original_filename": file.filename,
         "mime_type": mime_type,
-        "ocr_text": ocr_text,
-        "ocr_confidence": ocr_result.get("confidence"),
-        "keywords": ocr_result.get("keywords", []),
-        "detected": detected,
     }
-    if ai_error:
-        response["ai_error"] = ai_error
-    return response
+
+    def produce(cancel):
+        for event, data in detection_service.iter_run(
+            "surat_masuk", file_path, mime_type, method, cancel=cancel, file_hash=stored.sha256
+        ):
+            yield event, ({**uploaded, **data} if event == "done" else data)
+
+    return sse_response(request, produce, first=[("uploaded", uploaded)])
+
+
+# ─────────────────────────────────────────────────────────────
+# BULK: ZIP of scanned letters (+ optional metadata CSV)
+# ─────────────────────────────────────────────────────────────
+
+@router.post("/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def bulk_ingest_surat_masuk(
+    archive: UploadFile = File(...),
+    metadata: Optional[UploadFile] = File(None),
+    method: str = Form("regex"),
+    # Defaults for letters without these values in the CSV
+    tanggal_terima: Optional[date] = Form(None),
+    kategori_id: Optional[int] = Form(None),
+    priority: str = Form("sedang"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Register a whole box of scanned letters at once.
+    `archive` is a ZIP of PDFs/images; `metadata` an optional CSV with a
+    `filename` column and any of nomor_surat, tanggal_surat,
+    tanggal_terima, pengirim, perihal, isi_singkat, kategori_id, priority,
+    which take precedence over detected values.
+
+    Returns 202 with a job; poll GET /jobs/{job_id}. Progress moves per
+    batch of BULK_BATCH_SIZE letters and `result` holds the per-file
+    report (created / duplicate / failed, plus required fields that were
+    neither in the CSV nor detected and need review). Letters that cannot
+    be registered fail one by one; a job that fails as a whole keeps its
+    archive and is resumed with POST /jobs/{job_id}/retry.
+    """
+    if priority not in {p.value for p in PrioritySurat}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid priority: {priority}",
+        )
+    stored = await file_service.ingest_upload(
+        archive, file_type="bulk", date=datetime.now().date(),
+        max_size=settings.BULK_MAX_ARCHIVE_SIZE, allowed=[".zip"],
+    )
+    metadata_path = None
+    if metadata is not None and metadata.filename:
+        metadata_path = (await file_service.ingest_upload(
+            metadata, file_type="bulk", date=datetime.now().date(), allowed=[".csv"],
+        )).file_path
+
+    options = {
+        "metadata": metadata_path,
+        "tanggal_terima": (tanggal_terima or datetime.now().date()).isoformat(),
+        "kategori_id": kategori_id,
+        "priority": priority,
+    }
+    job = create_job(
+        db, "surat_masuk", method, stored.file_path, stored.mime_type, stored.file_size,
+        archive.filename, current_user.id, mode="bulk", result={"options": options},
+    )
+    job_queue.enqueue(job.job_id)
+    return job_to_response(job)
 
 
 # ─────────────────────────────────────────────────────────────
@@ -166,6 +244,9 @@ async def create_surat_masuk(
     # OCR data forwarded from detect step
     ocr_text: Optional[str] = Form(None),
     ocr_confidence: Optional[float] = Form(None),
+    # Jobs returned by detect (header-first / over-budget hybrid)
+    fulltext_job_id: Optional[str] = Form(None),
+    enrich_job_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user),
 ):
@@ -173,6 +254,8 @@ async def create_surat_masuk(
     Step 2 — Confirm and save the surat masuk.
     Accepts file_token from the /detect step (no re-upload needed).
     Falls back to a fresh file upload if file_token is not provided.
+    fulltext_job_id / enrich_job_id from detect link those jobs to the
+    new record; their results are attached now or when they finish.
     """
     # Resolve file — prefer the already-uploaded file_token
     if file_token:
@@ -198,7 +281,8 @@ async def create_surat_masuk(
         original_filename = file.filename
         # Run OCR on fresh upload if not forwarded
         if not ocr_text:
-            ocr_result = ocr_service.process_file(final_file_path, final_mime_type)
+            # Off the event loop: OCR of a multi-page scan takes seconds
+            ocr_result = await run_in_threadpool(ocr_service.process_file, final_file_path, final_mime_type)
             ocr_text = ocr_result.get("text", "") or None
             ocr_confidence = ocr_result.get("confidence") or None
     else:
@@ -236,7 +320,14 @@ async def create_surat_masuk(
     )
 
     db.add(db_surat)
+    db.flush()
+    blob_service.acquire(db, "surat_masuk", db_surat.id, final_file_path)
     db.commit()
+    # Header-first / over-budget hybrid detect: full OCR text or AI fields may be waiting
+    if file_token and fulltext_job_id:
+        attach_fulltext(db, fulltext_job_id, db_surat)
+    if file_token and enrich_job_id:
+        attach_enrichment(db, enrich_job_id, db_surat)
     db.refresh(db_surat)
     return db_surat
 
@@ -311,13 +402,10 @@ def delete_surat_masuk(
             detail="Surat not found"
         )
     
-    # Soft delete
+    # Soft delete; the row keeps its blob reference, so the file stays restorable
     db_surat.soft_delete()
     db.commit()
     
-    # Optionally delete file
-    # file_service.delete_file(db_surat.file_path)
-    
     return None
 
 
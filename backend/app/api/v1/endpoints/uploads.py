@@ -0,0 +1,167 @@
+"""
+Resumable Upload API Endpoints
+tus-style chunked uploads for large scans (see upload_service)
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import AsyncIterator, Dict
+
+from fastapi import APIRouter, Depends, Form, Header, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+
+from app.database import get_db
+from app.models.upload_session import StatusUpload, UploadSession
+from app.schemas.upload_session import UploadSessionCreate, UploadSessionResponse
+from app.services.upload_service import upload_service
+from app.tasks.detect_jobs import detect_upload
+from app.api.deps import get_current_user
+
+router = APIRouter(prefix="/uploads")
+
+
+def _get_owned(db: Session, upload_id: str, current_user) -> UploadSession:
+    session = upload_service.get(db, upload_id)
+    if not session or (session.created_by != current_user.id and current_user.role != "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    if session.status == StatusUpload.UPLOADING and session.expires_at < datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Upload expired"
+        )
+    return session
+
+
+def _headers(session: UploadSession) -> Dict[str, str]:
+    """tus-style state headers."""
+    return {
+        "Upload-Offset": str(session.upload_offset),
+        "Upload-Length": str(session.upload_length),
+        "Upload-Expires": format_datetime(session.expires_at.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "no-store",
+    }
+
+
+def _to_response(session: UploadSession) -> Dict:
+    return {
+        "upload_id": session.upload_id,
+        "kind": session.kind,
+        "original_filename": session.original_filename,
+        "upload_length": session.upload_length,
+        "upload_offset": session.upload_offset,
+        "status": session.status,
+        "expires_at": session.expires_at,
+        "file_token": session.file_path,
+    }
+
+
+async def _body(request: Request) -> AsyncIterator[bytes]:
+    """Request body as it arrives; a dropped connection just ends it."""
+    try:
+        async for chunk in request.stream():
+            yield chunk
+    except ClientDisconnect:
+        return
+
+
+@router.post("", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+def create_upload(
+    data: UploadSessionCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Start a resumable upload of `length` bytes (up to RESUMABLE_MAX_FILE_SIZE).
+    Then PUT the file in chunks, each with an Upload-Offset header, and
+    POST /uploads/{upload_id}/finalize once all bytes are in.
+    """
+    session = upload_service.create(db, data.kind, data.filename, data.length, current_user.id)
+    response.headers.update(_headers(session))
+    response.headers["Location"] = f"{router.prefix}/{session.upload_id}"
+    return _to_response(session)
+
+
+@router.head("/{upload_id}")
+def get_upload_offset(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Current offset (Upload-Offset header) to resume from after a dropped transfer."""
+    session = _get_owned(db, upload_id, current_user)
+    return Response(status_code=status.HTTP_200_OK, headers=_headers(session))
+
+
+@router.get("/{upload_id}", response_model=UploadSessionResponse)
+def get_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """State of a resumable upload (same information as HEAD, as JSON)."""
+    session = _get_owned(db, upload_id, current_user)
+    return _to_response(session)
+
+
+@router.put("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def put_upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Append the raw request body at Upload-Offset, which must equal the
+    current offset (409 with the right Upload-Offset otherwise). If the
+    connection drops, the bytes received so far are kept: HEAD the upload
+    and continue from the returned offset.
+    """
+    session = _get_owned(db, upload_id, current_user)
+    await upload_service.append(db, session, upload_offset, _body(request))
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_headers(session))
+
+
+@router.post("/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    response: Response,
+    method: str = Form("regex"),
+    header_first: bool = Form(False),
+    background: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """
+    Move the completed upload into storage and run the /detect flow of its
+    kind on it; the response is that of POST /surat-masuk/detect (or
+    /surat-keluar/detect), including background=true → 202 + job.
+    Safe to repeat if the response was lost: the stored file is reused and
+    OCR comes from the cache.
+    """
+    session = _get_owned(db, upload_id, current_user)
+    stored = await upload_service.finalize(db, session)
+    payload, queued = await detect_upload(
+        db, session.kind, stored, session.original_filename, method, current_user.id,
+        header_first=header_first, background=background,
+    )
+    if queued:
+        response.status_code = status.HTTP_202_ACCEPTED
+    payload["upload_id"] = session.upload_id
+    return payload
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user),
+):
+    """Abandon an upload and remove its partial file."""
+    session = _get_owned(db, upload_id, current_user)
+    await upload_service.terminate(db, session)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
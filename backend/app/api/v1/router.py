@@ -2,7 +2,7 @@
 API Router - aggregates all endpoint routers
 """
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, kategori, surat_masuk, surat_keluar, disposisi, notifications, dashboard, audit, settings, reports, users
+from app.api.v1.endpoints import auth, kategori, surat_masuk, surat_keluar, disposisi, notifications, dashboard, audit, settings, reports, users, metrics, jobs, uploads
 
 # Create main API router
 api_router = APIRouter()
@@ -19,6 +19,9 @@ api_router.include_router(audit.router, tags=["Audit Logs"])
 api_router.include_router(settings.router, tags=["Settings"])
 api_router.include_router(reports.router, tags=["Reports"])
 api_router.include_router(users.router, tags=["Users"])
+api_router.include_router(metrics.router, tags=["Metrics"])
+api_router.include_router(jobs.router, tags=["Jobs"])
+api_router.include_router(uploads.router, tags=["Uploads"])
 
 
 # TODO: Add more routers as they are created
@@ -47,21 +47,90 @@ class Settings(BaseSettings):
             return [ext.strip() for ext in v.split(',') if ext.strip()]
         return v
     
-    UPLOAD_DIR: str = "uploads"
+    UPLOAD_DIR: str = "uploads"  # Partial resumable uploads
     STORAGE_DIR: str = "storage"
     
+    # Resumable uploads (large bundled scans over unstable links)
+    RESUMABLE_MAX_FILE_SIZE: int = 200 * 1024 * 1024  # 200MB
+    RESUMABLE_UPLOAD_TTL_HOURS: int = 24  # Sessions idle this long are removed
+    RESUMABLE_CLEANUP_INTERVAL_SECONDS: int = 900
+    
     # OCR settings
     TESSERACT_CMD: str = "tesseract"  # Path to tesseract executable
     OCR_LANGUAGE: str = "ind+eng"  # Indonesian + English
     CLASSIFICATION_CONFIDENCE_THRESHOLD: float = 70.0
+    OCR_WORKERS: int = 0  # Page-parallel OCR processes (0 = CPU count)
+    OCR_MAX_PAGES_IN_FLIGHT: int = 0  # Pages queued at once (0 = 2 × workers)
+    OCR_BACKEND: str = "auto"  # auto | tesserocr (warm C API engines) | pytesseract (CLI)
+    OCR_ENGINE_POOL_SIZE: int = 2  # Warm tesserocr engines per process
+    PDF_TEXT_LAYER_MIN_CHARS: int = 50  # Below this a PDF page is treated as scanned
+    OCR_ADAPTIVE_DPI: bool = True  # OCR at base DPI, re-render low-confidence pages
+    OCR_BASE_DPI: int = 200
+    OCR_MAX_DPI: int = 300
+    OCR_PREPROCESS_MODE: str = "auto"  # auto | fast | standard | heavy
+    OCR_HEADER_PAGES: int = 1  # Pages OCR'd before detection in header-first mode
+    OCR_LAYOUT_REGIONS: bool = True  # Header-first: OCR only letterhead/addressee/signature regions
+    OCR_CACHE_ENABLED: bool = True  # Reuse OCR results for identical uploads
+    OCR_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB, LRU-evicted
 
     # OpenRouter AI extraction (optional)
     OPENROUTER_API_KEY: str = ""
     OPENROUTER_MODEL: str = "z-ai/glm-4.5-air:free"
     OPENROUTER_SITE_URL: str = "http://localhost:8000"
+    OPENROUTER_API_URL: str = "https://openrouter.ai/api/v1/chat/completions"  # openrouter_stub.py for local tests
+    AI_MAX_CONCURRENCY: int = 4  # AI calls in flight at once per worker
+    AI_MAX_CONNECTIONS: int = 10  # Pooled keep-alive connections to OpenRouter
+    AI_TIMEOUT_SECONDS: float = 60.0  # Per-call deadline, including the wait for a slot
+    AI_CONNECT_TIMEOUT: float = 10.0
+    AI_RATE_LIMIT_PER_MINUTE: float = 20.0  # Token bucket shared by all calls (0 = no limit)
+    AI_RATE_BURST: int = 5
+    AI_RETRY_ATTEMPTS: int = 3  # Retries on 429/5xx/connection errors
+    AI_RETRY_BASE_DELAY: float = 0.5  # Seconds, doubled per retry with full jitter
+    AI_RETRY_MAX_DELAY: float = 8.0
+    AI_BREAKER_FAILURES: int = 5  # Consecutive failed calls before AI is skipped
+    AI_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    AI_CACHE_ENABLED: bool = True  # Reuse AI results for identical documents
+    AI_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # 0 = never expire
+    AI_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB, LRU-evicted
+    AI_VISION_ENABLED: bool = False  # OPENROUTER_MODEL accepts images: send rendered pages instead of PDFs
+    AI_PAYLOAD_MODE: str = "auto"  # auto (first pages / downscaled / OCR text) | original (whole file)
+    AI_PAYLOAD_PAGES: int = 1  # PDF pages rendered for the model
+    AI_PAYLOAD_DPI: int = 150
+    AI_PAYLOAD_JPEG_QUALITY: int = 70
+    AI_PAYLOAD_MAX_SIDE: int = 1600  # Longest side of a downscaled image upload (px)
+    AI_PAYLOAD_TEXT_MIN_CONFIDENCE: float = 80.0  # Send OCR text instead when at least this confident
+    HYBRID_LATENCY_BUDGET_SECONDS: float = 8.0  # Hybrid /detect waits this long for AI after OCR
+    HYBRID_SKIP_AI_MIN_CONFIDENCE: float = 85.0  # Skip AI when regex found every field at this OCR confidence
     
+    # Executors for blocking work in async endpoints (see app/core/executors.py)
+    EXECUTOR_IO_WORKERS: int = 16  # Threads for file I/O
+    EXECUTOR_IO_MAX_QUEUE: int = 64  # Waiting I/O tasks before 503
+    EXECUTOR_CPU_WORKERS: int = 0  # Processes for password hashing (0 = min(4, CPU count))
+    EXECUTOR_CPU_MAX_QUEUE: int = 32  # Waiting CPU tasks before 429
+    EXECUTOR_RETRY_AFTER_SECONDS: int = 2  # Retry-After sent with 429/503
+
     # Redis settings (for caching and Celery)
     REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Background detect jobs
+    JOB_QUEUE_BACKEND: str = "inprocess"  # inprocess | celery (uses REDIS_URL)
+    JOB_WORKERS: int = 4  # Concurrent jobs for the in-process backend
+
+    # Bulk ZIP ingestion (POST /surat-masuk/bulk)
+    BULK_MAX_ARCHIVE_SIZE: int = 1024 * 1024 * 1024  # 1GB
+    BULK_MAX_FILES: int = 1000  # Letters per archive
+    BULK_BATCH_SIZE: int = 25  # Rows per insert / progress step
+    BULK_WORKERS: int = 4  # Letters OCR'd in parallel per bulk job
+
+    # Watch-folder daemon (python watch_folder.py)
+    WATCH_FOLDER_DIR: str = ""  # Shared folder the scanners write to
+    WATCH_SETTLE_SECONDS: float = 5.0  # File must stop growing this long
+    WATCH_POLL_INTERVAL: float = 2.0  # Polling fallback scan interval
+    WATCH_WORKERS: int = 2  # Scans processed in parallel
+    WATCH_METHOD: str = "regex"  # Detection method for drafts
+
+    # Content-addressed letter storage (python blob_storage.py)
+    BLOB_ORPHAN_TTL_HOURS: int = 72  # Unreferenced blobs kept this long before gc
     
     # Email settings (optional)
     SMTP_HOST: str = "smtp.gmail.com"
@@ -0,0 +1,144 @@
+"""
+Shared executors for blocking work called from async endpoints
+
+  io_executor   thread pool for file I/O (uploads, copies)
+  cpu_executor  process pool for CPU-heavy calls (Argon2 hashing), so they
+                neither block the event loop nor hold the GIL
+
+Each executor admits at most `workers + max_queue` tasks. Past that,
+run() raises an HTTPException (503 for I/O, 429 for CPU) with a
+Retry-After header at once, instead of letting requests queue until
+they time out. OCR keeps its own page pool (ocr_engine.page_ocr).
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+
+class BoundedExecutor:
+    """A thread or process pool with a hard cap on admitted tasks."""
+
+    def __init__(
+        self,
+        name: str,
+        processes: bool,
+        workers: int,
+        max_queue: int,
+        reject_status: int,
+    ):
+        self.name = name
+        self.processes = processes
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.reject_status = reject_status
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.peak = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def _new_executor(self) -> Executor:
+        if self.processes:
+            return ProcessPoolExecutor(max_workers=self.workers)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-exec")
+
+    def start(self) -> None:
+        self._current()
+
+    def _current(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            return self._executor
+
+    def _replace(self, broken: Executor) -> Executor:
+        """
+        Swap out a broken pool, once: callers that saw the same pool break
+        all get the one replacement instead of each shutting down the other's.
+        """
+        with self._lock:
+            if self._executor is broken or self._executor is None:
+                self._executor = self._new_executor()
+            else:
+                broken = None  # Already replaced by another caller
+            executor = self._executor
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+        return executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=self.reject_status,
+                    detail="Server sedang sibuk, silakan coba lagi sebentar lagi",
+                    headers={"Retry-After": str(settings.EXECUTOR_RETRY_AFTER_SECONDS)},
+                )
+            self._admitted += 1
+            self.peak = max(self.peak, self._admitted)
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the pool; raises 429/503 when saturated."""
+        self._admit()
+        try:
+            executor = self._current()  # Started here when used outside the app lifespan (scripts)
+            # partial() of a module-level function pickles, so this works for processes too
+            call = functools.partial(func, *args, **kwargs)
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(executor, call)
+            except BrokenExecutor:
+                # A worker process died (e.g. OOM-killed): replace the pool once
+                return await loop.run_in_executor(self._replace(executor), call)
+        finally:
+            with self._lock:
+                self._admitted -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "kind": "process" if self.processes else "thread",
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "in_flight": self._admitted,
+                "peak": self.peak,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+def _cpu_workers() -> int:
+    return settings.EXECUTOR_CPU_WORKERS or min(4, os.cpu_count() or 1)
+
+
+# Singletons
+io_executor = BoundedExecutor(
+    "io", processes=False,
+    workers=settings.EXECUTOR_IO_WORKERS, max_queue=settings.EXECUTOR_IO_MAX_QUEUE,
+    reject_status=status.HTTP_503_SERVICE_UNAVAILABLE,
+)
+cpu_executor = BoundedExecutor(
+    "cpu", processes=True,
+    workers=_cpu_workers(), max_queue=settings.EXECUTOR_CPU_MAX_QUEUE,
+    reject_status=status.HTTP_429_TOO_MANY_REQUESTS,
+)
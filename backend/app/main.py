@@ -2,6 +2,8 @@
 FastAPI Backend - Sistem Klasifikasi Arsip Surat
 Entry point for the application
 """
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -11,7 +13,12 @@ from app.core.config import settings
 from app.api.v1.router import api_router
 from app.database import SessionLocal, engine
 from app.models.user import User
+from app.core.executors import cpu_executor, io_executor
 from app.core.security import get_password_hash
+from app.services.ai_extraction_service import ai_extraction_service
+from app.services.ocr_engine import page_ocr
+from app.services.upload_service import upload_service
+from app.tasks.queue import job_queue
 
 
 @asynccontextmanager
@@ -52,11 +59,36 @@ async def lifespan(app: FastAPI):
         db.rollback()
     finally:
         db.close()
+
+    # Start warm OCR workers (Tesseract engines stay loaded between requests)
+    page_ocr.start()
+
+    # Pools for blocking file I/O and password hashing
+    io_executor.start()
+    cpu_executor.start()
+
+    # Pooled keep-alive client for OpenRouter calls from async endpoints
+    await ai_extraction_service.start()
+
+    # Resume detect jobs interrupted by the last shutdown
+    try:
+        job_queue.recover()
+    except Exception as e:
+        print(f"❌ Error re-queuing detect jobs: {e}")
+
+    # Remove resumable uploads abandoned past their TTL, now and periodically
+    upload_cleanup = asyncio.create_task(upload_service.run_cleanup())
     
     yield
     
     # Shutdown
     print("🛑 Application shutting down...")
+    upload_cleanup.cancel()
+    job_queue.shutdown()
+    page_ocr.shutdown()
+    await ai_extraction_service.aclose()
+    cpu_executor.shutdown()
+    io_executor.shutdown()
 
 
 # Create FastAPI app with lifespan
@@ -77,6 +109,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by resumable upload clients
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Expires"],
 )
 
 # Mount static files for file downloads
@@ -11,6 +11,9 @@ from app.models.disposisi import Disposisi, StatusDisposisi
 from app.models.notifikasi import Notifikasi, TipeNotifikasi
 from app.models.audit_log import AuditLog
 from app.models.setting import Setting, SettingType
+from app.models.ocr_job import OcrJob, StatusJob
+from app.models.upload_session import UploadSession, StatusUpload
+from app.models.file_blob import FileBlob, FileBlobRef
 
 __all__ = [
     "Base",
@@ -23,9 +26,15 @@ __all__ = [
     "Notifikasi",
     "AuditLog",
     "Setting",
+    "OcrJob",
+    "UploadSession",
+    "FileBlob",
+    "FileBlobRef",
     "StatusSurat",
     "PrioritySurat",
     "StatusDisposisi",
     "TipeNotifikasi",
     "SettingType",
+    "StatusJob",
+    "StatusUpload",
 ]
@@ -0,0 +1,53 @@
+"""
+File Blob Models
+Content-addressed letter files (one per SHA-256) and the surat rows that
+reference them (soft-deleted ones included), so a file shared by several
+records is kept as long as any of them exists
+"""
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.models.base import BaseModel
+
+
+class FileBlob(BaseModel):
+    """
+    Stored file
+    ref_count is the number of FileBlobRef rows; a blob at 0 is removed by
+    garbage collection (blob_storage.py gc) after BLOB_ORPHAN_TTL_HOURS
+    """
+    __tablename__ = "file_blobs"
+
+    # Content
+    sha256 = Column(String(64), nullable=False, index=True)
+    file_path = Column(String(500), unique=True, nullable=False)  # storage/blobs/ab/cd/<sha256><ext>
+    file_size = Column(BigInteger, nullable=False)
+
+    # Number of records using this file
+    ref_count = Column(Integer, nullable=False, default=0, index=True)
+
+    # Relationships
+    refs = relationship("FileBlobRef", back_populates="blob", lazy="dynamic")
+
+    def __repr__(self):
+        return f"<FileBlob(sha256='{self.sha256[:12]}', refs={self.ref_count})>"
+
+
+class FileBlobRef(BaseModel):
+    """
+    One record's use of a blob
+    A surat row holds at most one reference (its file_path)
+    """
+    __tablename__ = "file_blob_refs"
+    __table_args__ = (
+        UniqueConstraint("record_type", "record_id", name="uq_file_blob_refs_record"),
+    )
+
+    blob_id = Column(Integer, ForeignKey("file_blobs.id"), nullable=False, index=True)
+    record_type = Column(String(20), nullable=False)  # surat_masuk | surat_keluar
+    record_id = Column(Integer, nullable=False)
+
+    # Relationships
+    blob = relationship("FileBlob", back_populates="refs")
+
+    def __repr__(self):
+        return f"<FileBlobRef({self.record_type}#{self.record_id} -> blob {self.blob_id})>"
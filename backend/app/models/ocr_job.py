@@ -0,0 +1,59 @@
+"""
+OCR Job Model
+Tracks background OCR + field-detection jobs started from /detect,
+the full-text OCR that finishes a header-first detect, AI answers
+that arrive after a hybrid detect's latency budget, and bulk ZIP imports
+"""
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Enum, JSON
+from sqlalchemy.orm import relationship
+from app.models.base import BaseModel
+import enum
+
+
+class StatusJob(str, enum.Enum):
+    """Job status enum"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class OcrJob(BaseModel):
+    """
+    Background detect job
+    Holds the uploaded file reference, progress, and the detect result
+    """
+    __tablename__ = "ocr_jobs"
+    
+    # Public identifier returned to the client
+    job_id = Column(String(36), unique=True, nullable=False, index=True)
+    
+    # What to run
+    kind = Column(String(20), nullable=False)  # surat_masuk | surat_keluar
+    method = Column(String(20), nullable=False, default="regex")
+    mode = Column(String(20), nullable=False, default="detect")  # detect | fulltext | enrich | bulk
+    
+    # Uploaded file
+    file_path = Column(String(500), nullable=False, index=True)
+    file_type = Column(String(100), nullable=False)  # MIME type (.docx: 71 chars)
+    file_size = Column(Integer, nullable=False)
+    original_filename = Column(String(255), nullable=False)
+    
+    # Progress
+    status = Column(Enum(StatusJob), default=StatusJob.QUEUED, nullable=False, index=True)
+    progress = Column(Integer, default=0, nullable=False)  # 0-100
+    stage = Column(String(50), nullable=True)  # ocr, extraction, done
+    
+    # Outcome
+    result = Column(JSON, nullable=True)  # Detect payload once done
+    error = Column(Text, nullable=True)
+    surat_id = Column(Integer, nullable=True)  # fulltext/enrich: the `kind` row confirmed from this job
+    
+    # Metadata
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    
+    # Relationships
+    creator = relationship("User", backref="ocr_jobs")
+    
+    def __repr__(self):
+        return f"<OcrJob(job_id='{self.job_id}', kind='{self.kind}', status='{self.status}')>"
@@ -9,6 +9,7 @@ import enum
 
 class StatusSurat(str, enum.Enum):
     """Status enum for surat"""
+    DRAFT = "draft"  # Registered automatically (watch folder), awaiting review
     BARU = "baru"
     PROSES = "proses"
     SELESAI = "selesai"
@@ -53,6 +54,8 @@ class SuratMasuk(BaseModel):
     ocr_text = Column(Text, nullable=True)  # Extracted text from OCR
     ocr_confidence = Column(Float, nullable=True)  # OCR confidence score (0-100)
     keywords = Column(JSON, nullable=True)  # Extracted keywords as JSON array
+    extracted_fields = Column(JSON, nullable=True)  # Regex-detected fields from ocr_text (backfill)
+    extraction_version = Column(String(20), nullable=True, index=True)  # EXTRACTION_VERSION used
     
     # Status and Priority
     status = Column(Enum(StatusSurat), default=StatusSurat.BARU, nullable=False, index=True)
@@ -0,0 +1,51 @@
+"""
+Upload Session Model
+Tracks resumable (tus-style) uploads: how many bytes of a large scan have
+arrived so far, so an interrupted transfer continues where it stopped
+"""
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Enum
+from sqlalchemy.orm import relationship
+from app.models.base import BaseModel
+import enum
+
+
+class StatusUpload(str, enum.Enum):
+    """Upload session status enum"""
+    UPLOADING = "uploading"
+    FINALIZED = "finalized"
+
+
+class UploadSession(BaseModel):
+    """
+    Resumable upload session
+    The partial file lives in UPLOAD_DIR until the session is finalized;
+    expired or terminated sessions are soft deleted
+    """
+    __tablename__ = "upload_sessions"
+    
+    # Public identifier returned to the client
+    upload_id = Column(String(36), unique=True, nullable=False, index=True)
+    
+    # What is being uploaded
+    kind = Column(String(20), nullable=False)  # surat_masuk | surat_keluar
+    original_filename = Column(String(255), nullable=False)
+    upload_length = Column(BigInteger, nullable=False)  # Declared total size
+    upload_offset = Column(BigInteger, nullable=False, default=0)  # Bytes received
+    
+    # Progress
+    status = Column(Enum(StatusUpload), default=StatusUpload.UPLOADING, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)  # Pushed back by every chunk
+    
+    # Stored file once finalized
+    file_path = Column(String(500), nullable=True)
+    file_type = Column(String(100), nullable=True)  # MIME type
+    file_sha256 = Column(String(64), nullable=True)
+    
+    # Metadata
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    
+    # Relationships
+    creator = relationship("User", backref="upload_sessions")
+    
+    def __repr__(self):
+        return f"<UploadSession(upload_id='{self.upload_id}', offset={self.upload_offset}/{self.upload_length})>"
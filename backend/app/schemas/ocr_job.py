@@ -0,0 +1,29 @@
+"""
+OCR Job Pydantic Schemas
+"""
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+from datetime import datetime
+from app.models.ocr_job import StatusJob
+
+
+class OcrJobResponse(BaseModel):
+    """Status/result of a background detect job"""
+    job_id: str
+    kind: str
+    method: str
+    mode: str = "detect"
+    status: StatusJob
+    progress: int
+    stage: Optional[str] = None
+    file_token: str
+    file_size: int
+    original_filename: str
+    mime_type: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        use_enum_values = True
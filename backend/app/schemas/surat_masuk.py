@@ -2,7 +2,7 @@
 Surat Masuk Pydantic Schemas
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime, date
 from app.models.surat_masuk import StatusSurat, PrioritySurat
 
@@ -61,6 +61,8 @@ class SuratMasukResponse(SuratMasukBase):
     ocr_text: Optional[str] = None
     ocr_confidence: Optional[float] = None
     keywords: Optional[List[str]] = None
+    extracted_fields: Optional[Dict[str, Any]] = None
+    extraction_version: Optional[str] = None
     created_by: int
     updated_by: Optional[int] = None
     created_at: datetime
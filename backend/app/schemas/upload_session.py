@@ -0,0 +1,29 @@
+"""
+Upload Session Pydantic Schemas
+"""
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
+from datetime import datetime
+from app.models.upload_session import StatusUpload
+
+
+class UploadSessionCreate(BaseModel):
+    """Start a resumable upload"""
+    kind: Literal["surat_masuk", "surat_keluar"] = "surat_masuk"
+    filename: str = Field(..., min_length=1, max_length=255)
+    length: int = Field(..., gt=0, description="Total size of the file in bytes")
+
+
+class UploadSessionResponse(BaseModel):
+    """State of a resumable upload"""
+    upload_id: str
+    kind: str
+    original_filename: str
+    upload_length: int
+    upload_offset: int
+    status: StatusUpload
+    expires_at: datetime
+    file_token: Optional[str] = None  # Storage path once finalized
+    
+    class Config:
+        use_enum_values = True
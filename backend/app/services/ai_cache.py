@@ -0,0 +1,70 @@
+"""
+AI Result Cache
+Persistent cache for AIExtractionService.extract_from_file results, so a
+document that was already sent to OpenRouter is not sent again.
+
+Same store as the OCR cache (see ocr_cache.OCRCache), under
+{STORAGE_DIR}/cache/ai/. The key combines the file's SHA-256 with the
+model and a hash of the system prompt (AIExtractionService.fingerprint()),
+so changing either one starts a fresh set of entries. Entries expire after
+AI_CACHE_TTL_SECONDS and the store is LRU-evicted past AI_CACHE_MAX_BYTES.
+Only successful extractions are stored — errors and empty answers are
+retried on the next request.
+"""
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.ocr_cache import OCRCache
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """No API/parse error and at least one detected field."""
+    if "_error" in result:
+        return False
+    return any(isinstance(v, dict) and v.get("detected") for v in result.values())
+
+
+class AIResultCache(OCRCache):
+    """OCRCache with a TTL, storing {cached_at, result} entries."""
+
+    label = "AI"
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+    ):
+        super().__init__(
+            root=root or Path(settings.STORAGE_DIR) / "cache" / "ai",
+            max_bytes=max_bytes if max_bytes is not None else settings.AI_CACHE_MAX_BYTES,
+        )
+        self.enabled = settings.AI_CACHE_ENABLED
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.AI_CACHE_TTL_SECONDS
+        self.expired = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = super().get(key)
+        if entry is None:
+            return None
+        if self.ttl_seconds and time.time() - entry.get("cached_at", 0) > self.ttl_seconds:
+            # Stale: count it as a miss and drop it
+            self.hits -= 1
+            self.misses += 1
+            self.expired += 1
+            self._remove(key)
+            return None
+        return entry.get("result")
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        if is_cacheable(result):
+            super().put(key, {"cached_at": time.time(), "result": result})
+
+    def stats(self) -> Dict[str, object]:
+        return {**super().stats(), "expired": self.expired, "ttl_seconds": self.ttl_seconds}
+
+
+# Singleton
+ai_cache = AIResultCache()
@@ -1,24 +1,43 @@
 """
 AI-based field extraction service using OpenRouter.
 
-Sends the PDF/image file directly to OpenRouter using the official
-"file" content type (type: "file", file_data: "data:application/pdf;base64,...").
-This is exactly what the OpenRouter playground does when you upload a PDF.
+Sends the letter's first page(s) — as a trimmed PDF, or as JPEG images
+for vision models (AI_VISION_ENABLED) — a downscaled scan, or the OCR
+text, whichever is the smallest adequate payload (see ai_payload).
+AI_PAYLOAD_MODE=original sends the whole file through the OpenRouter
+"file" content type instead:
+https://openrouter.ai/docs/guides/overview/multimodal/pdfs
 
-See: https://openrouter.ai/docs/guides/overview/multimodal/pdfs
-
-Falls back to OCR text if file reading fails.
 Gracefully returns empty results on any API/parse error.
+
+Two clients share one request/response format:
+  - async (aextract_from_file / aextract): a pooled httpx.AsyncClient
+    opened and closed by the app lifespan (start / aclose). At most
+    AI_MAX_CONCURRENCY calls are in flight; each call, including the wait
+    for a slot, must finish within AI_TIMEOUT_SECONDS.
+  - sync (extract_from_file / extract): a pooled httpx.Client, for worker
+    threads, background jobs and scripts.
+Both go through ai_resilience (rate limit, retries, circuit breaker).
+Provider-side failures come back as _error codes 429/502/503/504, which
+detection treats as "fall back to regex".
 """
-import base64
+import asyncio
+import hashlib
 import json
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
-import requests
+import httpx
 
 from app.core.config import settings
+from app.services import ai_payload
+from app.services.ai_cache import ai_cache
+from app.services.ai_payload import AIPayload, build_payload, payload_stats, text_payload
+from app.services.ai_resilience import ai_resilience
+from app.services.ocr_cache import sha256_file
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +69,9 @@ Panduan ekstraksi:
 Jika field tidak ditemukan dengan jelas, berikan tebakan terbaik berdasarkan konteks. Gunakan null hanya jika benar-benar tidak ada informasi sama sekali.
 """
 
+# Part of the AI cache key: editing the prompt invalidates cached results
+PROMPT_HASH = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:16]
+
 # ─── Helpers ──────────────────────────────────────────────────────────────────
 def _empty(error: Optional[Dict] = None) -> Dict[str, Any]:
     fields = ["nomor_surat", "tanggal_surat", "pengirim", "penerima", "perihal", "isi_singkat"]
@@ -92,22 +114,67 @@ def _parse_json_from_response(content: str) -> Dict[str, Any]:
 class AIExtractionService:
     """
     Calls OpenRouter to extract fields from a letter document.
-    Sends the raw PDF/image file as base64 using OpenRouter's file API.
+    Sends a shaped payload of the letter (see ai_payload.build_payload).
     """
 
     def __init__(self):
         self.api_key: Optional[str] = getattr(settings, "OPENROUTER_API_KEY", None) or None
         self.model: str = getattr(settings, "OPENROUTER_MODEL", "z-ai/glm-4.5-air:free")
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.api_url = settings.OPENROUTER_API_URL
         self.site_url = getattr(settings, "OPENROUTER_SITE_URL", "http://localhost:8000")
         self.site_name = getattr(settings, "PROJECT_NAME", "Arsip Surat")
+        self.deadline: float = settings.AI_TIMEOUT_SECONDS
+        self._client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
 
     @property
     def available(self) -> bool:
         return bool(self.api_key)
 
-    # ── Internal HTTP call ─────────────────────────────────────────────────────
-    def _call(self, user_content, plugins: list = None) -> Dict[str, Any]:
+    # ── HTTP clients ───────────────────────────────────────────────────────────
+    def _client_options(self) -> Dict[str, Any]:
+        """Keep-alive pool shared by every call (one TLS handshake per connection)."""
+        return {
+            "limits": httpx.Limits(
+                max_connections=settings.AI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AI_MAX_CONNECTIONS,
+                keepalive_expiry=30.0,
+            ),
+            "timeout": httpx.Timeout(self.deadline, connect=settings.AI_CONNECT_TIMEOUT),
+            "headers": {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": self.site_url,
+                "X-Title": self.site_name,
+            },
+        }
+
+    def _sync_client(self) -> httpx.Client:
+        with self._client_lock:
+            if self._client is None:
+                self._client = httpx.Client(**self._client_options())
+            return self._client
+
+    async def start(self) -> None:
+        """Open the async client — called from the app lifespan."""
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(**self._client_options())
+            self._slots = asyncio.Semaphore(max(1, settings.AI_MAX_CONCURRENCY))
+
+    async def aclose(self) -> None:
+        """Close both clients and their pooled connections."""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    # ── Request / response ─────────────────────────────────────────────────────
+    def _payload(self, user_content, plugins: list = None) -> str:
         payload = {
             "model": self.model,
             "messages": [
@@ -121,22 +188,10 @@ class AIExtractionService:
         }
         if plugins:
             payload["plugins"] = plugins
+        return json.dumps(payload)
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": self.site_url,
-            "X-Title": self.site_name,
-        }
-
-        resp = requests.post(
-            self.api_url,
-            headers=headers,
-            data=json.dumps(payload),
-            timeout=60,
-        )
-
-        if not resp.ok:
+    def _parse(self, resp: httpx.Response) -> Dict[str, Any]:
+        if not resp.is_success:
             try:
                 err_body = resp.json()
                 msg = err_body.get("error", {}).get("message", resp.text[:200])
@@ -165,127 +220,266 @@ class AIExtractionService:
         raw = _parse_json_from_response(content)
         return _wrap(raw)
 
-    # ── Primary: send the raw file as base64 (PDF or image) ───────────────────
-    def extract_from_file(self, file_path: str, ocr_text: str = "") -> Dict[str, Any]:
+    # ── Calls through the resilience layer (see ai_resilience) ─────────────────
+    def _call(self, user_content, plugins: list = None) -> Dict[str, Any]:
+        """POST through the rate limiter, retries and circuit breaker (blocking)."""
+        if not ai_resilience.breaker.allow():
+            return self._circuit_error()
+        body = self._payload(user_content, plugins)
+        deadline = time.monotonic() + self.deadline
+        attempts, healthy = 0, False
+        try:
+            while True:
+                wait = ai_resilience.bucket.reserve(deadline - time.monotonic())
+                if wait is None:
+                    return self._throttled_error()
+                time.sleep(wait)
+                attempts += 1
+                try:
+                    resp = self._sync_client().post(
+                        self.api_url, content=body, timeout=self._attempt_timeout(deadline)
+                    )
+                except httpx.TransportError:
+                    delay = self._retry_delay(attempts, None, deadline)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    continue
+                delay = self._retry_delay(attempts, resp, deadline)
+                if delay is None:
+                    healthy = not ai_resilience.retry.retryable(resp.status_code)
+                    return self._parse(resp)
+                time.sleep(delay)
+        finally:
+            self._settle(attempts, healthy)
+
+    async def _acall(
+        self, user_content, plugins: list = None, deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
-        Send the actual file to OpenRouter using the official PDF/file API.
-        For PDFs:   type="file", file_data="data:application/pdf;base64,..."
-        For images: type="image_url", image_url="data:image/png;base64,..."
-
-        Falls back to OCR text if file cannot be read.
-        See: https://openrouter.ai/docs/guides/overview/multimodal/pdfs
+        Async _call(); the concurrency slot is only held while a request is on the wire.
+        A caller cancelling the call before `deadline` (e.g. a hybrid detect whose
+        regex already found everything) says nothing about the provider's health.
         """
-        if not self.available:
-            logger.warning("AI extraction skipped: OPENROUTER_API_KEY not set")
+        if self._aclient is None:
+            await self.start()  # Used outside the app lifespan (scripts)
+        if not ai_resilience.breaker.allow():
+            return self._circuit_error()
+        body = self._payload(user_content, plugins)
+        deadline = deadline or time.monotonic() + self.deadline
+        attempts, healthy, abandoned = 0, False, False
+        try:
+            while True:
+                wait = ai_resilience.bucket.reserve(deadline - time.monotonic())
+                if wait is None:
+                    return self._throttled_error()
+                await asyncio.sleep(wait)
+                attempts += 1
+                try:
+                    async with self._slots:
+                        resp = await self._aclient.post(
+                            self.api_url, content=body, timeout=self._attempt_timeout(deadline)
+                        )
+                except httpx.TransportError:
+                    delay = self._retry_delay(attempts, None, deadline)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                delay = self._retry_delay(attempts, resp, deadline)
+                if delay is None:
+                    healthy = not ai_resilience.retry.retryable(resp.status_code)
+                    return self._parse(resp)
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Near the deadline this is _arun's wait_for timing out (timers may fire a tick early)
+            abandoned = time.monotonic() < deadline - 0.1
+            raise
+        finally:
+            if abandoned:
+                ai_resilience.breaker.release()
+            else:
+                self._settle(attempts, healthy)
+
+    @staticmethod
+    def _attempt_timeout(deadline: float) -> httpx.Timeout:
+        """What is left of the call's deadline, for one attempt."""
+        return httpx.Timeout(max(0.1, deadline - time.monotonic()), connect=settings.AI_CONNECT_TIMEOUT)
+
+    @staticmethod
+    def _retry_delay(attempts: int, resp: Optional[httpx.Response], deadline: float) -> Optional[float]:
+        """Backoff before the next attempt, or None when the call should not be retried."""
+        policy = ai_resilience.retry
+        if attempts > policy.attempts:
+            return None
+        if resp is not None and not policy.retryable(resp.status_code):
+            return None
+        delay = policy.delay(attempts - 1, resp.headers.get("Retry-After") if resp is not None else None)
+        if time.monotonic() + delay >= deadline:
+            return None
+        logger.warning(
+            "AI: %s, retry %d/%d in %.1fs",
+            f"HTTP {resp.status_code}" if resp is not None else "connection error",
+            attempts, policy.attempts, delay,
+        )
+        return delay
+
+    @staticmethod
+    def _settle(attempts: int, healthy: bool) -> None:
+        """Feed the outcome of a call to the breaker and counters."""
+        breaker = ai_resilience.breaker
+        if attempts == 0:
+            breaker.release()  # Never reached the provider
+            return
+        if healthy:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        ai_resilience.count(attempts, healthy)
+
+    def _timeout_error(self) -> Dict[str, Any]:
+        return _error(504, f"AI tidak merespons dalam {self.deadline:g} detik")
+
+    @staticmethod
+    def _circuit_error() -> Dict[str, Any]:
+        wait = ai_resilience.breaker.retry_after()
+        return _error(503, f"Layanan AI sedang bermasalah, dicoba lagi dalam {wait:.0f} detik")
+
+    @staticmethod
+    def _throttled_error() -> Dict[str, Any]:
+        return _error(429, "Batas permintaan AI tercapai, coba beberapa saat lagi")
+
+    def _run(self, payload: Optional[AIPayload], shape_ms: float = 0.0) -> Dict[str, Any]:
+        if payload is None:
             return _empty()
-
-        path = Path(file_path)
-        user_content = None
-        plugins = None
-
+        started = time.perf_counter()
         try:
-            file_bytes = path.read_bytes()
-            suffix = path.suffix.lower()
-            b64 = base64.b64encode(file_bytes).decode("utf-8")
-
-            if suffix == ".pdf":
-                # Use OpenRouter PDF file API
-                # engine: "pdf-text" is free, "mistral-ocr" gives better results
-                # for scanned documents ($2/1000 pages)
-                data_url = f"data:application/pdf;base64,{b64}"
-                user_content = [
-                    {
-                        "type": "text",
-                        "text": (
-                            "Ekstrak informasi dari surat berikut.\n"
-                            "Kembalikan HANYA JSON, tidak ada teks lain."
-                        ),
-                    },
-                    {
-                        "type": "file",
-                        "file": {
-                            "filename": path.name,
-                            "file_data": data_url,
-                        },
-                    },
-                ]
-                # Use mistral-ocr for scanned PDFs (like police letters),
-                # fall back to pdf-text (free) if not available
-                plugins = [
-                    {
-                        "id": "file-parser",
-                        "pdf": {"engine": "mistral-ocr"},
-                    }
-                ]
-                logger.info("AI extraction: sending PDF via file API (%d KB)", len(file_bytes) // 1024)
-
-            elif suffix in {".jpg", ".jpeg", ".png", ".webp", ".gif"}:
-                # Use image_url for image files
-                mime_map = {
-                    ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
-                    ".png": "image/png", ".webp": "image/webp", ".gif": "image/gif",
-                }
-                mime = mime_map.get(suffix, "image/png")
-                user_content = [
-                    {
-                        "type": "text",
-                        "text": (
-                            "Ekstrak informasi dari gambar surat berikut.\n"
-                            "Kembalikan HANYA JSON, tidak ada teks lain."
-                        ),
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:{mime};base64,{b64}"},
-                    },
-                ]
-                logger.info("AI extraction: sending image via image_url (%d KB)", len(file_bytes) // 1024)
-
+            return self._call(payload.user_content, payload.plugins)
+        except httpx.TimeoutException:
+            return self._timeout_error()
+        except httpx.TransportError as exc:
+            return _error(502, f"Gagal menghubungi layanan AI: {exc}")
         except Exception as exc:
-            logger.error("AI: failed to read file %s: %s", file_path, exc)
-
-        # Fallback to OCR text if file reading failed
-        if user_content is None:
-            if not ocr_text.strip():
-                logger.warning("AI: no file and no OCR text — skipping")
-                return _empty()
-            logger.info("AI: falling back to OCR text")
-            user_content = (
-                "Ekstrak informasi dari teks OCR surat berikut:\n\n"
-                f"---\n{ocr_text[:6000]}\n---\n\n"
-                "Kembalikan HANYA JSON, tidak ada teks lain."
-            )
-            plugins = None
+            logger.error("AI extraction error: %s", exc)
+        finally:
+            self._record(payload, shape_ms, started)
+        return _empty()
 
+    async def _arun(self, payload: Optional[AIPayload], shape_ms: float = 0.0) -> Dict[str, Any]:
+        if payload is None:
+            return _empty()
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.deadline
         try:
-            return self._call(user_content, plugins=plugins)
-        except requests.exceptions.Timeout:
-            logger.error("AI extraction timeout (60s)")
+            # The deadline also covers waiting for a free concurrency slot
+            return await asyncio.wait_for(
+                self._acall(payload.user_content, payload.plugins, deadline), timeout=self.deadline
+            )
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            return self._timeout_error()
+        except httpx.TransportError as exc:
+            return _error(502, f"Gagal menghubungi layanan AI: {exc}")
         except Exception as exc:
             logger.error("AI extraction error: %s", exc)
+        finally:
+            self._record(payload, shape_ms, started)
         return _empty()
 
-    # ── Text-only fallback ────────────────────────────────────────────────────
-    def extract(self, ocr_text: str) -> Dict[str, Any]:
-        """Text-only extraction — used when no file path is available."""
+    @staticmethod
+    def _record(payload: AIPayload, shape_ms: float, started: float) -> None:
+        request_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            "AI extraction: %s payload, %d KB sent, %.0f ms",
+            payload.strategy, payload.size // 1024, request_ms,
+        )
+        payload_stats.record(payload.strategy, payload.source_bytes, payload.size, shape_ms, request_ms)
+
+    @staticmethod
+    def _shape(file_path: str, ocr_text: str, ocr_confidence: Optional[float]) -> Tuple[Optional[AIPayload], float]:
+        started = time.perf_counter()
+        payload = build_payload(file_path, ocr_text, ocr_confidence)
+        return payload, (time.perf_counter() - started) * 1000
+
+    # ── Result cache ───────────────────────────────────────────────────────────
+    def fingerprint(self) -> str:
+        """Everything besides the file that changes the answer."""
+        return f"{self.model}:{PROMPT_HASH}:{ai_payload.fingerprint()}"
+
+    def _cache_lookup(
+        self, file_path: str, file_hash: Optional[str]
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """(cache key, cached result); the key is None when the cache is off or the file unreadable."""
+        if not ai_cache.enabled:
+            return None, None
+        try:
+            key = ai_cache.make_key(file_hash or sha256_file(file_path), self.fingerprint())
+        except OSError:
+            return None, None
+        cached = ai_cache.get(key)
+        if cached is not None:
+            logger.info("AI extraction: cache hit for %s", Path(file_path).name)
+        return key, cached
+
+    # ── Primary: send the letter itself (PDF or image) ────────────────────────
+    def extract_from_file(
+        self,
+        file_path: str,
+        ocr_text: str = "",
+        file_hash: Optional[str] = None,
+        ocr_confidence: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send the letter to OpenRouter as the smallest adequate payload —
+        first page(s) as JPEG, downscaled scan, or the OCR text when it is
+        smaller and `ocr_confidence` is high enough (see ai_payload).
+        Successful results are cached by file hash + fingerprint() (see
+        ai_cache); pass `file_hash` when the SHA-256 is already known.
+        Blocking — for worker threads and scripts; see aextract_from_file().
+        """
         if not self.available:
+            logger.warning("AI extraction skipped: OPENROUTER_API_KEY not set")
             return _empty()
-        if not ocr_text or not ocr_text.strip():
+        key, cached = self._cache_lookup(file_path, file_hash)
+        if cached is not None:
+            return cached
+        result = self._run(*self._shape(file_path, ocr_text, ocr_confidence))
+        if key:
+            ai_cache.put(key, result)
+        return result
+
+    async def aextract_from_file(
+        self,
+        file_path: str,
+        ocr_text: str = "",
+        file_hash: Optional[str] = None,
+        ocr_confidence: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """extract_from_file() on the shared async client, for async endpoints."""
+        if not self.available:
+            logger.warning("AI extraction skipped: OPENROUTER_API_KEY not set")
             return _empty()
+        # Hashing, rendering and base64-encoding would stall the event loop
+        key, cached = await asyncio.to_thread(self._cache_lookup, file_path, file_hash)
+        if cached is not None:
+            return cached
+        payload, shape_ms = await asyncio.to_thread(self._shape, file_path, ocr_text, ocr_confidence)
+        result = await self._arun(payload, shape_ms)
+        if key:
+            await asyncio.to_thread(ai_cache.put, key, result)
+        return result
 
-        user_content = (
-            "Ekstrak informasi dari teks OCR surat berikut:\n\n"
-            f"---\n{ocr_text[:6000]}\n---\n\n"
-            "Kembalikan HANYA JSON, tidak ada teks lain."
-        )
-        try:
-            return self._call(user_content)
-        except requests.exceptions.Timeout:
-            logger.error("AI extraction timeout")
-        except Exception as exc:
-            logger.error("AI extraction error: %s", exc)
-        return _empty()
+    # ── Text-only fallback ────────────────────────────────────────────────────
+    def extract(self, ocr_text: str) -> Dict[str, Any]:
+        """Text-only extraction — used when no file path is available."""
+        if not self.available or not ocr_text or not ocr_text.strip():
+            return _empty()
+        return self._run(text_payload(ocr_text))
 
+    async def aextract(self, ocr_text: str) -> Dict[str, Any]:
+        """Async form of extract()."""
+        if not self.available or not ocr_text or not ocr_text.strip():
+            return _empty()
+        return await self._arun(text_payload(ocr_text))
 
 # ─── Singleton ────────────────────────────────────────────────────────────────
 ai_extraction_service = AIExtractionService()
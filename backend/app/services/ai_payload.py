@@ -0,0 +1,293 @@
+"""
+AI Payload Shaping
+Builds the user message sent to OpenRouter for a letter, as small as the
+detection task allows. Every field sits on the first page, so instead of
+base64-encoding the whole file:
+
+  pdf_excerpt  first AI_PAYLOAD_PAGES pages cut into a new PDF, read by the
+               file-parser plugin like the whole file was
+  pdf_pages    first AI_PAYLOAD_PAGES pages rendered to grayscale JPEG at
+               AI_PAYLOAD_DPI / AI_PAYLOAD_JPEG_QUALITY
+  image        the scan downscaled to AI_PAYLOAD_MAX_SIDE px, grayscale JPEG
+               (the original file when that is already smaller)
+  text         the OCR text, when it is smaller than the file payload and
+               OCR confidence is at least AI_PAYLOAD_TEXT_MIN_CONFIDENCE
+  original     the whole file as before (AI_PAYLOAD_MODE=original, or when
+               shaping fails)
+
+Images (pdf_pages, image) are only sent when AI_VISION_ENABLED says the
+OPENROUTER_MODEL accepts them. Otherwise PDFs go out as pdf_excerpt and
+images as their OCR text, whatever its confidence (the original image,
+as before, when there is no text).
+
+payload_stats keeps bytes sent and latency per strategy for /metrics.
+"""
+import base64
+import io
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MIME = {
+    ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
+    ".png": "image/png", ".webp": "image/webp", ".gif": "image/gif",
+}
+
+STRATEGIES = ("pdf_excerpt", "pdf_pages", "image", "text", "original")
+
+PDF_PROMPT = "Ekstrak informasi dari surat berikut.\nKembalikan HANYA JSON, tidak ada teks lain."
+
+
+@dataclass
+class AIPayload:
+    user_content: Any  # str, or a list of content parts
+    plugins: Optional[list] = None
+    strategy: str = "text"
+    source_bytes: int = 0  # Size of the file this payload stands for
+
+    @property
+    def size(self) -> int:
+        """Approximate request bytes taken by the user message."""
+        if isinstance(self.user_content, str):
+            return len(self.user_content.encode("utf-8"))
+        return len(json.dumps(self.user_content))
+
+
+def fingerprint() -> str:
+    """Payload settings that change what the model sees (part of the AI cache key)."""
+    return (
+        f"{settings.AI_PAYLOAD_MODE}:{settings.AI_PAYLOAD_PAGES}:{settings.AI_PAYLOAD_DPI}:"
+        f"{settings.AI_PAYLOAD_JPEG_QUALITY}:{settings.AI_PAYLOAD_MAX_SIDE}:"
+        f"vision={settings.AI_VISION_ENABLED}"
+    )
+
+
+# ─────────────────────────────────────────────────────────────
+# Strategies
+# ─────────────────────────────────────────────────────────────
+
+def text_payload(ocr_text: str, source_bytes: int = 0) -> AIPayload:
+    content = (
+        "Ekstrak informasi dari teks OCR surat berikut:\n\n"
+        f"---\n{ocr_text[:6000]}\n---\n\n"
+        "Kembalikan HANYA JSON, tidak ada teks lain."
+    )
+    return AIPayload(content, strategy="text", source_bytes=source_bytes)
+
+
+def _image_parts(prompt: str, images: List[bytes], mime: str = "image/jpeg") -> list:
+    parts: list = [{"type": "text", "text": prompt}]
+    for data in images:
+        b64 = base64.b64encode(data).decode("utf-8")
+        parts.append({"type": "image_url", "image_url": {"url": f"data:{mime};base64,{b64}"}})
+    return parts
+
+
+def _jpeg(img) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=settings.AI_PAYLOAD_JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+def _pdf_file_payload(filename: str, pdf_bytes: bytes, strategy: str, source_bytes: int) -> AIPayload:
+    """A PDF as an OpenRouter "file" part, read by the file-parser plugin."""
+    b64 = base64.b64encode(pdf_bytes).decode("utf-8")
+    user_content = [
+        {"type": "text", "text": PDF_PROMPT},
+        {
+            "type": "file",
+            "file": {
+                "filename": filename,
+                "file_data": f"data:application/pdf;base64,{b64}",
+            },
+        },
+    ]
+    # engine: "pdf-text" is free, "mistral-ocr" gives better results
+    # for scanned documents ($2/1000 pages)
+    plugins = [{"id": "file-parser", "pdf": {"engine": "mistral-ocr"}}]
+    return AIPayload(user_content, plugins, strategy, source_bytes)
+
+
+def original_payload(path: Path) -> Optional[AIPayload]:
+    """
+    The whole file, base64-encoded.
+    For PDFs:   type="file", file_data="data:application/pdf;base64,..."
+    For images: type="image_url", image_url="data:image/png;base64,..."
+    See: https://openrouter.ai/docs/guides/overview/multimodal/pdfs
+    """
+    file_bytes = path.read_bytes()
+    suffix = path.suffix.lower()
+
+    if suffix == ".pdf":
+        return _pdf_file_payload(path.name, file_bytes, "original", len(file_bytes))
+
+    if suffix in IMAGE_MIME:
+        user_content = _image_parts(
+            "Ekstrak informasi dari gambar surat berikut.\n"
+            "Kembalikan HANYA JSON, tidak ada teks lain.",
+            [file_bytes],
+            IMAGE_MIME[suffix],
+        )
+        return AIPayload(user_content, None, "original", len(file_bytes))
+    return None
+
+
+def pdf_excerpt_payload(path: Path) -> AIPayload:
+    """First page(s) copied into a new PDF for the file-parser plugin (text-only models)."""
+    import fitz  # PyMuPDF
+
+    original_size = path.stat().st_size
+    with fitz.open(path) as pdf:
+        pages = min(max(1, settings.AI_PAYLOAD_PAGES), pdf.page_count)
+        if pages >= pdf.page_count:
+            return original_payload(path)
+        with fitz.open() as excerpt:
+            excerpt.insert_pdf(pdf, from_page=0, to_page=pages - 1)
+            data = excerpt.tobytes(garbage=3, deflate=True)
+    if len(data) >= original_size:
+        return original_payload(path)
+    return _pdf_file_payload(path.name, data, "pdf_excerpt", original_size)
+
+
+def pdf_pages_payload(path: Path) -> AIPayload:
+    """First page(s) rendered to grayscale JPEG, for vision models (AI_VISION_ENABLED)."""
+    import fitz  # PyMuPDF
+    from PIL import Image
+
+    images = []
+    with fitz.open(path) as pdf:
+        for i in range(min(max(1, settings.AI_PAYLOAD_PAGES), pdf.page_count)):
+            pix = pdf[i].get_pixmap(dpi=settings.AI_PAYLOAD_DPI, colorspace=fitz.csGRAY)
+            images.append(_jpeg(Image.frombytes("L", (pix.width, pix.height), pix.samples)))
+    user_content = _image_parts(
+        "Ekstrak informasi dari halaman pertama surat berikut.\n"
+        "Kembalikan HANYA JSON, tidak ada teks lain.",
+        images,
+    )
+    return AIPayload(user_content, None, "pdf_pages", path.stat().st_size)
+
+
+def image_payload(path: Path) -> AIPayload:
+    """The scan downscaled and re-encoded; the original if that is already smaller."""
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as img:
+        img = ImageOps.exif_transpose(img).convert("L")
+        side = settings.AI_PAYLOAD_MAX_SIDE
+        img.thumbnail((side, side), Image.LANCZOS)
+        data = _jpeg(img)
+
+    original_size = path.stat().st_size
+    if original_size <= len(data):
+        return original_payload(path)
+    user_content = _image_parts(
+        "Ekstrak informasi dari gambar surat berikut.\n"
+        "Kembalikan HANYA JSON, tidak ada teks lain.",
+        [data],
+    )
+    return AIPayload(user_content, None, "image", original_size)
+
+
+def build_payload(
+    file_path: str, ocr_text: str = "", ocr_confidence: Optional[float] = None
+) -> Optional[AIPayload]:
+    """
+    Smallest adequate payload for a letter, see the module docstring.
+    None when there is neither a readable file nor OCR text.
+    """
+    path = Path(file_path)
+    suffix = path.suffix.lower()
+    file_payload = None
+    try:
+        if settings.AI_PAYLOAD_MODE == "original":
+            file_payload = original_payload(path)
+        elif suffix == ".pdf" and settings.AI_VISION_ENABLED:
+            file_payload = pdf_pages_payload(path)
+        elif suffix == ".pdf":
+            file_payload = pdf_excerpt_payload(path)
+        elif suffix in IMAGE_MIME and settings.AI_VISION_ENABLED:
+            file_payload = image_payload(path)
+        elif suffix in IMAGE_MIME:
+            file_payload = original_payload(path)
+    except Exception as exc:
+        logger.warning("AI payload: shaping %s failed (%s) — sending the original", path.name, exc)
+        try:
+            file_payload = original_payload(path)
+        except Exception as exc:
+            logger.error("AI: failed to read file %s: %s", file_path, exc)
+
+    text = None
+    if ocr_text and ocr_text.strip():
+        text = text_payload(ocr_text, file_payload.source_bytes if file_payload else 0)
+
+    if file_payload is None:
+        if text is None:
+            logger.warning("AI: no file and no OCR text — skipping")
+        return text
+
+    if text is not None and suffix in IMAGE_MIME and not settings.AI_VISION_ENABLED:
+        return text  # A text-only model cannot read the image
+    confident = (
+        ocr_confidence is not None and ocr_confidence >= settings.AI_PAYLOAD_TEXT_MIN_CONFIDENCE
+    )
+    if text is not None and confident and text.size < file_payload.size:
+        return text
+    return file_payload
+
+
+# ─────────────────────────────────────────────────────────────
+# Metrics
+# ─────────────────────────────────────────────────────────────
+
+class PayloadStats:
+    """Bytes sent and latency per payload strategy (per process, reset on restart)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, float]] = {}
+
+    def record(
+        self, strategy: str, source_bytes: int, sent_bytes: int, shape_ms: float, request_ms: float
+    ) -> None:
+        with self._lock:
+            row = self._data.setdefault(strategy, {
+                "requests": 0, "source_bytes": 0, "bytes_sent": 0,
+                "shape_ms": 0.0, "request_ms": 0.0, "max_request_ms": 0.0,
+            })
+            row["requests"] += 1
+            row["source_bytes"] += source_bytes
+            row["bytes_sent"] += sent_bytes
+            row["shape_ms"] += shape_ms
+            row["request_ms"] += request_ms
+            row["max_request_ms"] = max(row["max_request_ms"], request_ms)
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            out = {}
+            for strategy, row in self._data.items():
+                n = row["requests"]
+                out[strategy] = {
+                    "requests": n,
+                    "bytes_sent": row["bytes_sent"],
+                    "avg_bytes_sent": round(row["bytes_sent"] / n),
+                    # Share of the original file size saved by shaping
+                    "reduction": (
+                        round(1 - row["bytes_sent"] / row["source_bytes"], 4)
+                        if row["source_bytes"] else None
+                    ),
+                    "avg_shape_ms": round(row["shape_ms"] / n, 2),
+                    "avg_request_ms": round(row["request_ms"] / n, 2),
+                    "max_request_ms": round(row["max_request_ms"], 2),
+                }
+            return out
+
+
+# Singleton
+payload_stats = PayloadStats()
@@ -0,0 +1,197 @@
+"""
+AI Resilience
+Guards around OpenRouter calls, shared by every request in the process
+(sync and async callers alike):
+
+  TokenBucket     AI_RATE_LIMIT_PER_MINUTE with bursts of AI_RATE_BURST;
+                  callers wait for a token (up to their deadline)
+  RetryPolicy     up to AI_RETRY_ATTEMPTS retries on 429/5xx/timeouts with
+                  full-jitter exponential backoff, honouring Retry-After
+  CircuitBreaker  after AI_BREAKER_FAILURES consecutive failed calls the
+                  circuit opens for AI_BREAKER_COOLDOWN_SECONDS and calls
+                  fail fast (detection falls back to regex); one trial call
+                  is let through afterwards to close it again
+
+Limits are per worker process, like the other counters in /metrics.
+"""
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Thread-safe token bucket; reserve() returns how long to wait for the token."""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.rejected = 0
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Take a token, possibly in the future. Returns the seconds to sleep
+        before using it, or None when that would exceed `max_wait` (no token
+        is taken then).
+        """
+        if self.rate <= 0:
+            return 0.0  # Limiter disabled
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > max_wait:
+                self.rejected += 1
+                return None
+            self._tokens -= 1  # May go negative: later callers queue behind this one
+            if wait:
+                self.waits += 1
+            return wait
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "rate_per_minute": round(self.rate * 60, 2),
+                "burst": self.capacity,
+                "tokens": round(max(self._tokens, 0.0), 2),
+                "waits": self.waits,
+                "rejected": self.rejected,
+            }
+
+
+class RetryPolicy:
+    """Which failures to retry and how long to back off."""
+
+    def __init__(self, attempts: int, base_delay: float, max_delay: float):
+        self.attempts = max(0, attempts)  # Retries after the first call
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    @staticmethod
+    def retryable(status_code: int) -> bool:
+        return status_code in RETRYABLE_STATUS
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff; a Retry-After header (seconds) sets the floor."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.max_delay))
+            except ValueError:
+                pass  # HTTP-date form: ignore
+        return delay
+
+
+class CircuitBreaker:
+    """closed → open after N consecutive failures → half_open after the cooldown → closed on success."""
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self.opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True  # One trial call at a time
+                return True
+            self.short_circuited += 1
+            return False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+
+    def release(self) -> None:
+        """An allowed call never reached the provider: free the trial slot, keep the state."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "short_circuited": self.short_circuited,
+            }
+
+
+class AIResilience:
+    """The limiter, retry policy and breaker used by AIExtractionService."""
+
+    def __init__(self):
+        self.bucket = TokenBucket(settings.AI_RATE_LIMIT_PER_MINUTE, settings.AI_RATE_BURST)
+        self.retry = RetryPolicy(
+            settings.AI_RETRY_ATTEMPTS, settings.AI_RETRY_BASE_DELAY, settings.AI_RETRY_MAX_DELAY
+        )
+        self.breaker = CircuitBreaker(settings.AI_BREAKER_FAILURES, settings.AI_BREAKER_COOLDOWN_SECONDS)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+
+    def count(self, attempts: int, ok: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.attempts += attempts
+            self.retry.retries += max(0, attempts - 1)
+            if not ok:
+                self.failures += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            calls = {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retry.retries,
+                "failures": self.failures,
+            }
+        return {**calls, "rate_limit": self.bucket.stats(), "circuit": self.breaker.stats()}
+
+
+# Singleton
+ai_resilience = AIResilience()
@@ -0,0 +1,159 @@
+"""
+Blob Service
+Reference counting for the content-addressed letter files (see file_service):
+
+  acquire          a surat row uses the blob at its file_path   (ref_count + 1)
+  collect_garbage  remove blobs no row references any more
+
+acquire only stages changes in the caller's session, so a reference is
+committed together with its record. Surat rows are only ever soft-deleted
+and keep their reference, since the row still exists and points at the
+file; a purge of deleted rows would have to drop their file_blob_refs too.
+
+A blob at 0 references is not removed right away: a detected but not yet
+confirmed upload (file_token) points at it without a reference, so garbage
+collection waits BLOB_ORPHAN_TTL_HOURS after the blob was last stored.
+"""
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.file_blob import FileBlob, FileBlobRef
+from app.services.file_service import BLOB_DIRNAME, file_service
+
+logger = logging.getLogger(__name__)
+
+GC_CHUNK_SIZE = 500  # Blobs looked up per query
+
+
+def _unlink(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class BlobService:
+    """file_blobs / file_blob_refs bookkeeping."""
+
+    @property
+    def blob_dir(self) -> Path:
+        return Path(settings.STORAGE_DIR) / BLOB_DIRNAME
+
+    def _get_or_create(self, db: Session, file_path: str, sha256: str) -> FileBlob:
+        blob = db.query(FileBlob).filter(FileBlob.file_path == file_path).first()
+        if blob is not None:
+            return blob
+        try:
+            with db.begin_nested():  # Savepoint: another worker may register the same blob
+                blob = FileBlob(
+                    sha256=sha256, file_path=file_path,
+                    file_size=Path(file_path).stat().st_size, ref_count=0,
+                )
+                db.add(blob)
+        except IntegrityError:
+            blob = db.query(FileBlob).filter(FileBlob.file_path == file_path).one()
+        return blob
+
+    def _add(self, db: Session, blob_id: int, delta: int) -> None:
+        # Computed in SQL so concurrent acquires never lose an update
+        db.query(FileBlob).filter(FileBlob.id == blob_id).update(
+            {FileBlob.ref_count: FileBlob.ref_count + delta}, synchronize_session=False
+        )
+
+    def acquire(self, db: Session, kind: str, record_id: int, file_path: str) -> Optional[FileBlob]:
+        """
+        Record that surat `kind` #record_id uses the file at `file_path`
+        (moving its reference if it pointed at another blob). Does not commit.
+        Returns None for a file still in the legacy layout.
+        """
+        sha256 = file_service.blob_sha256(file_path)
+        if sha256 is None:
+            return None
+        blob = self._get_or_create(db, file_path, sha256)
+        ref = db.query(FileBlobRef).filter(
+            FileBlobRef.record_type == kind, FileBlobRef.record_id == record_id
+        ).first()
+        if ref is None:
+            db.add(FileBlobRef(blob_id=blob.id, record_type=kind, record_id=record_id))
+        elif ref.blob_id == blob.id:
+            return blob
+        else:
+            self._add(db, ref.blob_id, -1)
+            ref.blob_id = blob.id
+        self._add(db, blob.id, 1)
+        return blob
+
+    # ─────────────────────────────────────────────────────────────
+    # Garbage collection
+    # ─────────────────────────────────────────────────────────────
+
+    def collect_garbage(self, min_age_hours: Optional[float] = None, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Remove blobs without references that were last stored more than
+        `min_age_hours` (BLOB_ORPHAN_TTL_HOURS) ago, their file_blobs rows,
+        and staging files left by interrupted uploads. Blocking.
+        Returns {"scanned", "removed", "bytes"}.
+        """
+        hours = settings.BLOB_ORPHAN_TTL_HOURS if min_age_hours is None else min_age_hours
+        cutoff = time.time() - hours * 3600
+        stats = {"scanned": 0, "removed": 0, "bytes": 0}
+
+        candidates: List[Tuple[Path, int]] = []
+        for path in self.blob_dir.glob("??/??/*"):
+            if file_service.blob_sha256(str(path)) is None:
+                continue
+            stat = path.stat()
+            stats["scanned"] += 1
+            if stat.st_mtime < cutoff:
+                candidates.append((path, stat.st_size))
+
+        db = SessionLocal()
+        try:
+            for start in range(0, len(candidates), GC_CHUNK_SIZE):
+                chunk = candidates[start:start + GC_CHUNK_SIZE]
+                shas = {path.stem for path, _ in chunk}
+                referenced = {
+                    Path(file_path).name
+                    for (file_path,) in db.query(FileBlob.file_path).filter(
+                        FileBlob.sha256.in_(shas), FileBlob.ref_count > 0
+                    )
+                }
+                removed = set()
+                for path, size in chunk:
+                    # Stored again since the scan: it has a new grace period
+                    if path.name in referenced or not path.exists() or path.stat().st_mtime >= cutoff:
+                        continue
+                    if not dry_run:
+                        _unlink(path)
+                    removed.add(path.stem)
+                    stats["removed"] += 1
+                    stats["bytes"] += size
+                if removed and not dry_run:
+                    db.query(FileBlob).filter(
+                        FileBlob.sha256.in_(removed), FileBlob.ref_count <= 0
+                    ).delete(synchronize_session=False)
+                    db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for path in (self.blob_dir / "tmp").glob("*"):
+            if path.stat().st_mtime < cutoff and not dry_run:
+                _unlink(path)
+
+        if stats["removed"]:
+            logger.info("Removed %d unreferenced blob(s), %d bytes", stats["removed"], stats["bytes"])
+        return stats
+
+
+# Singleton
+blob_service = BlobService()
@@ -0,0 +1,382 @@
+"""
+Detection Service
+The OCR + field-detection step behind /surat-masuk/detect and
+/surat-keluar/detect, shared by the endpoints and the background jobs.
+"""
+import asyncio
+import re
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.ocr_service import ocr_service
+from app.services.extraction_service import extraction_service
+from app.services.ai_extraction_service import ai_extraction_service
+from app.services.ai_resilience import RETRYABLE_STATUS
+
+# Fields returned in `detected` for each kind of letter
+DETECT_FIELDS: Dict[str, List[str]] = {
+    "surat_masuk": ["nomor_surat", "perihal", "tanggal_surat", "pengirim", "penerima", "isi_singkat"],
+    # Nomor surat keluar is auto-generated on confirm, never detected
+    "surat_keluar": ["penerima", "perihal", "tanggal_surat", "isi_singkat"],
+}
+
+DETECT_METHODS = ("regex", "ai", "hybrid", "ocr_only", "manual")
+
+ProgressCallback = Callable[[int, str], None]
+
+# Surat keluar fallback when the "Kepada Yth." block was not found
+PENERIMA_LINE = re.compile(r"(?:Kepada\s+Yth\.?|Kepada|Yth\.)\s*[:\.]?\s*(.+?)(?:\n|$)", re.IGNORECASE)
+
+# Page keys forwarded in streamed "page" events (boxes are dropped)
+PAGE_EVENT_KEYS = ("page", "source", "text", "confidence", "escalated")
+
+
+def _empty_field() -> Dict[str, Any]:
+    return {"value": None, "detected": False}
+
+
+def _ocr_payload(
+    ocr_result: Dict[str, Any], max_pages: Optional[int]
+) -> Tuple[Dict[str, Any], Optional[Dict[str, str]]]:
+    """OCR part of the detect payload, plus the first page's layout blocks."""
+    ocr_payload = {
+        "ocr_text": ocr_result.get("text", ""),
+        "ocr_confidence": ocr_result.get("confidence"),
+        "keywords": ocr_result.get("keywords", []),
+    }
+    if max_pages:
+        ocr_payload["ocr_complete"] = ocr_result.get("complete", True)
+    pages = ocr_result.get("pages") or []
+    return ocr_payload, (pages[0].get("blocks") if pages else None)
+
+
+def _detect_payload(
+    ocr_payload: Dict[str, Any], detected: Dict[str, Any], ai_error: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    result = {**ocr_payload, "detected": detected}
+    if ai_error:
+        result["ai_error"] = ai_error
+    return result
+
+
+class DetectionService:
+    """Runs OCR on a stored file and detects letter fields by the chosen method."""
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, int] = {"runs": 0, "ai_skipped": 0, "ai_in_budget": 0, "ai_deferred": 0}
+
+    @staticmethod
+    def _wants_ai(method: str) -> bool:
+        return method in ("ai", "hybrid") and ai_extraction_service.available
+
+    def detect_fields(
+        self,
+        kind: str,
+        file_path: str,
+        ocr_text: str,
+        method: str,
+        blocks: Optional[Dict[str, str]] = None,
+        ocr_confidence: Optional[float] = None,
+        file_hash: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Route by detection method.
+        `blocks` are layout regions from header-first OCR; regex extraction
+        then runs per region instead of over the whole text. A confident
+        `ocr_confidence` lets the AI call send the OCR text instead of images.
+        `file_hash` (SHA-256 taken during upload) saves the AI cache a re-read.
+        Returns (detected, ai_error); ai_error is None unless the AI call failed.
+        """
+        regex_result = None
+        if method == "hybrid" and self._wants_ai(method):
+            # No latency budget here (jobs, SSE): only the skip applies
+            self._count("runs")
+            regex_result = self.detect_regex(kind, ocr_text, blocks)
+            if self._regex_confident(regex_result, ocr_confidence):
+                self._count("ai_skipped")
+                return regex_result, None
+        ai_result = None
+        if self._wants_ai(method):
+            ai_result = ai_extraction_service.extract_from_file(
+                file_path, ocr_text, file_hash=file_hash, ocr_confidence=ocr_confidence
+            )
+        return self._combine(kind, ocr_text, method, blocks, ai_result, regex_result)
+
+    async def adetect_fields(
+        self,
+        kind: str,
+        file_path: str,
+        ocr_text: str,
+        method: str,
+        blocks: Optional[Dict[str, str]] = None,
+        ocr_confidence: Optional[float] = None,
+        file_hash: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """detect_fields() with the AI call awaited on the shared async client."""
+        ai_result = None
+        if self._wants_ai(method):
+            ai_result = await ai_extraction_service.aextract_from_file(
+                file_path, ocr_text, file_hash=file_hash, ocr_confidence=ocr_confidence
+            )
+        return self._combine(kind, ocr_text, method, blocks, ai_result)
+
+    def _combine(
+        self,
+        kind: str,
+        ocr_text: str,
+        method: str,
+        blocks: Optional[Dict[str, str]],
+        ai_result: Optional[Dict[str, Any]],
+        regex_result: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Build `detected` from the AI result (if any) and regex extraction."""
+        fields = DETECT_FIELDS[kind]
+        ai_error = None
+
+        if method == "manual" or method == "ocr_only":
+            # No field extraction — return empty detected fields
+            detected = {f: _empty_field() for f in fields}
+        elif method == "ai":
+            if ai_result is None:
+                ai_error = {"code": 0, "message": "OPENROUTER_API_KEY tidak dikonfigurasi di server"}
+                detected = {f: _empty_field() for f in fields}
+            else:
+                ai_error = ai_result.pop("_error", None)  # pull error out of detected dict
+                if ai_error and ai_error.get("code") in RETRYABLE_STATUS:
+                    # Provider throttled/unhealthy (or circuit open): fail over to regex
+                    detected = self.detect_regex(kind, ocr_text, blocks)
+                    ai_error["fallback"] = "regex"
+                else:
+                    detected = {f: ai_result.get(f, _empty_field()) for f in fields}
+        elif method == "hybrid" and ai_result is not None:
+            # AI from file + fill gaps with regex
+            ai_error = ai_result.pop("_error", None)
+            if regex_result is None:
+                regex_result = self.detect_regex(kind, ocr_text, blocks)
+            detected = {}
+            for key in fields:
+                ai_field = ai_result.get(key, _empty_field())
+                detected[key] = ai_field if ai_field["detected"] else regex_result[key]
+        else:
+            # Default: regex (also hybrid without an API key)
+            detected = regex_result or self.detect_regex(kind, ocr_text, blocks)
+
+        return detected, ai_error
+
+    # ── Hybrid: regex and AI side by side ─────────────────────────────────────
+    @staticmethod
+    def _regex_confident(detected: Dict[str, Any], ocr_confidence: Optional[float]) -> bool:
+        """Every field found on clean OCR: the AI call would add nothing."""
+        return (
+            ocr_confidence is not None
+            and ocr_confidence >= settings.HYBRID_SKIP_AI_MIN_CONFIDENCE
+            and all(field["detected"] for field in detected.values())
+        )
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    def hybrid_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    async def ahybrid(
+        self,
+        kind: str,
+        file_path: str,
+        ocr_text: str,
+        blocks: Optional[Dict[str, str]] = None,
+        ocr_confidence: Optional[float] = None,
+        budget: Optional[float] = None,
+        file_hash: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[asyncio.Task]]:
+        """
+        Hybrid detection within a latency budget (HYBRID_LATENCY_BUDGET_SECONDS
+        by default, counted from the end of OCR). Regex runs first — it takes
+        milliseconds — so the AI is only called when it can add something:
+          - regex found every field on confident OCR → no AI call at all
+          - AI answers in time → AI fields, gaps filled from regex
+          - budget runs out → regex fields now; the still-running AI task is
+            returned so its answer can enrich the record later
+        Returns (detected, ai_error, pending_ai_task).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (settings.HYBRID_LATENCY_BUDGET_SECONDS if budget is None else budget)
+        self._count("runs")
+        regex_result = await run_in_threadpool(self.detect_regex, kind, ocr_text, blocks)
+        if self._regex_confident(regex_result, ocr_confidence):
+            self._count("ai_skipped")
+            return regex_result, None, None
+
+        ai_task = asyncio.ensure_future(
+            ai_extraction_service.aextract_from_file(
+                file_path, ocr_text, file_hash=file_hash, ocr_confidence=ocr_confidence
+            )
+        )
+
+        try:
+            # shield: a timeout must not cancel the AI call itself
+            ai_result = await asyncio.wait_for(
+                asyncio.shield(ai_task), timeout=max(0.0, deadline - loop.time())
+            )
+        except asyncio.TimeoutError:
+            self._count("ai_deferred")
+            return regex_result, None, ai_task
+
+        self._count("ai_in_budget")
+        detected, ai_error = self._combine(kind, ocr_text, "hybrid", blocks, ai_result, regex_result)
+        return detected, ai_error, None
+
+    def detect_regex(
+        self, kind: str, ocr_text: str, blocks: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Regex extraction limited to the fields of `kind`."""
+        if blocks:
+            extracted = extraction_service.extract_blocks(blocks)
+        else:
+            extracted = extraction_service.extract_all(ocr_text)
+        if kind == "surat_keluar":
+            penerima = extracted.get("penerima", _empty_field())
+            if not penerima["detected"] and ocr_text:
+                m = PENERIMA_LINE.search(ocr_text)
+                if m:
+                    extracted["penerima"] = {"value": m.group(1).strip(), "detected": True}
+        return {f: extracted.get(f, _empty_field()) for f in DETECT_FIELDS[kind]}
+
+    def iter_run(
+        self,
+        kind: str,
+        file_path: str,
+        mime_type: str,
+        method: str = "regex",
+        cancel: Optional[threading.Event] = None,
+        max_pages: Optional[int] = None,
+        file_hash: Optional[str] = None,
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming form of run(). Yields (event, data) tuples:
+            ("ocr_start", {pages, ocr_pages[, cached]})
+            ("page",      {page, source, text, confidence[, escalated]})
+            ("ocr_done",  {ocr_text, ocr_confidence, keywords})
+            ("done",      run() payload)
+        Word/line boxes are left out of page events to keep them small.
+        Stops quietly after the OCR step when `cancel` is set. `max_pages`
+        limits OCR to the first pages (see run()). `file_hash` is the file's
+        SHA-256 when already known (FileService.ingest_upload), so the OCR and
+        AI caches do not read the file again to key it.
+        """
+        ocr_result: Dict[str, Any] = {}
+        for event, data in ocr_service.iter_process(
+            file_path, mime_type, file_hash=file_hash, cancel=cancel, max_pages=max_pages,
+            regions=settings.OCR_LAYOUT_REGIONS,
+        ):
+            if event == "start":
+                yield "ocr_start", data
+            elif event == "page":
+                yield "page", {k: data[k] for k in PAGE_EVENT_KEYS if k in data}
+            elif event == "done":
+                ocr_result = data
+        if cancel is not None and cancel.is_set():
+            return
+
+        ocr_payload, blocks = _ocr_payload(ocr_result, max_pages)
+        yield "ocr_done", ocr_payload
+
+        detected, ai_error = self.detect_fields(
+            kind, file_path, ocr_payload["ocr_text"], method, blocks, ocr_payload["ocr_confidence"],
+            file_hash=file_hash,
+        )
+        yield "done", _detect_payload(ocr_payload, detected, ai_error)
+
+    def run(
+        self,
+        kind: str,
+        file_path: str,
+        mime_type: str,
+        method: str = "regex",
+        progress: Optional[ProgressCallback] = None,
+        max_pages: Optional[int] = None,
+        file_hash: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        OCR the file, then detect fields. Blocking — call from a worker thread.
+        Returns the detect payload (without the upload/file_token keys):
+            {ocr_text, ocr_confidence, keywords, detected[, ai_error]}
+        `progress` moves from 5 to 70 as pages finish OCR.
+
+        Header-first mode: with `max_pages` only the first page(s) are OCR'd —
+        every detected field sits in the letter's header — and the payload
+        gains 'ocr_complete' (False when later pages were skipped). With
+        OCR_LAYOUT_REGIONS only the letter's layout regions of a scanned first
+        page are read, and ocr_text holds just those regions.
+        """
+        report = progress or (lambda pct, stage: None)
+        result: Dict[str, Any] = {}
+        total, seen = 1, set()
+
+        report(5, "ocr")
+        for event, data in self.iter_run(
+            kind, file_path, mime_type, method, max_pages=max_pages, file_hash=file_hash
+        ):
+            if event == "ocr_start":
+                total = max(1, min(data["pages"], max_pages or data["pages"]))
+            elif event == "page":
+                seen.add(data["page"])
+                report(5 + 65 * len(seen) // total, "ocr")
+            elif event == "ocr_done":
+                report(70, "extraction")
+            elif event == "done":
+                result = data
+        report(100, "done")
+        return result
+
+    async def arun(
+        self,
+        kind: str,
+        file_path: str,
+        mime_type: str,
+        method: str = "regex",
+        max_pages: Optional[int] = None,
+        file_hash: Optional[str] = None,
+    ) -> Tuple[Dict[str, Any], Optional[asyncio.Task]]:
+        """
+        run() for async endpoints. OCR and regex run in a worker thread;
+        the AI call is awaited on the pooled async client, so a slow model
+        holds neither the event loop nor a threadpool thread.
+        Returns (payload, pending_ai_task); the task is set when a hybrid
+        detect ran out of its latency budget (see ahybrid()).
+        """
+        if not self._wants_ai(method):
+            result = await run_in_threadpool(
+                self.run, kind, file_path, mime_type, method, max_pages=max_pages, file_hash=file_hash
+            )
+            return result, None
+
+        ocr_result = await run_in_threadpool(
+            ocr_service.process_file, file_path, mime_type, file_hash,
+            max_pages=max_pages, regions=settings.OCR_LAYOUT_REGIONS,
+        )
+        ocr_payload, blocks = _ocr_payload(ocr_result, max_pages)
+        ocr_text, ocr_confidence = ocr_payload["ocr_text"], ocr_payload["ocr_confidence"]
+        pending = None
+        if method == "hybrid":
+            detected, ai_error, pending = await self.ahybrid(
+                kind, file_path, ocr_text, blocks, ocr_confidence, file_hash=file_hash
+            )
+        else:
+            detected, ai_error = await self.adetect_fields(
+                kind, file_path, ocr_text, method, blocks, ocr_confidence, file_hash
+            )
+        result = _detect_payload(ocr_payload, detected, ai_error)
+        if pending is not None:
+            result["ai_pending"] = True
+        return result, pending
+
+
+# Singleton
+detection_service = DetectionService()
@@ -6,9 +6,14 @@ structured fields using block-based detection + targeted regex patterns.
 Based on: ocr-docs.md  (SuratResmiDetector architecture)
 """
 import re
+from concurrent.futures import Executor
 from dataclasses import dataclass, asdict
 from datetime import date
-from typing import Optional, Dict, Any
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Bump whenever extraction rules change output — the backfill CLI
+# (backfill_extraction.py) re-extracts every row stored with another version
+EXTRACTION_VERSION = "2"
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -31,6 +36,107 @@ BULAN_PATTERN = (
 )
 
 
+# Compiled once at import — extract_all() never builds a pattern per call
+_DAY_MONTH_YEAR = re.compile(rf"\b(\d{{1,2}})\s+({BULAN_PATTERN})\s+(\d{{4}})\b", re.IGNORECASE)
+# "Kota, 15 Januari 2025" is matched from the comma, then the city is checked
+# by hand: a leading [A-Za-z]+ would be retried at every letter of every word
+_CITY_DATE = re.compile(rf",\s*(\d{{1,2}})\s+({BULAN_PATTERN})\s+(\d{{4}})", re.IGNORECASE)
+# What [A-Za-z] matches under re.IGNORECASE (ASCII plus İ ı ſ and the Kelvin sign)
+_CITY_LETTERS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz\u0130\u0131\u017f\u212a")
+_NUMERIC_DATE = re.compile(r"\b(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})\b")
+
+_NOMOR_TAIL = re.compile(r"\s{2,}|\t|\n")
+_NOMOR_SEPARATOR = re.compile(r"[/\-]")
+
+_SIGNATURE_BLOCK = re.compile(
+    r"(?:Hormat\s+(?:kami|saya)|Wassalamu[^,]*,)\s*\n(.*?)$", re.IGNORECASE | re.DOTALL
+)
+_SIGNATURE_NAME = re.compile(r"^[A-Z][A-Z\s\.]+$")
+
+_PENERIMA_BLOCK = re.compile(
+    r"(Kepada\s*(?:\n\s*)?(?:Yth\.?|Yang\s+Terhormat)?.*?)(?=\n\s*(?:di\s+|Perihal|Hal\s*:|Dengan\s+hormat))",
+    re.IGNORECASE | re.DOTALL,
+)
+# The block ends at one of these lines. Without one after the first "Kepada"
+# the block pattern cannot match anywhere, and trying it from every later
+# "kepada" in a long body is quadratic — so this is checked first.
+_PENERIMA_END = re.compile(r"\n\s*(?:di\s+|Perihal|Hal\s*:|Dengan\s+hormat)", re.IGNORECASE)
+_PENERIMA_STOP = re.compile(r"^\s*(di\s+\w|Perihal|Hal\s*:|Dengan\s+hormat|Tempat\s*$)", re.IGNORECASE)
+_PENERIMA_HEADER = re.compile(r"^(Kepada|Yth\.?|Yang\s+Terhormat)$", re.IGNORECASE)
+_PENERIMA_ONE_LINE = re.compile(
+    r"(?:Kepada\s+(?:Yth\.?)?|Yth\.?)\s*[:\.]?\s*(?:Bapak/Ibu\s*)?([^\n]+)", re.IGNORECASE
+)
+_HONORIFIC = re.compile(r"^(Bapak|Ibu|Bapak/Ibu|Sdr\.?|Yth\.?)\s+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+# Literal prefix every match of a field pattern starts with (lower-case).
+# A field's search starts at the first occurrence of its prefix and is
+# skipped when the prefix never occurs.
+_ANCHORS: Dict[str, Tuple[str, ...]] = {
+    "nomor": ("no",),
+    "perihal": ("perihal", "hal"),
+    "kepada": ("kepada",),
+    "kepada_yth": ("kepada", "yth"),
+    "closing": ("hormat", "wassalamu"),
+}
+# Case-insensitive form for non-ASCII text, where str.lower() offsets and
+# re.IGNORECASE equivalences (ſ, K, ı) can differ from plain ASCII folding
+_ANCHOR_PATTERNS = {
+    name: re.compile("|".join(words), re.IGNORECASE) for name, words in _ANCHORS.items()
+}
+
+
+class TextIndex:
+    """
+    One OCR text, normalised once and shared by every extractor: line
+    endings unified, the leading non-empty lines (split lazily, only as far
+    as they are read) and the first position of each field anchor.
+    """
+
+    __slots__ = ("text", "_lines", "_line_end", "_lower", "_anchors")
+
+    def __init__(self, text: str):
+        self.text = text.replace("\r\n", "\n").replace("\r", "\n")
+        self._lines: List[str] = []
+        self._line_end = 0  # Offset up to which self._lines has been split
+        self._lower: Optional[str] = None
+        self._anchors: Dict[str, int] = {}
+
+    def head(self, n: int) -> List[str]:
+        """First `n` non-empty stripped lines."""
+        text = self.text
+        while len(self._lines) < n and self._line_end <= len(text):
+            nl = text.find("\n", self._line_end)
+            if nl == -1:
+                nl = len(text)
+            line = text[self._line_end:nl].strip()
+            if line:
+                self._lines.append(line)
+            self._line_end = nl + 1
+        return self._lines[:n]
+
+    def anchor(self, name: str) -> int:
+        """Offset of the first occurrence of the anchor, or -1."""
+        if name not in self._anchors:
+            if self._lower is None:
+                self._lower = self.text.lower() if self.text.isascii() else ""
+            if self._lower or not self.text:
+                found = [i for i in (self._lower.find(w) for w in _ANCHORS[name]) if i != -1]
+                self._anchors[name] = min(found) if found else -1
+            else:
+                m = _ANCHOR_PATTERNS[name].search(self.text)
+                self._anchors[name] = m.start() if m else -1
+        return self._anchors[name]
+
+    def search(self, pattern: "re.Pattern", anchor: str) -> Optional["re.Match"]:
+        """pattern.search() starting at the anchor; None when the anchor is absent."""
+        pos = self.anchor(anchor)
+        return None if pos < 0 else pattern.search(self.text, pos)
+
+
+FIELDS = ("nomor_surat", "perihal", "tanggal_surat", "pengirim", "penerima", "isi_singkat")
+
+
 @dataclass
 class SuratResult:
     nomor_surat:    Optional[str] = None
@@ -41,23 +147,33 @@ class SuratResult:
     perihal:        Optional[str] = None
     isi_singkat:    Optional[str] = None
 
+    def to_fields(self) -> Dict[str, Any]:
+        return {
+            key: {"value": getattr(self, key), "detected": getattr(self, key) is not None}
+            for key in FIELDS
+        }
+
 
 class ExtractionService:
     """
     Extracts structured fields from OCR text of Indonesian official letters.
     All methods are non-fatal — they return None if a field cannot be detected.
+    The text is indexed once (TextIndex) and every pattern is precompiled.
     """
 
     # ─── Regex patterns ──────────────────────────────────────────
     NOMOR_PATTERNS = [
-        r"(?:Nomor\s*Surat|Nomor|No\.?)\s*[:\.\-]?\s*([A-Z0-9][A-Z0-9\/\.\-]{2,60})",
+        re.compile(
+            r"(?:Nomor\s*Surat|Nomor|No\.?)\s*[:\.\-]?\s*([A-Z0-9][A-Z0-9\/\.\-]{2,60})",
+            re.IGNORECASE,
+        ),
     ]
 
     PERIHAL_PATTERNS = [
         # Multi-line perihal — stops at blank line or next heading
-        r"(?:Perihal|Hal)\s*[:\.]?\s*(.+?)(?=\n\s*\n|\n[A-Z][a-z]|\Z)",
+        re.compile(r"(?:Perihal|Hal)\s*[:\.]?\s*(.+?)(?=\n\s*\n|\n[A-Z][a-z]|\Z)", re.IGNORECASE | re.DOTALL),
         # Single-line fallback
-        r"(?:Perihal|Hal)\s*[:\.]?\s*([^\n\r]{5,200})",
+        re.compile(r"(?:Perihal|Hal)\s*[:\.]?\s*([^\n\r]{5,200})", re.IGNORECASE | re.DOTALL),
     ]
 
     ISI_START_KEYWORDS = [
@@ -97,43 +213,80 @@ class ExtractionService:
         if not text:
             return self._empty_result()
 
-        # Normalise line endings
-        text = text.replace("\r\n", "\n").replace("\r", "\n")
-
+        doc = TextIndex(text)
+        penerima_data = self._extract_penerima_block(doc)
         result = SuratResult(
-            nomor_surat   = self._extract_nomor(text),
-            tanggal_surat = self._extract_tanggal(text),
-            pengirim      = self._extract_pengirim(text),
-            perihal       = self._extract_perihal(text),
-            isi_singkat   = self._extract_isi(text),
+            nomor_surat   = self._extract_nomor(doc),
+            tanggal_surat = self._extract_tanggal(doc),
+            pengirim      = self._extract_pengirim(doc),
+            penerima      = penerima_data.get("nama"),
+            jabatan_penerima = penerima_data.get("jabatan"),
+            perihal       = self._extract_perihal(doc),
+            isi_singkat   = self._extract_isi(doc),
         )
-        # Penerima extraction (block-based)
-        penerima_data = self._extract_penerima_block(text)
-        result.penerima = penerima_data.get("nama")
-        result.jabatan_penerima = penerima_data.get("jabatan")
+        return result.to_fields()
+
+    def extract_many(
+        self,
+        texts: Iterable[Optional[str]],
+        executor: Optional[Executor] = None,
+        chunksize: int = 64,
+    ) -> List[Dict[str, Any]]:
+        """
+        extract_all() over many texts, results in input order.
+        Pass a ProcessPoolExecutor to spread the work over cores; texts are
+        sent to the workers `chunksize` at a time to keep IPC overhead low.
+        """
+        if executor is None:
+            return [self.extract_all(text or "") for text in texts]
+        return list(executor.map(_extract_one, texts, chunksize=chunksize))
 
-        return {
-            "nomor_surat":   {"value": result.nomor_surat,   "detected": result.nomor_surat   is not None},
-            "perihal":       {"value": result.perihal,       "detected": result.perihal       is not None},
-            "tanggal_surat": {"value": result.tanggal_surat, "detected": result.tanggal_surat is not None},
-            "pengirim":      {"value": result.pengirim,      "detected": result.pengirim      is not None},
-            "penerima":      {"value": result.penerima,      "detected": result.penerima      is not None},
-            "isi_singkat":   {"value": result.isi_singkat,   "detected": result.isi_singkat   is not None},
-        }
+    def extract_blocks(self, blocks: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Same fields and shape as extract_all(), from layout regions instead of
+        the full page text (see layout_analysis): each extractor only sees
+        the blocks its field can appear in.
+            blocks: {"kop", "meta", "addressee", "body", "signature"} → text
+        """
+        def join(*kinds: str) -> TextIndex:
+            parts = [blocks.get(k) or "" for k in kinds]
+            return TextIndex("\n\n".join(p.strip() for p in parts if p.strip()))
+
+        if not any((v or "").strip() for v in blocks.values()):
+            return self._empty_result()
+
+        body = join("body").text
+        isi = self._extract_isi(join("body", "signature"))
+        if isi is None and len(body) >= 20:
+            # Only the first paragraph is read — it is the summary
+            isi = body if len(body) <= 300 else body[:300].rsplit(" ", 1)[0] + "…"
+
+        header = join("meta", "addressee")
+        penerima = self._extract_penerima_block(join("addressee", "meta", "body"))
+        result = SuratResult(
+            nomor_surat   = self._extract_nomor(header),
+            tanggal_surat = self._extract_tanggal(join("addressee", "meta", "signature")),
+            pengirim      = self._extract_pengirim(join("kop", "signature")),
+            penerima      = penerima.get("nama"),
+            jabatan_penerima = penerima.get("jabatan"),
+            perihal       = self._extract_perihal(header),
+            isi_singkat   = isi,
+        )
+        return result.to_fields()
 
     # ─────────────────────────────────────────────────────────────
     # Nomor Surat
     # ─────────────────────────────────────────────────────────────
 
-    def _extract_nomor(self, text: str) -> Optional[str]:
+    def _extract_nomor(self, doc: TextIndex) -> Optional[str]:
         for pattern in self.NOMOR_PATTERNS:
-            m = re.search(pattern, text, re.IGNORECASE)
+            m = doc.search(pattern, "nomor")
             if m:
                 nomor = m.group(1).strip()
                 # Stop at whitespace run / tab / common trailing words
-                nomor = re.split(r"\s{2,}|\t|\n", nomor)[0].strip()
+                nomor = _NOMOR_TAIL.split(nomor)[0].strip()
                 # Must look like a real nomor: contains / or - and is reasonable length
-                if len(nomor) >= 4 and re.search(r"[/\-]", nomor):
+                if len(nomor) >= 4 and _NOMOR_SEPARATOR.search(nomor):
                     return nomor
         return None
 
@@ -141,37 +294,22 @@ class ExtractionService:
     # Tanggal Surat
     # ─────────────────────────────────────────────────────────────
 
-    def _extract_tanggal(self, text: str) -> Optional[str]:
+    def _extract_tanggal(self, doc: TextIndex) -> Optional[str]:
         # Pattern 1: "15 Januari 2025" — full month name or abbreviation
-        m = re.search(
-            rf"\b(\d{{1,2}})\s+({BULAN_PATTERN})\s+(\d{{4}})\b",
-            text, re.IGNORECASE,
-        )
-        if m:
-            day, bulan_str, year = int(m.group(1)), m.group(2).lower(), int(m.group(3))
-            month = BULAN_MAP.get(bulan_str)
-            if month and 1 <= day <= 31 and 2000 <= year <= 2099:
-                try:
-                    return date(year, month, day).isoformat()
-                except ValueError:
-                    pass
-
         # Pattern 2: "Kota, 15 Januari 2025" — city prefix (header trailing date)
-        m = re.search(
-            rf"[A-Za-z]+\s*,\s*(\d{{1,2}})\s+({BULAN_PATTERN})\s+(\d{{4}})",
-            text, re.IGNORECASE,
-        )
-        if m:
-            day, bulan_str, year = int(m.group(1)), m.group(2).lower(), int(m.group(3))
-            month = BULAN_MAP.get(bulan_str)
-            if month and 1 <= day <= 31 and 2000 <= year <= 2099:
-                try:
-                    return date(year, month, day).isoformat()
-                except ValueError:
-                    pass
+        for find in (_DAY_MONTH_YEAR.search, self._city_date):
+            m = find(doc.text)
+            if m:
+                day, bulan_str, year = int(m.group(1)), m.group(2).lower(), int(m.group(3))
+                month = BULAN_MAP.get(bulan_str)
+                if month and 1 <= day <= 31 and 2000 <= year <= 2099:
+                    try:
+                        return date(year, month, day).isoformat()
+                    except ValueError:
+                        pass
 
         # Pattern 3: DD/MM/YYYY or DD-MM-YYYY
-        m = re.search(r"\b(\d{1,2})[/\-](\d{1,2})[/\-](\d{4})\b", text)
+        m = _NUMERIC_DATE.search(doc.text)
         if m:
             day, month, year = int(m.group(1)), int(m.group(2)), int(m.group(3))
             if 1 <= day <= 31 and 1 <= month <= 12 and 2000 <= year <= 2099:
@@ -182,28 +320,36 @@ class ExtractionService:
 
         return None
 
+    @staticmethod
+    def _city_date(text: str) -> Optional["re.Match"]:
+        """First ', dd Bulan yyyy' whose comma follows a word (optionally spaced)."""
+        for m in _CITY_DATE.finditer(text):
+            j = m.start() - 1
+            while j >= 0 and text[j].isspace():
+                j -= 1
+            if j >= 0 and text[j] in _CITY_LETTERS:
+                return m
+        return None
+
     # ─────────────────────────────────────────────────────────────
     # Pengirim (Sender — usually the issuing organisation)
     # ─────────────────────────────────────────────────────────────
 
-    def _extract_pengirim(self, text: str) -> Optional[str]:
-        lines = [l.strip() for l in text.split("\n") if l.strip()]
+    def _extract_pengirim(self, doc: TextIndex) -> Optional[str]:
+        lines = doc.head(15)
 
         # Heuristic 1: Known Indonesian org prefixes in first 15 lines
         for line in lines[:15]:
-            if any(line.upper().startswith(pfx) for pfx in self.ORG_PREFIXES):
-                return line.strip()
+            if line.upper().startswith(self.ORG_PREFIXES):
+                return line
 
         # Heuristic 2: Signature block — text after "Hormat kami" / "Wassalamu"
-        block_m = re.search(
-            r"(?:Hormat\s+(?:kami|saya)|Wassalamu[^,]*,)\s*\n(.*?)$",
-            text, re.IGNORECASE | re.DOTALL,
-        )
+        block_m = doc.search(_SIGNATURE_BLOCK, "closing")
         if block_m:
-            block_lines = [l.strip() for l in block_m.group(1).split("\n") if l.strip()]
-            for i, line in enumerate(block_lines):
+            for line in block_m.group(1).split("\n"):
+                line = line.strip()
                 # Name: ALL-CAPS, 5+ chars
-                if re.match(r"^[A-Z][A-Z\s\.]+$", line) and len(line) > 5:
+                if line and len(line) > 5 and _SIGNATURE_NAME.match(line):
                     return line
 
         # Heuristic 3: First all-caps line in first 10 lines
@@ -217,52 +363,40 @@ class ExtractionService:
     # Penerima (Recipient — block-based)
     # ─────────────────────────────────────────────────────────────
 
-    def _extract_penerima_block(self, text: str) -> dict:
+    def _extract_penerima_block(self, doc: TextIndex) -> dict:
         """
         Find the 'Kepada Yth.' block and extract name + jabatan from the lines below it.
         Stops at 'di ' line, 'Perihal', 'Hal', blank line, or 'Dengan hormat'.
         """
         result: dict = {}
 
-        STOP_PATTERN = re.compile(
-            r"^\s*(di\s+\w|Perihal|Hal\s*:|Dengan\s+hormat|Tempat\s*$)",
-            re.IGNORECASE,
-        )
-
         # Find block start
-        block_m = re.search(
-            r"(Kepada\s*(?:\n\s*)?(?:Yth\.?|Yang\s+Terhormat)?.*?)(?=\n\s*(?:di\s+|Perihal|Hal\s*:|Dengan\s+hormat))",
-            text, re.IGNORECASE | re.DOTALL,
-        )
+        block_m = None
+        if doc.search(_PENERIMA_END, "kepada"):
+            block_m = doc.search(_PENERIMA_BLOCK, "kepada")
         if block_m:
-            block = block_m.group(1)
-            raw_lines = block.split("\n")
-            # Filter out the 'Kepada / Yth.' header lines themselves
             lines = []
-            for l in raw_lines:
+            for l in block_m.group(1).split("\n"):
                 ls = l.strip()
                 if not ls:
                     continue
-                if re.match(r"^(Kepada|Yth\.?|Yang\s+Terhormat)$", ls, re.IGNORECASE):
+                # Filter out the 'Kepada / Yth.' header lines themselves
+                if _PENERIMA_HEADER.match(ls):
                     continue
-                if STOP_PATTERN.match(ls):
+                if _PENERIMA_STOP.match(ls):
                     break
                 lines.append(ls)
 
             if lines:
                 # Remove honorific prefix
-                nama = re.sub(r"^(Bapak|Ibu|Bapak/Ibu|Sdr\.?|Yth\.?)\s+", "", lines[0], flags=re.IGNORECASE).strip()
-                result["nama"] = nama
+                result["nama"] = _HONORIFIC.sub("", lines[0]).strip()
             if len(lines) > 1:
                 result["jabatan"] = lines[1]
             if len(lines) > 2:
                 result["alamat"] = " ".join(lines[2:])
         else:
             # Simple fallback: one-liner pattern
-            m = re.search(
-                r"(?:Kepada\s+(?:Yth\.?)?|Yth\.?)\s*[:\.]?\s*(?:Bapak/Ibu\s*)?([^\n]+)",
-                text, re.IGNORECASE,
-            )
+            m = doc.search(_PENERIMA_ONE_LINE, "kepada_yth")
             if m:
                 result["nama"] = m.group(1).strip()
 
@@ -272,9 +406,9 @@ class ExtractionService:
     # Perihal / Subject
     # ─────────────────────────────────────────────────────────────
 
-    def _extract_perihal(self, text: str) -> Optional[str]:
+    def _extract_perihal(self, doc: TextIndex) -> Optional[str]:
         for pattern in self.PERIHAL_PATTERNS:
-            m = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            m = doc.search(pattern, "perihal")
             if m:
                 perihal = m.group(1).strip()
                 # Take only first meaningful line(s)
@@ -285,7 +419,7 @@ class ExtractionService:
                 result = lines[0]
                 if len(lines) > 1 and lines[1] and lines[1][0].islower():
                     result = result + " " + lines[1]
-                result = re.sub(r"\s+", " ", result).strip()
+                result = _WHITESPACE.sub(" ", result).strip()
                 if len(result) >= 5:
                     return result
         return None
@@ -294,7 +428,8 @@ class ExtractionService:
     # Isi Singkat (Body summary — first paragraph of letter body)
     # ─────────────────────────────────────────────────────────────
 
-    def _extract_isi(self, text: str) -> Optional[str]:
+    def _extract_isi(self, doc: TextIndex) -> Optional[str]:
+        text = doc.text
         start_idx: Optional[int] = None
         end_idx: Optional[int] = None
 
@@ -322,9 +457,13 @@ class ExtractionService:
     # ─────────────────────────────────────────────────────────────
 
     def _empty_result(self) -> Dict[str, Any]:
-        fields = ["nomor_surat", "perihal", "tanggal_surat", "pengirim", "penerima", "isi_singkat"]
-        return {f: {"value": None, "detected": False} for f in fields}
+        return {f: {"value": None, "detected": False} for f in FIELDS}
 
 
 # Singleton
 extraction_service = ExtractionService()
+
+
+def _extract_one(text: Optional[str]) -> Dict[str, Any]:
+    """Process-pool entry point for extract_many (module level so it pickles)."""
+    return extraction_service.extract_all(text or "")
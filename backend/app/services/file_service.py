@@ -2,14 +2,77 @@
 File Service
 Handles file uploads, storage, and management
 """
+import hashlib
 import os
-import uuid
 import shutil
+import uuid
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import BinaryIO, List, Tuple, Optional
 from fastapi import UploadFile, HTTPException, status
 from app.core.config import settings
+from app.core.executors import io_executor
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB per read/write
+
+ZIP_MAGIC = (b"PK\x03\x04", b"PK\x05\x06")  # Local file header, empty archive
+
+# Extension → (MIME type, file signatures "magic bytes" the content must start with)
+FILE_SIGNATURES = {
+    ".pdf": ("application/pdf", (b"%PDF-",)),
+    ".jpg": ("image/jpeg", (b"\xff\xd8\xff",)),
+    ".jpeg": ("image/jpeg", (b"\xff\xd8\xff",)),
+    ".png": ("image/png", (b"\x89PNG\r\n\x1a\n",)),
+    ".docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", ZIP_MAGIC),
+    ".doc": ("application/msword", (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",)),
+    ".zip": ("application/zip", ZIP_MAGIC),
+    ".csv": ("text/csv", ()),  # Plain text: no signature
+}
+
+# Letters are content-addressed: stored once per SHA-256 under
+# STORAGE_DIR/blobs/ab/cd/<sha256><ext>, shared by every record with that
+# content (see blob_service). Other file types keep the dated UUID layout.
+BLOB_DIRNAME = "blobs"
+CONTENT_ADDRESSED_TYPES = ("surat_masuk", "surat_keluar")
+
+
+@dataclass
+class StoredUpload:
+    """A stored upload; sha256 lets later stages skip re-reading the file."""
+    file_path: str
+    mime_type: str
+    file_size: int
+    sha256: str
+
+
+def _write_chunk(fh: BinaryIO, digest, chunk: bytes) -> None:
+    # hashlib releases the GIL on large buffers, so hashing here is parallel too
+    digest.update(chunk)
+    fh.write(chunk)
+
+
+def _read_head_and_hash(path: Path) -> Tuple[bytes, str]:
+    """First bytes (for type sniffing) and SHA-256 of a file, in one pass."""
+    digest = hashlib.sha256()
+    head = b""
+    with open(path, "rb") as fh:
+        while True:
+            chunk = fh.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if not head:
+                head = chunk[:64]
+            digest.update(chunk)
+    return head, digest.hexdigest()
+
+
+def _discard(fh: BinaryIO, path: Path) -> None:
+    fh.close()
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
 
 
 class FileService:
@@ -21,19 +84,29 @@ class FileService:
         Validate uploaded file
         Raises HTTPException if validation fails
         """
+        FileService.validate_filename(file.filename)
+
+    @staticmethod
+    def validate_filename(filename: Optional[str], allowed: Optional[List[str]] = None) -> None:
+        """
+        Validate the name (extension) of a file about to be uploaded
+        `allowed` defaults to ALLOWED_FILE_TYPES
+        Raises HTTPException if validation fails
+        """
+        allowed = allowed or settings.ALLOWED_FILE_TYPES
         # Check file type
-        if not file.filename:
+        if not filename:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Filename is required"
             )
         
         # Get file extension
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in settings.ALLOWED_FILE_TYPES:
+        file_ext = Path(filename).suffix.lower()
+        if file_ext not in allowed:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File type {file_ext} not allowed. Allowed types: {', '.join(settings.ALLOWED_FILE_TYPES)}"
+                detail=f"File type {file_ext} not allowed. Allowed types: {', '.join(allowed)}"
             )
     
     @staticmethod
@@ -62,51 +135,142 @@ class FileService:
         file_ext = Path(original_filename).suffix.lower()
         unique_name = f"{uuid.uuid4()}{file_ext}"
         return unique_name
-    
+
     @staticmethod
-    async def save_upload_file(
+    def blob_path(sha256: str, filename: str) -> Path:
+        """
+        Content-addressed location of a letter
+        Structure: storage/blobs/{sha[:2]}/{sha[2:4]}/{sha}{ext}
+        The extension is kept so the MIME type can still be told from the path.
+        """
+        file_ext = Path(filename).suffix.lower()
+        return Path(settings.STORAGE_DIR) / BLOB_DIRNAME / sha256[:2] / sha256[2:4] / f"{sha256}{file_ext}"
+
+    @staticmethod
+    def blob_sha256(file_path: str) -> Optional[str]:
+        """SHA-256 named by a blob path, None for a file in the legacy dated layout."""
+        path = Path(file_path)
+        sha256 = path.stem
+        if (
+            len(sha256) == 64
+            and path.parent.name == sha256[2:4]
+            and path.parent.parent.name == sha256[:2]
+            and path.parent.parent.parent.name == BLOB_DIRNAME
+        ):
+            return sha256
+        return None
+
+    @staticmethod
+    def _staging_path(file_type: str, filename: str, date: Optional[datetime]) -> Path:
+        """Where a new file is written; letters go to blobs/tmp until their hash is known."""
+        if file_type not in CONTENT_ADDRESSED_TYPES:
+            staging = FileService.generate_storage_path(file_type, date)
+            return staging / FileService.generate_unique_filename(filename)
+        staging = Path(settings.STORAGE_DIR) / BLOB_DIRNAME / "tmp"
+        staging.mkdir(parents=True, exist_ok=True)
+        return staging / FileService.generate_unique_filename(filename)
+
+    @staticmethod
+    def _place(staged: Path, file_type: str, filename: str, sha256: str) -> Path:
+        """
+        Move a fully written file to its final path. For letters that is the
+        blob of its SHA-256: if the blob already exists the new copy is
+        dropped, and the blob's mtime is refreshed so garbage collection
+        gives it a new grace period.
+        """
+        if file_type not in CONTENT_ADDRESSED_TYPES:
+            return staged
+        target = FileService.blob_path(sha256, filename)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.utime(target)
+            staged.unlink()
+        except FileNotFoundError:
+            os.replace(staged, target)  # Same filesystem: atomic, never a half-written blob
+        return target
+
+    @staticmethod
+    def check_content_type(filename: str, head: bytes) -> str:
+        """
+        MIME type of a file whose content must match its extension.
+        Raises HTTPException 415 for content with the wrong signature.
+        """
+        ext = Path(filename).suffix.lower()
+        if ext not in FILE_SIGNATURES:
+            return "application/octet-stream"  # Extra type allowed via settings
+        mime_type, signatures = FILE_SIGNATURES[ext]
+        if signatures and not head.startswith(signatures):
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"File content does not match its {ext} extension",
+            )
+        return mime_type
+
+    @staticmethod
+    def _too_large(limit: int) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the maximum size of {limit // (1024 * 1024)}MB",
+        )
+
+    @staticmethod
+    async def ingest_upload(
         upload_file: UploadFile,
         file_type: str = "surat_masuk",
-        date: Optional[datetime] = None
-    ) -> Tuple[str, str, int]:
+        date: Optional[datetime] = None,
+        max_size: Optional[int] = None,
+        allowed: Optional[List[str]] = None,
+    ) -> StoredUpload:
         """
-        Save uploaded file to storage
-        
-        Args:
-            upload_file: FastAPI UploadFile object
-            file_type: Type of file (surat_masuk, surat_keluar, etc.)
-            date: Date for organizing files (default: now)
-        
-        Returns:
-            Tuple of (file_path, mime_type, file_size)
-        
-        Raises:
-            HTTPException if save fails
+        Stream an upload to storage in UPLOAD_CHUNK_SIZE chunks.
+        Writes and hashing run in the I/O pool, never on the event loop.
+        The SHA-256 and size are computed on the way, the type is sniffed
+        from the first chunk (415 if it does not match the extension), and
+        the copy stops with 413 as soon as MAX_FILE_SIZE is passed — the
+        partial file is removed. `max_size` / `allowed` override
+        MAX_FILE_SIZE / ALLOWED_FILE_TYPES (e.g. for bulk archives).
         """
         try:
-            # Validate file
-            FileService.validate_file(upload_file)
-            
-            # Generate storage path and filename
-            storage_path = FileService.generate_storage_path(file_type, date)
-            unique_filename = FileService.generate_unique_filename(upload_file.filename)
-            file_path = storage_path / unique_filename
-            
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(upload_file.file, buffer)
-            
-            # Get file info
-            file_size = file_path.stat().st_size
-            mime_type = upload_file.content_type or "application/octet-stream"
-            
-            # Return relative path from project root (resolve both to absolute first)
-            relative_path = str(file_path.resolve().relative_to(Path.cwd().resolve()))
-            # Normalize to forward slashes for consistency
-            relative_path = relative_path.replace("\\", "/")
-            
-            return (relative_path, mime_type, file_size)
-            
+            FileService.validate_filename(upload_file.filename, allowed)
+            limit = max_size or settings.MAX_FILE_SIZE
+            # Starlette already knows the spooled size: reject before copying anything
+            if (getattr(upload_file, "size", None) or 0) > limit:
+                raise FileService._too_large(limit)
+
+            file_path = FileService._staging_path(file_type, upload_file.filename, date)
+
+            digest = hashlib.sha256()
+            file_size = 0
+            mime_type = None
+            fh = await io_executor.run(open, file_path, "wb")
+            try:
+                while True:
+                    chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if mime_type is None:
+                        mime_type = FileService.check_content_type(upload_file.filename, chunk)
+                    file_size += len(chunk)
+                    if file_size > limit:
+                        raise FileService._too_large(limit)
+                    await io_executor.run(_write_chunk, fh, digest, chunk)
+                if file_size == 0:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Uploaded file is empty"
+                    )
+                await io_executor.run(fh.close)
+            except BaseException:
+                # Not through io_executor: a saturated pool (503) or a cancelled
+                # request would leave the partial file behind
+                _discard(fh, file_path)
+                raise
+            file_path = await io_executor.run(
+                FileService._place, file_path, file_type, upload_file.filename, digest.hexdigest()
+            )
+
+            return StoredUpload(FileService._relative(file_path), mime_type, file_size, digest.hexdigest())
+
         except HTTPException:
             raise
         except Exception as e:
@@ -114,11 +278,138 @@ class FileService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to save file: {str(e)}"
             )
-    
+
+    @staticmethod
+    def move_into_storage(
+        source: Path,
+        original_filename: str,
+        file_type: str = "surat_masuk",
+        date: Optional[datetime] = None
+    ) -> StoredUpload:
+        """
+        Move a complete file (resumable upload, watch folder) into storage.
+        Same type check as ingest_upload; the file is hashed in one
+        sequential read. Blocking — see adopt_file() for async callers.
+        """
+        FileService.validate_filename(original_filename)
+        head, sha256 = _read_head_and_hash(source)
+        if not head:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is empty"
+            )
+        mime_type = FileService.check_content_type(original_filename, head)
+
+        file_path = FileService._staging_path(file_type, original_filename, date)
+        file_size = source.stat().st_size
+        # A rename on the same filesystem, a copy otherwise
+        shutil.move(str(source), str(file_path))
+        file_path = FileService._place(file_path, file_type, original_filename, sha256)
+
+        return StoredUpload(FileService._relative(file_path), mime_type, file_size, sha256)
+
+    @staticmethod
+    def link_into_storage(source: Path, sha256: str, file_type: str = "surat_masuk") -> str:
+        """
+        Place a letter stored in the legacy dated layout at its blob path
+        (a hard link on the same filesystem, a copy otherwise) and return
+        the new relative path. The source is left for the caller to remove
+        once the database points at the blob (blob_storage.py migrate).
+        """
+        staged = FileService._staging_path(file_type, source.name, None)
+        try:
+            os.link(source, staged)
+        except OSError:
+            shutil.copy2(source, staged)
+        os.utime(staged)  # Fresh grace period: gc must not take it before its reference is committed
+        return FileService._relative(FileService._place(staged, file_type, source.name, sha256))
+
+    @staticmethod
+    async def adopt_file(
+        source: Path,
+        original_filename: str,
+        file_type: str = "surat_masuk",
+        date: Optional[datetime] = None
+    ) -> StoredUpload:
+        """move_into_storage() in the I/O pool (resumable uploads)."""
+        return await io_executor.run(
+            FileService.move_into_storage, source, original_filename, file_type, date
+        )
+
+    @staticmethod
+    def store_fileobj(
+        source: BinaryIO,
+        filename: str,
+        file_type: str = "surat_masuk",
+        date: Optional[datetime] = None,
+        max_size: Optional[int] = None,
+    ) -> StoredUpload:
+        """
+        Blocking counterpart of ingest_upload for an open file object (e.g.
+        a ZIP member): same name, type and size checks, copied in
+        UPLOAD_CHUNK_SIZE chunks while hashing. Call from a worker thread.
+        """
+        FileService.validate_filename(filename)
+        limit = max_size or settings.MAX_FILE_SIZE
+        file_path = FileService._staging_path(file_type, filename, date)
+
+        digest = hashlib.sha256()
+        file_size = 0
+        mime_type = None
+        fh = open(file_path, "wb")
+        try:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if mime_type is None:
+                    mime_type = FileService.check_content_type(filename, chunk)
+                file_size += len(chunk)
+                if file_size > limit:
+                    raise FileService._too_large(limit)
+                _write_chunk(fh, digest, chunk)
+            if file_size == 0:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="File is empty"
+                )
+            fh.close()
+        except BaseException:
+            _discard(fh, file_path)
+            raise
+        file_path = FileService._place(file_path, file_type, filename, digest.hexdigest())
+        return StoredUpload(FileService._relative(file_path), mime_type, file_size, digest.hexdigest())
+
+    @staticmethod
+    def _relative(file_path: Path) -> str:
+        """Path relative to the project root, with forward slashes (as stored in the DB)."""
+        # Resolve both to absolute first
+        relative_path = str(file_path.resolve().relative_to(Path.cwd().resolve()))
+        return relative_path.replace("\\", "/")
+
+    @staticmethod
+    async def save_upload_file(
+        upload_file: UploadFile,
+        file_type: str = "surat_masuk",
+        date: Optional[datetime] = None
+    ) -> Tuple[str, str, int]:
+        """
+        Save uploaded file to storage (see ingest_upload)
+
+        Returns:
+            Tuple of (file_path, mime_type, file_size)
+
+        Raises:
+            HTTPException if save fails
+        """
+        stored = await FileService.ingest_upload(upload_file, file_type, date)
+        return stored.file_path, stored.mime_type, stored.file_size
+
     @staticmethod
     def delete_file(file_path: str) -> bool:
         """
         Delete file from storage
+        Not for letters: a blob may be shared, blob_service decides when it goes
         
         Args:
             file_path: Relative path to file
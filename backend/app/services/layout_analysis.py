@@ -0,0 +1,151 @@
+"""
+Layout Analysis
+Finds the regions of an Indonesian official letter that carry the
+detectable fields, on a binarised page, with OpenCV only (no OCR):
+
+  kop        letterhead — top blocks, down to the horizontal rule under it
+  meta       Nomor / Lampiran / Perihal column (left, between kop and body)
+  addressee  date + "Kepada Yth." column (right, between kop and body)
+  body       first full-width paragraph ("Dengan hormat, ...")
+  signature  blocks below the body on the right ("Hormat kami", name, NRP)
+
+Words are merged into text blocks by dilation; blocks are then classified
+by position relative to the page and to the first full-width block (the
+body). Each region is OCR'd with its own page segmentation mode, see
+REGION_PSM. find_regions() returns [] when the page does not look like a
+letter, and callers fall back to full-page OCR.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Tesseract page segmentation mode per region
+#   4  = single column of text of variable sizes (label : value columns)
+#   6  = single uniform block of text
+#   11 = sparse text (signature block: large gap above the name)
+REGION_PSM: Dict[str, int] = {
+    "kop": 6,
+    "meta": 4,
+    "addressee": 4,
+    "body": 6,
+    "signature": 11,
+}
+
+REGION_ORDER = ("kop", "meta", "addressee", "body", "signature")
+
+KOP_MAX_FRACTION = 0.30  # Letterhead rule must sit in the top 30% of the page
+BODY_MIN_WIDTH = 0.55  # A block this wide (fraction of page) is body text
+PAD = 12  # Pixels of margin kept around each crop
+
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1
+
+
+@dataclass
+class Region:
+    kind: str
+    box: Box
+
+    @property
+    def psm(self) -> int:
+        return REGION_PSM[self.kind]
+
+    @property
+    def area(self) -> int:
+        x0, y0, x1, y1 = self.box
+        return (x1 - x0) * (y1 - y0)
+
+
+def _ink_mask(binary: np.ndarray) -> np.ndarray:
+    """Ink pixels as 255 on a 0 background (input is dark text on light paper)."""
+    import cv2
+
+    _, mask = cv2.threshold(binary, 127, 255, cv2.THRESH_BINARY_INV)
+    return mask
+
+
+def _horizontal_rules(mask: np.ndarray) -> List[int]:
+    """y-coordinates of long horizontal lines (letterhead separator)."""
+    import cv2
+
+    h, w = mask.shape
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(1, w // 3), 1))
+    lines = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    rows = np.where(lines.any(axis=1))[0]
+    return [int(y) for y in rows]
+
+
+def _text_blocks(mask: np.ndarray) -> List[Box]:
+    """Merge words into text blocks by dilation and return their bounding boxes."""
+    import cv2
+
+    h, w = mask.shape
+    # Wide enough to bridge word gaps, tall enough to join the lines of a paragraph
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, w // 50), max(3, h // 150)))
+    merged = cv2.dilate(mask, kernel, iterations=1)
+    contours, _ = cv2.findContours(merged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = (w * h) // 5000  # Specks, stamps' dots, scanner dust
+    boxes = []
+    for contour in contours:
+        x, y, bw, bh = cv2.boundingRect(contour)
+        if bw * bh >= min_area and bh < h * 0.6:
+            boxes.append((x, y, x + bw, y + bh))
+    return sorted(boxes, key=lambda b: (b[1], b[0]))
+
+
+def _union(boxes: List[Box], shape: Tuple[int, int]) -> Box:
+    h, w = shape
+    return (
+        max(0, min(b[0] for b in boxes) - PAD),
+        max(0, min(b[1] for b in boxes) - PAD),
+        min(w, max(b[2] for b in boxes) + PAD),
+        min(h, max(b[3] for b in boxes) + PAD),
+    )
+
+
+def find_regions(binary: np.ndarray) -> List[Region]:
+    """
+    Locate the field-bearing regions on a binarised grayscale page.
+    Returns regions in REGION_ORDER (missing ones are skipped), or [] when
+    no full-width body paragraph is found.
+    """
+    h, w = binary.shape[:2]
+    mask = _ink_mask(binary)
+
+    # Letterhead ends at the first long rule near the top, if there is one
+    rules = [y for y in _horizontal_rules(mask) if y < h * KOP_MAX_FRACTION]
+    kop_bottom = max(rules) if rules else None
+    if rules:
+        mask[min(rules):kop_bottom + 1, :] = 0  # Keep the rule out of the blocks
+
+    blocks = _text_blocks(mask)
+    if not blocks:
+        return []
+
+    if kop_bottom is None:
+        # No rule: the kop is the top cluster of centred lines
+        kop_bottom = blocks[0][3]
+    kop = [b for b in blocks if b[3] <= kop_bottom + PAD]
+    rest = [b for b in blocks if b not in kop]
+
+    body_index = next(
+        (i for i, b in enumerate(rest) if (b[2] - b[0]) >= w * BODY_MIN_WIDTH), None
+    )
+    if body_index is None:
+        return []
+
+    header = rest[:body_index]
+    body = rest[body_index]
+    below = rest[body_index + 1:]
+
+    meta = [b for b in header if (b[0] + b[2]) / 2 < w / 2]
+    addressee = [b for b in header if (b[0] + b[2]) / 2 >= w / 2]
+    # Signature: right-hand blocks after the last full-width paragraph
+    last_wide = max(
+        (i for i, b in enumerate(below) if (b[2] - b[0]) >= w * BODY_MIN_WIDTH), default=-1
+    )
+    signature = [b for b in below[last_wide + 1:] if (b[0] + b[2]) / 2 >= w * 0.4]
+
+    found = {"kop": kop, "meta": meta, "addressee": addressee, "body": [body], "signature": signature}
+    return [Region(kind, _union(found[kind], (h, w))) for kind in REGION_ORDER if found[kind]]
@@ -0,0 +1,166 @@
+"""
+OCR Cache
+Persistent, content-addressed cache for OCRService.process_file results.
+
+Entries live on disk under {STORAGE_DIR}/cache/ocr/{key[:2]}/{key}.json so
+they survive restarts. The key is the SHA-256 of the file bytes combined
+with every setting that changes OCR output (language, Tesseract config,
+preprocessing version). When the store grows past OCR_CACHE_MAX_BYTES the
+least-recently-used entries (by mtime, touched on every hit) are evicted.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """Disk-backed LRU cache of OCR results keyed by content hash + OCR settings."""
+
+    label = "OCR"  # Used in log messages
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.root = root or Path(settings.STORAGE_DIR) / "cache" / "ocr"
+        self.max_bytes = max_bytes if max_bytes is not None else settings.OCR_CACHE_MAX_BYTES
+        self.enabled = settings.OCR_CACHE_ENABLED
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, int]] = None  # key → size in bytes
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ─────────────────────────────────────────────────────────────
+    # Keys
+    # ─────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def make_key(file_hash: str, fingerprint: str) -> str:
+        """Combine the file digest with the OCR settings fingerprint."""
+        return hashlib.sha256(f"{file_hash}:{fingerprint}".encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    # ─────────────────────────────────────────────────────────────
+    # Public API
+    # ─────────────────────────────────────────────────────────────
+
+    def get(self, key: str) -> Optional[Dict[str, object]]:
+        if not self.enabled:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                result = json.load(fh)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as exc:
+            logger.warning("%s cache: unreadable entry %s (%s) — dropping", self.label, key, exc)
+            self._remove(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: Dict[str, object]) -> None:
+        if not self.enabled:
+            return
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(payload)
+            os.replace(tmp, path)
+        except Exception as exc:
+            logger.warning("%s cache: failed to write %s: %s", self.label, key, exc)
+            return
+
+        with self._lock:
+            index = self._load_index()
+            self._total += len(payload) - index.get(key, 0)
+            index[key] = len(payload)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            index = self._load_index() if self.enabled else {}
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(index),
+                "size_bytes": self._total,
+                "max_bytes": self.max_bytes,
+            }
+
+    # ─────────────────────────────────────────────────────────────
+    # Internals
+    # ─────────────────────────────────────────────────────────────
+
+    def _load_index(self) -> Dict[str, int]:
+        """Scan the store once per process; afterwards the index is kept in sync."""
+        if self._index is None:
+            self._index = {}
+            self._total = 0
+            if self.root.exists():
+                for entry in self.root.glob("*/*.json"):
+                    size = entry.stat().st_size
+                    self._index[entry.stem] = size
+                    self._total += size
+        return self._index
+
+    def _evict(self) -> None:
+        """Drop least-recently-used entries until the store is back under 90% of the limit."""
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for key in self._index:
+            try:
+                entries.append((self._entry_path(key).stat().st_mtime, key))
+            except FileNotFoundError:
+                entries.append((0.0, key))
+        for _, key in sorted(entries):
+            if self._total <= target:
+                break
+            self._total -= self._index.pop(key, 0)
+            try:
+                self._entry_path(key).unlink()
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            index = self._load_index()
+            self._total -= index.pop(key, 0)
+        try:
+            self._entry_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+# Singleton
+ocr_cache = OCRCache()
@@ -0,0 +1,510 @@
+"""
+OCR Engine — page-parallel Tesseract runner
+Renders scanned PDF pages via PyMuPDF and runs Tesseract on each page
+in a process pool, so multi-page scans use every available core.
+
+Page workers are module-level functions (picklable); each worker re-opens
+the PDF itself so only the page index crosses the process boundary,
+never a rendered bitmap.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services import image_preprocess, tesseract_backend
+
+logger = logging.getLogger(__name__)
+
+TESSERACT_CONFIG = "--psm 6 --oem 3"
+DEFAULT_DPI = 300
+# Bump whenever preprocessing/recognition changes output — invalidates the OCR cache
+PREPROCESS_VERSION = "4"
+
+
+def settings_fingerprint() -> str:
+    """Every setting that changes OCR output, as one string (used for cache keys)."""
+    lang = getattr(settings, "OCR_LANGUAGE", "ind")
+    if settings.OCR_ADAPTIVE_DPI:
+        dpi = f"{settings.OCR_BASE_DPI}-{settings.OCR_MAX_DPI}@{settings.CLASSIFICATION_CONFIDENCE_THRESHOLD}"
+    else:
+        dpi = str(settings.OCR_MAX_DPI)
+    mode = settings.OCR_PREPROCESS_MODE
+    # Resolved backend ("auto" → tesserocr or pytesseract): they differ in text and confidence
+    backend = tesseract_backend.get_backend().name
+    return (
+        f"lang={lang}|config={TESSERACT_CONFIG}|pre={PREPROCESS_VERSION}:{mode}|dpi={dpi}"
+        f"|backend={backend}|textlayer={settings.PDF_TEXT_LAYER_MIN_CHARS}"
+    )
+
+
+# ─────────────────────────────────────────────────────────────
+# Page-level helpers (run inside worker processes)
+# ─────────────────────────────────────────────────────────────
+
+def preprocess_image(img: Image.Image) -> Image.Image:
+    """Adaptive preprocessing of a PIL image (see image_preprocess)."""
+    return image_preprocess.preprocess(img).image
+
+
+def recognize(img: Image.Image, config: str = TESSERACT_CONFIG) -> Dict[str, object]:
+    """
+    Run Tesseract once on a preprocessed image and derive everything from
+    the single image_to_data result:
+        {'text': str, 'confidence': float, 'words': [...], 'lines': [...]}
+    Words carry {'text', 'conf', 'left', 'top', 'width', 'height',
+    'block', 'par', 'line'}; lines carry {'text', 'left', 'top', 'width',
+    'height', 'block', 'par', 'line'}.
+    """
+    lang = getattr(settings, "OCR_LANGUAGE", "ind")
+    data = tesseract_backend.get_backend().image_to_data(img, lang, config)
+    return build_layout(data)
+
+
+def warm_up() -> None:
+    """Load Tesseract engines for this process (also the OCR pool worker initializer)."""
+    tesseract_backend.warm_up(getattr(settings, "OCR_LANGUAGE", "ind"), TESSERACT_CONFIG)
+
+
+def build_layout(data: Dict[str, list]) -> Dict[str, object]:
+    """Turn a pytesseract Output.DICT into text, mean confidence, words and lines."""
+    words: List[Dict[str, object]] = []
+    for i, raw in enumerate(data.get("text", [])):
+        word = (raw or "").strip()
+        if not word:
+            continue
+        try:
+            conf = float(data["conf"][i])
+        except (TypeError, ValueError):
+            conf = -1.0
+        words.append({
+            "text": word,
+            "conf": conf,
+            "left": int(data["left"][i]),
+            "top": int(data["top"][i]),
+            "width": int(data["width"][i]),
+            "height": int(data["height"][i]),
+            "block": int(data["block_num"][i]),
+            "par": int(data["par_num"][i]),
+            "line": int(data["line_num"][i]),
+        })
+
+    # Group words into lines (Tesseract already emits them in reading order)
+    lines: List[Dict[str, object]] = []
+    for word in words:
+        key = (word["block"], word["par"], word["line"])
+        if lines and (lines[-1]["block"], lines[-1]["par"], lines[-1]["line"]) == key:
+            line = lines[-1]
+            right = max(line["left"] + line["width"], word["left"] + word["width"])
+            bottom = max(line["top"] + line["height"], word["top"] + word["height"])
+            line["left"] = min(line["left"], word["left"])
+            line["top"] = min(line["top"], word["top"])
+            line["width"] = right - line["left"]
+            line["height"] = bottom - line["top"]
+            line["text"] += " " + word["text"]
+        else:
+            lines.append({
+                "text": word["text"],
+                "left": word["left"], "top": word["top"],
+                "width": word["width"], "height": word["height"],
+                "block": word["block"], "par": word["par"], "line": word["line"],
+            })
+
+    # Rebuild plain text — blank line between blocks/paragraphs, like image_to_string
+    parts: List[str] = []
+    prev = None
+    for line in lines:
+        if prev is not None and (line["block"], line["par"]) != prev:
+            parts.append("")
+        parts.append(line["text"])
+        prev = (line["block"], line["par"])
+    text = "\n".join(parts)
+
+    confs = [w["conf"] for w in words if w["conf"] >= 0]
+    confidence = round(sum(confs) / len(confs), 2) if confs else 0.0
+    return {"text": text, "confidence": confidence, "words": words, "lines": lines}
+
+
+def render_page(path: str, page_index: int, dpi: int = DEFAULT_DPI) -> Image.Image:
+    """Render a single PDF page to an RGB PIL image."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as doc:
+        pix = doc[page_index].get_pixmap(dpi=dpi)
+        return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def ocr_pdf_page(path: str, page_index: int, dpi: int = DEFAULT_DPI) -> Dict[str, object]:
+    """
+    Render + preprocess + OCR one PDF page.
+    The page is rendered straight to grayscale and handed to the
+    preprocessing pipeline as a NumPy view of the pixmap (no PIL copy).
+    Returns {'page': int, 'dpi': int, 'text': str, 'confidence': float,
+    'words': list, 'lines': list, 'preprocess': dict, 'ocr_ms': float};
+    never raises.
+    """
+    import fitz  # PyMuPDF
+
+    prep: Dict[str, object] = {}
+    ocr_ms = 0.0
+    try:
+        with fitz.open(path) as doc:
+            pix = doc[page_index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            prepared = image_preprocess.preprocess_array(image_preprocess.pixmap_to_array(pix))
+            del pix
+        prep = prepared.summary()
+        started = time.perf_counter()
+        result = recognize(prepared.image)
+        ocr_ms = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as exc:
+        logger.warning("OCR failed on page %d of %s: %s", page_index + 1, path, exc)
+        result = {"text": "", "confidence": 0.0, "words": [], "lines": []}
+    return {"page": page_index + 1, "dpi": dpi, **result, "preprocess": prep, "ocr_ms": ocr_ms}
+
+
+def recognize_regions(img: Image.Image) -> Optional[Dict[str, object]]:
+    """
+    Layout-aware OCR of a preprocessed page: only the letterhead, meta,
+    addressee, first body paragraph and signature regions are OCR'd, each
+    with its own --psm (see layout_analysis). Returns the recognize() shape
+    plus 'blocks' {kind: text}, 'regions' and 'pixels' {'ocr', 'page'};
+    None when the page layout is not recognised.
+    """
+    from app.services import layout_analysis
+
+    arr = np.asarray(img)
+    if arr.ndim != 2:
+        return None  # Not binarised (preprocessing fell back)
+    try:
+        regions = layout_analysis.find_regions(arr)
+    except ImportError:  # opencv missing
+        return None
+    if not regions:
+        return None
+
+    blocks: Dict[str, str] = {}
+    words: List[Dict[str, object]] = []
+    lines: List[Dict[str, object]] = []
+    described = []
+    for region in regions:
+        x0, y0, x1, y1 = region.box
+        crop = Image.fromarray(arr[y0:y1, x0:x1])
+        result = recognize(crop, config=f"--psm {region.psm} --oem 3")
+        blocks[region.kind] = result["text"]
+        # Shift boxes back into page coordinates
+        for item in result["words"] + result["lines"]:
+            item["left"] += x0
+            item["top"] += y0
+        words.extend(result["words"])
+        lines.extend(result["lines"])
+        described.append({
+            "kind": region.kind, "box": list(region.box), "psm": region.psm,
+            "confidence": result["confidence"],
+        })
+
+    confs = [w["conf"] for w in words if w["conf"] >= 0]
+    return {
+        "text": "\n\n".join(blocks[k] for k in layout_analysis.REGION_ORDER if blocks.get(k)),
+        "confidence": round(sum(confs) / len(confs), 2) if confs else 0.0,
+        "words": words,
+        "lines": lines,
+        "blocks": blocks,
+        "regions": described,
+        "pixels": {"ocr": sum(r.area for r in regions), "page": int(arr.shape[0] * arr.shape[1])},
+    }
+
+
+def ocr_pdf_regions(path: str, page_index: int = 0, dpi: int = DEFAULT_DPI) -> Dict[str, object]:
+    """
+    Like ocr_pdf_page, but reads only the field-bearing regions of the page
+    (recognize_regions). Falls back to full-page OCR of the same render when
+    the layout is not recognised; 'blocks' is then absent. Never raises.
+    """
+    import fitz  # PyMuPDF
+
+    prep: Dict[str, object] = {}
+    ocr_ms = 0.0
+    try:
+        with fitz.open(path) as doc:
+            pix = doc[page_index].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            prepared = image_preprocess.preprocess_array(image_preprocess.pixmap_to_array(pix))
+            del pix
+        prep = prepared.summary()
+        started = time.perf_counter()
+        result = recognize_regions(prepared.image) or recognize(prepared.image)
+        ocr_ms = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as exc:
+        logger.warning("Region OCR failed on page %d of %s: %s", page_index + 1, path, exc)
+        result = {"text": "", "confidence": 0.0, "words": [], "lines": []}
+    return {"page": page_index + 1, "dpi": dpi, **result, "preprocess": prep, "ocr_ms": ocr_ms}
+
+
+def pdf_page_count(path: str) -> int:
+    import fitz  # PyMuPDF
+
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+# ─────────────────────────────────────────────────────────────
+# Parallel runner
+# ─────────────────────────────────────────────────────────────
+
+class ParallelPageOCR:
+    """
+    Runs ocr_pdf_page over every page of a PDF using a shared process pool.
+    At most `max_in_flight` pages are submitted at once so memory stays
+    bounded regardless of document length. Results come back in page order.
+
+    run_adaptive() first OCRs at OCR_BASE_DPI and re-renders at OCR_MAX_DPI
+    only the pages whose confidence falls below
+    CLASSIFICATION_CONFIDENCE_THRESHOLD. The iter_* variants yield pages as
+    they complete and can be cancelled, for streaming callers.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_in_flight: Optional[int] = None):
+        self.workers = workers or getattr(settings, "OCR_WORKERS", 0) or os.cpu_count() or 1
+        self.max_in_flight = (
+            max_in_flight
+            or getattr(settings, "OCR_MAX_PAGES_IN_FLIGHT", 0)
+            or self.workers * 2
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Counters and the pool are shared by concurrent request / bulk / watch-folder threads
+        self._lock = threading.Lock()
+        self.pages_total = 0
+        self.pages_escalated = 0
+        self.escalations_improved = 0
+        self.chain_counts: Dict[str, int] = {}
+        self.stage_ms: Dict[str, float] = {}
+        self.region_pages = 0
+        self.region_fallbacks = 0
+        self.region_pixels = {"ocr": 0, "page": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Each worker loads its own Tesseract engines once, at spawn time
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+            return self._pool
+
+    def _drop_pool(self, broken: ProcessPoolExecutor) -> None:
+        """
+        Discard a broken pool, once: a caller that already replaced it keeps
+        its healthy pool. The next _get_pool() spawns a new one.
+        """
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def start(self) -> None:
+        """Spawn and warm the worker pool (called from the app lifespan on startup)."""
+        warm_up()
+        if self.workers > 1:
+            pool = self._get_pool()
+            # Submitting one no-op per worker forces every process to spawn now
+            wait([pool.submit(os.getpid) for _ in range(self.workers)])
+
+    def shutdown(self) -> None:
+        """Stop the worker pool (called from the app lifespan on shutdown)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        tesseract_backend.shutdown()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> Dict[str, object]:
+        return {
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "adaptive_dpi": settings.OCR_ADAPTIVE_DPI,
+            "base_dpi": settings.OCR_BASE_DPI,
+            "max_dpi": settings.OCR_MAX_DPI,
+            "pages_total": self.pages_total,
+            "pages_escalated": self.pages_escalated,
+            "escalations_improved": self.escalations_improved,
+            "escalation_rate": (
+                round(self.pages_escalated / self.pages_total, 4) if self.pages_total else 0.0
+            ),
+            "preprocess_chains": dict(self.chain_counts),
+            "stage_ms_total": {k: round(v, 2) for k, v in self.stage_ms.items()},
+            "region_pages": self.region_pages,
+            "region_fallbacks": self.region_fallbacks,
+            "region_pixel_ratio": (
+                round(self.region_pixels["ocr"] / self.region_pixels["page"], 4)
+                if self.region_pixels["page"] else None
+            ),
+        }
+
+    def _record(self, pages: List[Dict[str, object]], new_pages: bool = True) -> None:
+        """
+        Accumulate per-page preprocessing/OCR timings reported by the workers.
+        `new_pages` is False for max-DPI retries (already counted in pages_total).
+        """
+        with self._lock:
+            if new_pages:
+                self.pages_total += len(pages)
+            for page in pages:
+                prep = page.get("preprocess") or {}
+                chain = prep.get("chain")
+                if chain:
+                    self.chain_counts[chain] = self.chain_counts.get(chain, 0) + 1
+                timings = dict(prep.get("timings_ms") or {})
+                timings["tesseract"] = page.get("ocr_ms", 0.0)
+                for stage, ms in timings.items():
+                    self.stage_ms[stage] = self.stage_ms.get(stage, 0.0) + ms
+
+    def record_regions(self, page: Dict[str, object]) -> None:
+        """Count a layout-region OCR (see recognize_regions) and the pixels it saved."""
+        pixels = page.get("pixels")
+        with self._lock:
+            if not pixels:
+                self.region_fallbacks += 1
+                return
+            self.region_pages += 1
+            self.region_pixels["ocr"] += pixels["ocr"]
+            self.region_pixels["page"] += pixels["page"]
+
+    def iter_adaptive(
+        self,
+        path: str,
+        page_indices: Optional[Sequence[int]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Iterator[Dict[str, object]]:
+        """
+        Yield pages as they finish: first the base-DPI pass, then — for pages
+        below the confidence threshold — the max-DPI retry, but only when it
+        read the page better (marked 'escalated': True, same page number).
+        Falls back to a single max-DPI pass when OCR_ADAPTIVE_DPI is off.
+        """
+        if not settings.OCR_ADAPTIVE_DPI or settings.OCR_BASE_DPI >= settings.OCR_MAX_DPI:
+            for page in self.iter_pages(path, settings.OCR_MAX_DPI, page_indices, cancel):
+                self._record([page])
+                yield page
+            return
+
+        threshold = settings.CLASSIFICATION_CONFIDENCE_THRESHOLD
+        low: Dict[int, float] = {}
+        for page in self.iter_pages(path, settings.OCR_BASE_DPI, page_indices, cancel):
+            self._record([page])
+            if page["confidence"] < threshold:
+                low[page["page"]] = page["confidence"]
+            yield page
+
+        if not low or (cancel is not None and cancel.is_set()):
+            return
+
+        with self._lock:
+            self.pages_escalated += len(low)
+        retry_indices = [number - 1 for number in sorted(low)]
+        for retry in self.iter_pages(path, settings.OCR_MAX_DPI, retry_indices, cancel):
+            self._record([retry], new_pages=False)
+            # Keep whichever pass read the page better
+            if retry["confidence"] > low[retry["page"]]:
+                with self._lock:
+                    self.escalations_improved += 1
+                yield {**retry, "escalated": True}
+
+    def run_adaptive(
+        self, path: str, page_indices: Optional[Sequence[int]] = None
+    ) -> List[Dict[str, object]]:
+        """Adaptive-DPI OCR of the pages; returns the best read of each page in order."""
+        pages = {p["page"]: p for p in self.iter_adaptive(path, page_indices)}
+        return [pages[k] for k in sorted(pages)]
+
+    def run(
+        self,
+        path: str,
+        dpi: int = DEFAULT_DPI,
+        page_indices: Optional[Sequence[int]] = None,
+    ) -> List[Dict[str, object]]:
+        """
+        OCR pages of `path` (all pages, or only the 0-based `page_indices`).
+        Returns per-page dicts ordered by page number.
+        """
+        return sorted(self.iter_pages(path, dpi, page_indices), key=lambda p: p["page"])
+
+    def iter_pages(
+        self,
+        path: str,
+        dpi: int = DEFAULT_DPI,
+        page_indices: Optional[Sequence[int]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Iterator[Dict[str, object]]:
+        """
+        Yield page results in completion order. Setting `cancel` — or closing
+        the generator — stops submitting pages and cancels queued ones.
+        """
+        if page_indices is None:
+            page_indices = range(pdf_page_count(path))
+        remaining = list(page_indices)
+
+        def cancelled() -> bool:
+            return cancel is not None and cancel.is_set()
+
+        # Not worth the IPC overhead for a single page or a single worker
+        if len(remaining) > 1 and self.workers > 1:
+            pool = self._get_pool()
+            try:
+                for page in self._iter_pool(pool, path, remaining, dpi, cancelled):
+                    remaining.remove(page["page"] - 1)
+                    yield page
+                return
+            except BrokenProcessPool:
+                logger.error("OCR process pool broken — falling back to sequential OCR")
+                self._drop_pool(pool)
+
+        for index in list(remaining):
+            if cancelled():
+                return
+            yield ocr_pdf_page(path, index, dpi)
+
+    def _iter_pool(
+        self,
+        pool: ProcessPoolExecutor,
+        path: str,
+        indices: List[int],
+        dpi: int,
+        cancelled: Callable[[], bool],
+    ) -> Iterator[Dict[str, object]]:
+        pending = set()
+        queue = iter(list(indices))
+        exhausted = False
+
+        try:
+            while not exhausted or pending:
+                if cancelled():
+                    return
+                # Top up to the in-flight limit
+                while not exhausted and len(pending) < self.max_in_flight:
+                    index = next(queue, None)
+                    if index is None:
+                        exhausted = True
+                        break
+                    pending.add(pool.submit(ocr_pdf_page, path, index, dpi))
+
+                if not pending:
+                    break
+                # Short timeout so a cancel request is noticed between pages
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+# Singleton
+page_ocr = ParallelPageOCR()
@@ -2,21 +2,44 @@
 OCR Service — Improved Pipeline
 Uses pdfplumber for digital PDFs, PyMuPDF for scanned PDFs,
 and opencv for image preprocessing before Tesseract.
+PDFs are routed page by page: only pages without a text layer are OCR'd,
+in parallel (see ocr_engine).
 """
 import re
 import io
+import time
+import logging
+import threading
 from pathlib import Path
-from typing import Tuple, List, Dict, Optional
+from typing import Iterator, Tuple, List, Dict, Optional
 
 from PIL import Image
 import pytesseract
 
 from app.core.config import settings
+from app.services import image_preprocess
+from app.services.ocr_cache import ocr_cache, sha256_file
+from app.services.ocr_engine import (
+    TESSERACT_CONFIG,
+    ocr_pdf_regions,
+    page_ocr,
+    pdf_page_count,
+    preprocess_image,
+    recognize,
+    recognize_regions,
+    settings_fingerprint,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _empty_result() -> Dict[str, object]:
+    return {"text": "", "confidence": 0.0, "keywords": [], "pages": []}
 
 
 class OCRService:
 
-    TESSERACT_CONFIG = "--psm 6 --oem 3"
+    TESSERACT_CONFIG = TESSERACT_CONFIG
 
     def __init__(self):
         if settings.TESSERACT_CMD:
@@ -26,28 +49,114 @@ class OCRService:
     # Public API
     # ─────────────────────────────────────────────────────────────
 
-    def process_file(self, file_path: str, file_type: str) -> Dict[str, object]:
+    def process_file(
+        self,
+        file_path: str,
+        file_type: str,
+        file_hash: Optional[str] = None,
+        max_pages: Optional[int] = None,
+        regions: bool = False,
+    ) -> Dict[str, object]:
         """
         Extract text from a document using the best available method.
-        Returns {'text': str, 'confidence': float, 'keywords': list}.
+        Results are cached by content hash (see ocr_cache); pass `file_hash`
+        when the SHA-256 is already known to skip re-reading the file.
+        Returns {'text': str, 'confidence': float, 'keywords': list, 'pages': list}.
+        'pages' holds per-page {'page', 'text', 'confidence', 'source', 'words',
+        'lines'} dicts; source is 'digital' (text layer) or 'ocr', and
+        words/lines (Tesseract boxes) are empty for digital pages.
+        `max_pages` / `regions` are passed to iter_process (header-first OCR).
         Never raises — returns empty result on failure.
         """
-        empty = {"text": "", "confidence": 0.0, "keywords": []}
+        result = _empty_result()
+        for event, data in self.iter_process(
+            file_path, file_type, file_hash, max_pages=max_pages, regions=regions
+        ):
+            if event == "done":
+                result = data
+        return result
+
+    def iter_process(
+        self,
+        file_path: str,
+        file_type: str,
+        file_hash: Optional[str] = None,
+        cancel: Optional[threading.Event] = None,
+        max_pages: Optional[int] = None,
+        regions: bool = False,
+    ) -> Iterator[Tuple[str, Dict[str, object]]]:
+        """
+        Streaming form of process_file. Yields (event, data) tuples:
+            ("start", {'pages': int, 'ocr_pages': int[, 'cached': True]})
+            ("page",  page dict)  — once per page as it finishes; a page may
+                                    be sent again with 'escalated': True when
+                                    the high-DPI retry read it better
+            ("done",  process_file result)
+        Setting `cancel` stops OCR between pages; a cancelled run is not cached.
+        With `max_pages` only the first pages of a PDF are read (header-first
+        detection); the result then carries 'complete': False when pages were
+        left out, and such partial results are not cached either.
+        `regions` (with max_pages) OCRs only the layout regions of the first
+        page (see layout_analysis); that page then carries 'blocks' and the
+        result is never complete.
+        Never raises.
+        """
+        empty = _empty_result()
+        started = time.perf_counter()
+        cache_key = None
+        try:
+            file_hash = file_hash or sha256_file(file_path)
+            cache_key = ocr_cache.make_key(file_hash, settings_fingerprint())
+            cached = ocr_cache.get(cache_key)
+            if cached is not None:
+                logger.info(
+                    "OCR cache hit %s (%.1f ms)", file_hash[:12], (time.perf_counter() - started) * 1000
+                )
+                pages = cached.get("pages") or []
+                yield "start", {"pages": len(pages), "ocr_pages": 0, "cached": True}
+                for page in pages:
+                    yield "page", page
+                yield "done", {**cached, "complete": True} if max_pages else cached
+                return
+        except Exception as exc:
+            logger.warning("OCR cache lookup failed for %s: %s", file_path, exc)
+
         try:
             ext = Path(file_path).suffix.lower().lstrip(".")
             if ext == "pdf" or "pdf" in file_type.lower():
-                text, confidence = self._process_pdf(file_path)
+                pages: Dict[int, Dict[str, object]] = {}
+                for event, data in self._iter_pdf(file_path, cancel, max_pages, regions and bool(max_pages)):
+                    if event == "start":
+                        complete = data["pages"] <= len(data["read"]) if max_pages else True
+                        data = {k: v for k, v in data.items() if k != "read"}
+                    elif event == "page":
+                        pages[data["page"]] = data
+                    yield event, data
+                text, confidence, page_list = self._merge_pages([pages[k] for k in sorted(pages)])
+                complete = complete and not any("blocks" in p for p in page_list)
             elif ext in ("jpg", "jpeg", "png") or any(
                 t in file_type.lower() for t in ("image", "jpeg", "jpg", "png")
             ):
-                text, confidence = self._process_image(file_path)
+                yield "start", {"pages": 1, "ocr_pages": 1}
+                page = {**self._process_image(file_path, regions and bool(max_pages)), "source": "ocr"}
+                yield "page", page
+                text, confidence, page_list = page["text"], page["confidence"], [page]
+                complete = "blocks" not in page
             else:
-                return empty
+                yield "done", empty
+                return
 
             keywords = self.extract_keywords(text) if text else []
-            return {"text": text, "confidence": confidence, "keywords": keywords}
-        except Exception:
-            return empty
+            result = {"text": text, "confidence": confidence, "keywords": keywords, "pages": page_list}
+            # Only cache real, complete output — a failed/blank/cancelled/partial run should be retried
+            if cache_key and text.strip() and complete and not (cancel is not None and cancel.is_set()):
+                ocr_cache.put(cache_key, result)
+            if max_pages:
+                result["complete"] = complete
+            yield "done", result
+        except Exception as exc:
+            logger.warning("OCR failed for %s: %s", file_path, exc)
+            yield "done", empty
 
     def extract_keywords(self, text: str) -> List[str]:
         """Return top-20 keywords (words longer than 3 chars, by frequency)."""
@@ -62,127 +171,107 @@ class OCRService:
     # PDF handling
     # ─────────────────────────────────────────────────────────────
 
-    def _process_pdf(self, path: str) -> Tuple[str, float]:
-        """Try pdfplumber first (digital PDF); fall back to PyMuPDF OCR (scanned)."""
-        text = self._pdf_digital(path)
-        if text and len(text.strip()) > 50:
-            # Good digital text — high confidence
-            return text.strip(), 90.0
+    def _iter_pdf(
+        self,
+        path: str,
+        cancel: Optional[threading.Event] = None,
+        max_pages: Optional[int] = None,
+        regions: bool = False,
+    ) -> Iterator[Tuple[str, Dict[str, object]]]:
+        """
+        Route each page separately: pages with a usable text layer use the
+        pdfplumber text directly; only pages without one are rendered and
+        OCR'd. Every page dict records its 'source' ('digital' or 'ocr').
+        Yields ("start", counts) then ("page", page) events; digital pages
+        first, OCR pages as they complete. `max_pages` limits the pages read;
+        the start event's 'read' lists the 0-based pages that will be.
+        With `regions`, a scanned first page is read by layout regions only.
+        """
+        digital = self._pdf_digital_pages(path)
+        if not digital:
+            # pdfplumber could not read the file — OCR everything
+            digital = [""] * pdf_page_count(path)
+
+        read = list(range(len(digital)))[:max_pages] if max_pages else list(range(len(digital)))
+        min_chars = settings.PDF_TEXT_LAYER_MIN_CHARS
+        scan_indices = [i for i in read if len(digital[i].strip()) < min_chars]
+        yield "start", {"pages": len(digital), "ocr_pages": len(scan_indices), "read": read}
+
+        for i in read:
+            page_text = digital[i]
+            if i not in scan_indices:
+                yield "page", self._digital_page(i + 1, page_text)
 
-        # Scanned PDF → render via PyMuPDF → Tesseract
-        text, confidence = self._pdf_scanned(path)
-        return text, confidence
+        done = set()
+        pool_indices = scan_indices
+        if regions and 0 in scan_indices:
+            page = ocr_pdf_regions(path, 0, settings.OCR_MAX_DPI)
+            page_ocr.record_regions(page)
+            done.add(1)
+            pool_indices = [i for i in scan_indices if i != 0]
+            yield "page", {**page, "source": "ocr"}
+        if pool_indices:
+            try:
+                for page in page_ocr.iter_adaptive(path, page_indices=pool_indices, cancel=cancel):
+                    done.add(page["page"])
+                    yield "page", {**page, "source": "ocr"}
+            except Exception as exc:
+                logger.warning("OCR of scanned pages failed for %s: %s", path, exc)
 
-    def _pdf_digital(self, path: str) -> str:
-        """Extract text from a digital (text-based) PDF via pdfplumber."""
+        for i in scan_indices:
+            if i + 1 not in done:
+                # OCR failed or was cancelled — keep whatever little text layer there was
+                yield "page", self._digital_page(i + 1, digital[i], confidence=0.0)
+
+    def _pdf_digital_pages(self, path: str) -> List[str]:
+        """Per-page text layer of a PDF via pdfplumber ('' for pages without one)."""
         try:
             import pdfplumber
-            text = ""
             with pdfplumber.open(path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text
+                return [page.extract_text() or "" for page in pdf.pages]
         except Exception:
-            return ""
+            return []
 
-    def _pdf_scanned(self, path: str) -> Tuple[str, float]:
-        """Render scanned PDF pages at 300 DPI via PyMuPDF, then OCR with Tesseract."""
-        try:
-            import fitz  # PyMuPDF
-            all_text = []
-            all_conf: List[float] = []
-            doc = fitz.open(path)
-            for page in doc:
-                # Render at 300 DPI
-                pix = page.get_pixmap(dpi=300)
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                preprocessed = self._preprocess_image(img)
-                lang = getattr(settings, "OCR_LANGUAGE", "ind")
-                page_text = pytesseract.image_to_string(
-                    preprocessed, lang=lang, config=self.TESSERACT_CONFIG
-                )
-                all_text.append(page_text)
-                # Try to get confidence
-                try:
-                    data = pytesseract.image_to_data(
-                        preprocessed, lang=lang, output_type=pytesseract.Output.DICT
-                    )
-                    confs = [int(c) for c in data["conf"] if str(c).lstrip("-").isdigit() and int(c) >= 0]
-                    if confs:
-                        all_conf.append(sum(confs) / len(confs))
-                except Exception:
-                    pass
-            text = "\n".join(all_text)
-            avg_conf = sum(all_conf) / len(all_conf) if all_conf else 0.0
-            return text, round(avg_conf, 2)
-        except Exception:
-            return "", 0.0
+    @staticmethod
+    def _digital_page(number: int, text: str, confidence: float = 90.0) -> Dict[str, object]:
+        # Text-layer pages are treated as high confidence, as before
+        return {
+            "page": number, "text": text.strip(), "confidence": confidence,
+            "words": [], "lines": [], "source": "digital",
+        }
+
+    @staticmethod
+    def _merge_pages(pages: List[Dict[str, object]]) -> Tuple[str, float, List[Dict[str, object]]]:
+        """Join page texts in order; document confidence = mean over pages that produced text."""
+        text = "\n".join(p["text"] for p in pages if p["text"])
+        confs = [p["confidence"] for p in pages if p["confidence"] > 0]
+        avg_conf = sum(confs) / len(confs) if confs else 0.0
+        return text, round(avg_conf, 2), pages
 
     # ─────────────────────────────────────────────────────────────
     # Image handling
     # ─────────────────────────────────────────────────────────────
 
-    def _process_image(self, path: str) -> Tuple[str, float]:
-        """Preprocess image then run Tesseract."""
+    def _process_image(self, path: str, regions: bool = False) -> Dict[str, object]:
+        """
+        Preprocess image then run Tesseract once (text + confidence + boxes).
+        With `regions`, only the layout regions are OCR'd when recognised.
+        """
         img = Image.open(path).convert("RGB")
-        preprocessed = self._preprocess_image(img)
-        lang = getattr(settings, "OCR_LANGUAGE", "ind")
-        text = pytesseract.image_to_string(
-            preprocessed, lang=lang, config=self.TESSERACT_CONFIG
-        )
-        try:
-            data = pytesseract.image_to_data(
-                preprocessed, lang=lang, output_type=pytesseract.Output.DICT
-            )
-            confs = [int(c) for c in data["conf"] if str(c).lstrip("-").isdigit() and int(c) >= 0]
-            confidence = round(sum(confs) / len(confs), 2) if confs else 0.0
-        except Exception:
-            confidence = 0.0
-        return text, confidence
+        prepared = image_preprocess.preprocess(img)
+        result = None
+        if regions:
+            result = recognize_regions(prepared.image)
+            page_ocr.record_regions(result or {})
+        return {"page": 1, **(result or recognize(prepared.image)), "preprocess": prepared.summary()}
 
     # ─────────────────────────────────────────────────────────────
     # Image preprocessing (opencv pipeline)
     # ─────────────────────────────────────────────────────────────
 
     def _preprocess_image(self, img: Image.Image) -> Image.Image:
-        """
-        Apply opencv preprocessing to improve Tesseract accuracy:
-          1. Convert to grayscale
-          2. Upscale if image is too small
-          3. Adaptive threshold (binarisation)
-        Falls back to original PIL image if opencv is unavailable.
-        """
-        try:
-            import cv2
-            import numpy as np
-
-            img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-            gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-
-            # Upscale small images for better OCR
-            h, w = gray.shape
-            if h < 1000:
-                scale = 2
-                gray = cv2.resize(gray, (w * scale, h * scale), interpolation=cv2.INTER_CUBIC)
-
-            # Denoise slightly
-            gray = cv2.fastNlMeansDenoising(gray, h=10)
-
-            # Adaptive threshold — handles uneven lighting much better than Otsu
-            processed = cv2.adaptiveThreshold(
-                gray, 255,
-                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                cv2.THRESH_BINARY, 11, 2
-            )
-
-            return Image.fromarray(processed)
-        except ImportError:
-            # opencv not available — use PIL grayscale as fallback
-            return img.convert("L")
-        except Exception:
-            return img
+        """Adaptive opencv pipeline (see image_preprocess), shared with the page workers."""
+        return preprocess_image(img)
 
 
 # Singleton
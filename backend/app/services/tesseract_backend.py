@@ -0,0 +1,196 @@
+"""
+Tesseract Backends
+Two interchangeable ways to run Tesseract, selected with OCR_BACKEND:
+
+  - tesserocr   : long-lived engines through the Tesseract C API. Traineddata
+                  for OCR_LANGUAGE is loaded once per engine and images are
+                  passed in memory — no subprocess, no temp files.
+  - pytesseract : spawns the `tesseract` CLI per call (always available).
+  - auto        : tesserocr when installed, otherwise pytesseract.
+
+Both return pytesseract's Output.DICT shape from image_to_data(), so
+ocr_engine.build_layout() works unchanged on either.
+"""
+import logging
+import queue
+import re
+import threading
+from typing import Dict, List, Optional
+
+from PIL import Image
+import pytesseract
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_config(config: str) -> Dict[str, int]:
+    """Pull --psm / --oem out of a Tesseract CLI config string."""
+    opts = {}
+    for name in ("psm", "oem"):
+        m = re.search(rf"--{name}\s+(\d+)", config)
+        if m:
+            opts[name] = int(m.group(1))
+    return opts
+
+
+class PytesseractBackend:
+    """One `tesseract` subprocess per call (the original behaviour)."""
+
+    name = "pytesseract"
+
+    def __init__(self):
+        if settings.TESSERACT_CMD:
+            pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
+
+    def image_to_data(self, img: Image.Image, lang: str, config: str) -> Dict[str, list]:
+        return pytesseract.image_to_data(
+            img, lang=lang, config=config, output_type=pytesseract.Output.DICT
+        )
+
+    def warm_up(self, lang: str, config: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class TesserocrBackend:
+    """
+    Pool of warm tesserocr.PyTessBaseAPI engines.
+    Engines are not thread-safe, so each call checks one out of a queue;
+    at most OCR_ENGINE_POOL_SIZE engines exist per process.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, size: Optional[int] = None):
+        import tesserocr  # noqa: F401 — fail early if bindings are missing
+
+        self.size = size or settings.OCR_ENGINE_POOL_SIZE or 1
+        self._engines: "queue.Queue" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_engine(self, lang: str, config: str):
+        from tesserocr import PyTessBaseAPI
+
+        opts = _parse_config(config)
+        return PyTessBaseAPI(lang=lang, psm=opts.get("psm", 3), oem=opts.get("oem", 3))
+
+    def _acquire(self, lang: str, config: str):
+        # Engines are initialised once for OCR_LANGUAGE, which is fixed for the
+        # life of the process; --psm is applied per call in image_to_data().
+        with self._lock:
+            if self._engines.empty() and self._created < self.size:
+                self._created += 1
+                try:
+                    return self._new_engine(lang, config)
+                except BaseException:
+                    # Give the slot back, or later callers would wait for an engine that never comes
+                    self._created -= 1
+                    raise
+        return self._engines.get()
+
+    def _release(self, engine) -> None:
+        self._engines.put(engine)
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self._engines.get_nowait().End()
+            except queue.Empty:
+                break
+        self._created = 0
+
+    def image_to_data(self, img: Image.Image, lang: str, config: str) -> Dict[str, list]:
+        from tesserocr import RIL, iterate_level
+
+        data: Dict[str, List] = {
+            k: [] for k in ("text", "conf", "left", "top", "width", "height",
+                            "block_num", "par_num", "line_num")
+        }
+        psm = _parse_config(config).get("psm")
+        engine = self._acquire(lang, config)
+        try:
+            if psm is not None:
+                # Engines are shared across configs; the segmentation mode is per call
+                engine.SetPageSegMode(psm)
+            engine.SetImage(img)
+            engine.Recognize()
+            block = par = line = 0
+            for word in iterate_level(engine.GetIterator(), RIL.WORD):
+                if word.IsAtBeginningOf(RIL.BLOCK):
+                    block, par, line = block + 1, 0, 0
+                if word.IsAtBeginningOf(RIL.PARA):
+                    par, line = par + 1, 0
+                if word.IsAtBeginningOf(RIL.TEXTLINE):
+                    line += 1
+                box = word.BoundingBox(RIL.WORD)
+                if box is None:
+                    continue
+                x1, y1, x2, y2 = box
+                data["text"].append(word.GetUTF8Text(RIL.WORD) or "")
+                data["conf"].append(word.Confidence(RIL.WORD))
+                data["left"].append(x1)
+                data["top"].append(y1)
+                data["width"].append(x2 - x1)
+                data["height"].append(y2 - y1)
+                data["block_num"].append(block)
+                data["par_num"].append(par)
+                data["line_num"].append(line)
+        finally:
+            engine.Clear()
+            self._release(engine)
+        return data
+
+    def warm_up(self, lang: str, config: str) -> None:
+        """Initialise the pool up front so the first request does not pay for it."""
+        engines = [self._acquire(lang, config) for _ in range(self.size)]
+        for engine in engines:
+            self._release(engine)
+
+    def close(self) -> None:
+        with self._lock:
+            self._drain()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Per-process backend singleton, chosen from OCR_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend(settings.OCR_BACKEND.lower())
+    return _backend
+
+
+def _create_backend(choice: str):
+    if choice in ("auto", "tesserocr"):
+        try:
+            return TesserocrBackend()
+        except ImportError:
+            if choice == "tesserocr":
+                logger.error("OCR_BACKEND=tesserocr but tesserocr is not installed — using pytesseract")
+    return PytesseractBackend()
+
+
+def warm_up(lang: str, config: str) -> None:
+    """Create the backend and initialise its engines for `lang` / `config`."""
+    try:
+        get_backend().warm_up(lang, config)
+        logger.info("Tesseract backend ready: %s", get_backend().name)
+    except Exception as exc:
+        logger.warning("Tesseract warm-up failed: %s", exc)
+
+
+def shutdown() -> None:
+    global _backend
+    if _backend is not None:
+        _backend.close()
+        _backend = None
@@ -0,0 +1,271 @@
+"""
+Resumable Upload Service
+tus-style uploads for large bundled scans over unstable links:
+
+  create    POST   /uploads                 → upload_id, offset 0
+  append    PUT    /uploads/{id}            body = bytes starting at Upload-Offset
+  offset    HEAD   /uploads/{id}            → Upload-Offset / Upload-Length
+  finalize  POST   /uploads/{id}/finalize   → file moved into storage, /detect runs
+  terminate DELETE /uploads/{id}
+
+Partial files live in UPLOAD_DIR as {upload_id}.part. A dropped PUT keeps
+every byte already written: the client asks for the offset and resumes
+from there. Sessions idle for RESUMABLE_UPLOAD_TTL_HOURS are removed by
+cleanup_expired(), which the app lifespan runs periodically.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.executors import io_executor
+from app.database import SessionLocal
+from app.models.upload_session import StatusUpload, UploadSession
+from app.services.file_service import UPLOAD_CHUNK_SIZE, StoredUpload, file_service
+
+logger = logging.getLogger(__name__)
+
+
+def _open_at(path: Path, offset: int) -> BinaryIO:
+    """
+    Open a partial file for appending at `offset`. Bytes past it (written
+    before a crash, never recorded) are dropped so the file matches the
+    offset the client was told.
+    """
+    fh = open(path, "r+b")
+    fh.truncate(offset)
+    fh.seek(offset)
+    return fh
+
+
+def _unlink(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class ResumableUploadService:
+    """Upload sessions: partial file on disk, offset in upload_sessions."""
+
+    def __init__(self):
+        # One writer per upload in this process; the conditional offset
+        # update in append() catches a writer in another worker
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def upload_dir(self) -> Path:
+        path = Path(settings.UPLOAD_DIR)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def part_path(self, upload_id: str) -> Path:
+        return self.upload_dir / f"{upload_id}.part"
+
+    @staticmethod
+    def _expiry() -> datetime:
+        return datetime.utcnow() + timedelta(hours=settings.RESUMABLE_UPLOAD_TTL_HOURS)
+
+    def create(self, db: Session, kind: str, filename: str, length: int, user_id: int) -> UploadSession:
+        """Start a session for a file of `length` bytes."""
+        file_service.validate_filename(filename)
+        if length > settings.RESUMABLE_MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File exceeds the maximum size of {settings.RESUMABLE_MAX_FILE_SIZE // (1024 * 1024)}MB",
+            )
+        upload_id = str(uuid.uuid4())
+        self.part_path(upload_id).touch()
+        session = UploadSession(
+            upload_id=upload_id,
+            kind=kind,
+            original_filename=filename,
+            upload_length=length,
+            upload_offset=0,
+            status=StatusUpload.UPLOADING,
+            expires_at=self._expiry(),
+            created_by=user_id,
+        )
+        db.add(session)
+        db.commit()
+        db.refresh(session)
+        return session
+
+    @staticmethod
+    def get(db: Session, upload_id: str) -> Optional[UploadSession]:
+        return db.query(UploadSession).filter(
+            UploadSession.upload_id == upload_id,
+            UploadSession.deleted_at == None,
+        ).first()
+
+    @staticmethod
+    def _conflict(detail: str, offset: Optional[int] = None) -> HTTPException:
+        headers = {"Upload-Offset": str(offset)} if offset is not None else None
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail, headers=headers)
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            raise self._conflict("Upload is already being written by another request")
+        return lock
+
+    async def append(
+        self, db: Session, session: UploadSession, offset: int, body: AsyncIterator[bytes]
+    ) -> int:
+        """
+        Write `body` at `offset` and return the new offset. A body that ends
+        early (client gone) still counts: what arrived is kept and recorded.
+        Raises 409 if `offset` is not the current offset, 413 if the body
+        runs past the declared length (the part up to it is kept).
+        """
+        if session.status != StatusUpload.UPLOADING:
+            raise self._conflict("Upload is already finalized")
+        if offset != session.upload_offset:
+            raise self._conflict("Upload-Offset does not match the received size", session.upload_offset)
+
+        upload_id, length = session.upload_id, session.upload_length
+        path = self.part_path(upload_id)
+        if not path.exists():
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload expired")
+
+        db.commit()  # Hand the DB connection back while the body trickles in
+        too_long = False
+        async with self._lock(upload_id):
+            try:
+                fh = await io_executor.run(_open_at, path, offset)
+                written = 0
+                try:
+                    # Coalesce the small ASGI body chunks into UPLOAD_CHUNK_SIZE writes
+                    buffer = bytearray()
+                    async for chunk in body:
+                        room = length - offset - written - len(buffer)
+                        if len(chunk) > room:
+                            buffer += chunk[:room]
+                            too_long = True
+                            break
+                        buffer += chunk
+                        if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                            await io_executor.run(fh.write, bytes(buffer))
+                            written += len(buffer)
+                            buffer.clear()
+                    if buffer:
+                        await io_executor.run(fh.write, bytes(buffer))
+                        written += len(buffer)
+                finally:
+                    await io_executor.run(fh.close)
+                    # Record whatever reached the disk, even if the transfer broke off
+                    updated = db.query(UploadSession).filter(
+                        UploadSession.upload_id == upload_id,
+                        UploadSession.upload_offset == offset,
+                    ).update(
+                        {"upload_offset": offset + written, "expires_at": self._expiry()},
+                        synchronize_session=False,
+                    )
+                    db.commit()
+            finally:
+                self._locks.pop(upload_id, None)
+
+        if not updated:
+            raise self._conflict("Upload was moved on by another request")
+        db.refresh(session)
+        if too_long:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Body runs past the declared Upload-Length",
+                headers={"Upload-Offset": str(session.upload_offset)},
+            )
+        return session.upload_offset
+
+    async def finalize(self, db: Session, session: UploadSession) -> StoredUpload:
+        """
+        Move the complete file into storage. Repeating it (e.g. after the
+        response was lost) returns the same stored file.
+        """
+        if session.status == StatusUpload.FINALIZED:
+            return StoredUpload(session.file_path, session.file_type, session.upload_length, session.file_sha256)
+        if session.upload_offset != session.upload_length:
+            raise self._conflict(
+                f"Upload incomplete: {session.upload_offset} of {session.upload_length} bytes received",
+                session.upload_offset,
+            )
+
+        async with self._lock(session.upload_id):
+            try:
+                stored = await file_service.adopt_file(
+                    self.part_path(session.upload_id), session.original_filename,
+                    file_type=session.kind, date=datetime.now().date(),
+                )
+            finally:
+                self._locks.pop(session.upload_id, None)
+
+        session.status = StatusUpload.FINALIZED
+        session.file_path = stored.file_path
+        session.file_type = stored.mime_type
+        session.file_sha256 = stored.sha256
+        db.commit()
+        return stored
+
+    async def terminate(self, db: Session, session: UploadSession) -> None:
+        """Drop an unfinished upload and its partial file."""
+        if session.status == StatusUpload.UPLOADING:
+            await io_executor.run(_unlink, self.part_path(session.upload_id))
+        session.soft_delete()
+        db.commit()
+
+    # ─────────────────────────────────────────────────────────────
+    # TTL cleanup
+    # ─────────────────────────────────────────────────────────────
+
+    def cleanup_expired(self) -> int:
+        """
+        Remove expired unfinished sessions and their partial files, plus
+        .part files without a session (crash before the row was committed).
+        Blocking — run in a worker thread. Returns sessions removed.
+        """
+        db = SessionLocal()
+        try:
+            expired = db.query(UploadSession).filter(
+                UploadSession.status == StatusUpload.UPLOADING,
+                UploadSession.deleted_at == None,
+                UploadSession.expires_at < datetime.utcnow(),
+            ).all()
+            for session in expired:
+                _unlink(self.part_path(session.upload_id))
+                session.soft_delete()
+            db.commit()
+
+            cutoff = time.time() - settings.RESUMABLE_UPLOAD_TTL_HOURS * 3600
+            for path in self.upload_dir.glob("*.part"):
+                if path.stat().st_mtime < cutoff and self.get(db, path.stem) is None:
+                    _unlink(path)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        if expired:
+            logger.info("Removed %d expired upload session(s)", len(expired))
+        return len(expired)
+
+    async def run_cleanup(self) -> None:
+        """Run cleanup_expired() every RESUMABLE_CLEANUP_INTERVAL_SECONDS until cancelled."""
+        while True:
+            try:
+                await io_executor.run(self.cleanup_expired)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Upload cleanup failed: %s", exc)
+            await asyncio.sleep(settings.RESUMABLE_CLEANUP_INTERVAL_SECONDS)
+
+
+# Singleton
+upload_service = ResumableUploadService()
@@ -0,0 +1,10 @@
+"""
+Tasks package
+Background job queue for OCR + field detection
+"""
+from app.tasks.queue import job_queue, JobQueue
+
+__all__ = [
+    "job_queue",
+    "JobQueue",
+]
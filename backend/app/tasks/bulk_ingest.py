@@ -0,0 +1,450 @@
+"""
+Bulk Ingestion
+Registers a ZIP of scanned letters (optionally with a metadata CSV) as
+surat masuk rows. Runs as an ocr_jobs row with mode "bulk":
+
+  1. entries are streamed one by one out of the archive straight into
+     storage (the archive is never extracted as a whole), hashed on the way
+  2. BULK_WORKERS threads OCR the letters and detect their fields in
+     parallel (OCR pages fan out further to the OCR process pool); the
+     next batch is unpacked while the current one is OCR'd
+  3. every BULK_BATCH_SIZE letters the rows go in with one multi-row
+     INSERT, in the same transaction as their blob references and the
+     job's progress and report, so a restarted job continues after the
+     last committed batch
+
+A letter that cannot be registered (value too long for its column,
+unknown kategori_id, or an INSERT the database rejects; the batch is then
+retried row by row) fails on its own. Only errors that stop the whole run
+fail the job; POST /jobs/{job_id}/retry resumes it, trying the failed
+letters again. The uploaded ZIP and CSV are deleted once the job is done.
+
+CSV columns (header row, only `filename` is required) take precedence
+over detected values: filename, nomor_surat, tanggal_surat, tanggal_terima,
+pengirim, perihal, isi_singkat, kategori_id, priority. Dates are YYYY-MM-DD.
+
+The job result is the per-file report:
+    {options, total, processed, created, duplicate, failed, batches,
+     files: [{entry, status, file_token?, nomor_surat?, missing?, error?}]}
+"""
+import csv
+import logging
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.kategori import Kategori
+from app.models.ocr_job import OcrJob, StatusJob
+from app.models.surat_masuk import PrioritySurat, SuratMasuk
+from app.services.blob_service import blob_service
+from app.services.detection_service import detection_service
+from app.services.file_service import StoredUpload, file_service
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS = (
+    "filename", "nomor_surat", "tanggal_surat", "tanggal_terima", "pengirim",
+    "perihal", "isi_singkat", "kategori_id", "priority",
+)
+PLACEHOLDER = "-"  # Required text column neither in the CSV nor detected
+
+# (entry name, stored file, OCR + detect future, error)
+Pending = Tuple[str, Optional[StoredUpload], Optional[Future], Optional[str]]
+
+
+# ─────────────────────────────────────────────────────────────
+# Archive and metadata
+# ─────────────────────────────────────────────────────────────
+
+def archive_entries(zf: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Letters in the archive, in name order (folders and OS metadata skipped)."""
+    entries = []
+    for info in zf.infolist():
+        name = PurePosixPath(info.filename)
+        if info.is_dir() or "__MACOSX" in name.parts or name.name.startswith("."):
+            continue
+        entries.append(info)
+    return sorted(entries, key=lambda info: info.filename)
+
+
+def load_metadata(path: Path) -> Dict[str, Dict[str, str]]:
+    """CSV rows keyed by lower-cased file name (without folders)."""
+    rows: Dict[str, Dict[str, str]] = {}
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        sample = fh.read(4096)
+        fh.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel  # Single column or nothing to go by
+        for row in csv.DictReader(fh, dialect=dialect):
+            row = {
+                (key or "").strip().lower(): (value or "").strip()
+                for key, value in row.items()
+                if (key or "").strip().lower() in CSV_COLUMNS
+            }
+            if row.get("filename"):
+                rows[PurePosixPath(row["filename"]).name.lower()] = row
+    return rows
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
+# ─────────────────────────────────────────────────────────────
+# Rows
+# ─────────────────────────────────────────────────────────────
+
+def build_row(
+    stored: StoredUpload,
+    entry: str,
+    result: Dict[str, Any],
+    meta: Dict[str, str],
+    options: Dict[str, Any],
+    user_id: int,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    surat_masuk column values for one letter: CSV, then detected value,
+    then the upload defaults. Returns (row, required fields left blank).
+    """
+    detected = result.get("detected") or {}
+    missing: List[str] = []
+
+    def pick(field: str) -> Optional[str]:
+        if meta.get(field):
+            return meta[field]
+        found = detected.get(field) or {}
+        return found.get("value") if found.get("detected") else None
+
+    def required(field: str, limit: int) -> str:
+        value = pick(field)
+        if not value:
+            missing.append(field)
+            return PLACEHOLDER
+        return value[:limit]
+
+    tanggal_terima = _parse_date(meta.get("tanggal_terima")) or date.fromisoformat(options["tanggal_terima"])
+    tanggal_surat = _parse_date(pick("tanggal_surat"))
+    if tanggal_surat is None:
+        missing.append("tanggal_surat")
+        tanggal_surat = tanggal_terima
+
+    nomor_surat = pick("nomor_surat")
+    if not nomor_surat:
+        missing.append("nomor_surat")
+        nomor_surat = f"SM/{datetime.now().strftime('%Y%m%d%H%M%S')}"  # Same placeholder as the form
+
+    kategori_id = meta.get("kategori_id") or options.get("kategori_id")
+    priority = (meta.get("priority") or options.get("priority") or "sedang").lower()
+    if priority not in {p.value for p in PrioritySurat}:
+        priority = "sedang"
+
+    ocr_text = result.get("ocr_text") or None
+    row = {
+        "nomor_surat": nomor_surat[:100],
+        "tanggal_surat": tanggal_surat,
+        "tanggal_terima": tanggal_terima,
+        "pengirim": required("pengirim", 255),
+        "perihal": required("perihal", 500),
+        "isi_singkat": pick("isi_singkat"),
+        "kategori_id": int(kategori_id) if kategori_id else None,
+        "priority": PrioritySurat(priority),
+        "file_path": stored.file_path,
+        "file_type": stored.mime_type,
+        "file_size": stored.file_size,
+        "original_filename": PurePosixPath(entry).name[:255],
+        "ocr_text": ocr_text,
+        "ocr_confidence": result.get("ocr_confidence") or None,
+        "keywords": (result.get("keywords") or None) if ocr_text else None,
+        "created_by": user_id,
+    }
+    check_row(row)
+    return row, missing
+
+
+def check_row(row: Dict[str, Any]) -> None:
+    """
+    Raise ValueError for a value its surat_masuk column cannot hold (e.g. the
+    71-character .docx MIME type in file_type): strict mode would reject the
+    whole batch INSERT for it.
+    """
+    for column, value in row.items():
+        limit = getattr(SuratMasuk.__table__.c[column].type, "length", None)
+        if limit and isinstance(value, str) and len(value) > limit:
+            raise ValueError(f"{column} is too long ({len(value)} > {limit} characters)")
+
+
+def _fail(item: Dict[str, Any], error: str) -> None:
+    """Turn a report item that was going to be created into a failure."""
+    item.pop("file_token", None)  # Unreferenced blob, left to blob_storage.py gc
+    item.update(status="failed", error=error[:500])
+
+
+# ─────────────────────────────────────────────────────────────
+# Job
+# ─────────────────────────────────────────────────────────────
+
+class BulkIngest:
+    """One run of a bulk job; see the module docstring."""
+
+    def __init__(self, job: OcrJob):
+        self.job_id = job.job_id
+        self.kind = job.kind
+        self.method = job.method
+        self.archive = job.file_path
+        self.user_id = job.created_by
+        self.report: Dict[str, Any] = dict(job.result or {})
+        self.options: Dict[str, Any] = self.report.get("options") or {}
+        # Entries committed by an earlier (interrupted or failed) run; failed ones are tried again
+        self.report["files"] = [item for item in self.report.get("files", []) if item["status"] != "failed"]
+        self.done = {item["entry"] for item in self.report["files"]}
+        self.hashes = {item["sha256"] for item in self.report["files"] if item.get("sha256")}
+        self.metadata: Dict[str, Dict[str, str]] = {}
+
+    def _detect(self, stored: StoredUpload) -> Dict[str, Any]:
+        return detection_service.run(
+            self.kind, stored.file_path, stored.mime_type, self.method, file_hash=stored.sha256
+        )
+
+    def _unpack(
+        self, zf: zipfile.ZipFile, batch: List[zipfile.ZipInfo], pool: ThreadPoolExecutor
+    ) -> List[Pending]:
+        """Store each entry of the batch and queue its OCR; failures are kept per entry."""
+        pending: List[Pending] = []
+        for info in batch:
+            try:
+                if info.flag_bits & 0x1:
+                    raise ValueError("Encrypted entries are not supported")
+                if info.file_size > settings.MAX_FILE_SIZE:
+                    raise ValueError(
+                        f"File exceeds the maximum size of {settings.MAX_FILE_SIZE // (1024 * 1024)}MB"
+                    )
+                with zf.open(info) as source:  # Size is checked again while copying
+                    stored = file_service.store_fileobj(
+                        source, PurePosixPath(info.filename).name, self.kind, datetime.now().date()
+                    )
+            except HTTPException as exc:
+                pending.append((info.filename, None, None, str(exc.detail)))
+                continue
+            except Exception as exc:
+                pending.append((info.filename, None, None, str(exc)[:500]))
+                continue
+            if stored.sha256 in self.hashes:  # Same blob as an earlier entry: nothing extra stored
+                pending.append((info.filename, stored, None, "duplicate"))
+                continue
+            self.hashes.add(stored.sha256)
+            pending.append((info.filename, stored, pool.submit(self._detect, stored), None))
+        return pending
+
+    def _commit(self, pending: List[Pending], batch_no: int) -> None:
+        """Wait for the batch's OCR, insert its rows and record the report in one transaction."""
+        created: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []  # (row, report item)
+        items: List[Dict[str, Any]] = []
+        for entry, stored, future, error in pending:
+            item: Dict[str, Any] = {"entry": entry}
+            if stored is not None:
+                item["sha256"] = stored.sha256
+            if error == "duplicate":
+                item["status"] = "duplicate"
+            elif error:
+                item.update(status="failed", error=error)
+            else:
+                try:
+                    result = future.result()
+                    meta = self.metadata.get(PurePosixPath(entry).name.lower(), {})
+                    row, missing = build_row(stored, entry, result, meta, self.options, self.user_id)
+                except Exception as exc:
+                    logger.warning("Bulk job %s: %s failed: %s", self.job_id, entry, exc)
+                    item.update(status="failed", error=str(exc)[:500])
+                else:
+                    created.append((row, item))
+                    item.update(status="created", file_token=stored.file_path, nomor_surat=row["nomor_surat"])
+                    if missing:
+                        item["missing"] = missing
+            items.append(item)
+
+        recorded = False
+        db = SessionLocal()
+        try:
+            created = self._drop_unknown_kategori(db, created)
+            if created:
+                try:
+                    with db.begin_nested():
+                        self._insert(db, created)
+                except SQLAlchemyError as exc:
+                    # Something check_row() does not know about: find the row(s) one by one
+                    logger.warning("Bulk job %s: batch %d insert failed, retrying per row: %s",
+                                   self.job_id, batch_no, exc)
+                    for pair in created:
+                        try:
+                            with db.begin_nested():
+                                self._insert(db, [pair])
+                        except SQLAlchemyError as row_exc:
+                            _fail(pair[1], f"Database insert failed: {getattr(row_exc, 'orig', row_exc)}")
+            self.report["files"].extend(items)
+            recorded = True
+            self._summarize(batch_no)
+            db.query(OcrJob).filter(OcrJob.job_id == self.job_id).update({
+                "progress": min(99, 100 * self.report["processed"] // max(1, self.report["total"])),
+                "stage": f"batch {batch_no}/{self.report['batches']}",
+                "result": self.report,
+            })
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Keep the report truthful: the batch's letters were not registered
+            if recorded:
+                del self.report["files"][-len(items):]
+            for item in items:
+                if item["status"] == "created":
+                    _fail(item, "Database insert failed")
+            self.report["files"].extend(items)
+            self._summarize(batch_no)
+            raise
+        finally:
+            db.close()
+
+    def _drop_unknown_kategori(
+        self, db, created: List[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Fail rows whose kategori_id does not exist instead of letting the FK reject the batch."""
+        wanted = {row["kategori_id"] for row, _ in created if row["kategori_id"] is not None}
+        known = set()
+        if wanted:
+            known = {kategori_id for (kategori_id,) in db.query(Kategori.id).filter(Kategori.id.in_(wanted))}
+        kept = []
+        for row, item in created:
+            if row["kategori_id"] is not None and row["kategori_id"] not in known:
+                _fail(item, f"Unknown kategori_id {row['kategori_id']}")
+            else:
+                kept.append((row, item))
+        return kept
+
+    def _insert(self, db, created: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+        """One INSERT ... VALUES (...), (...) for the rows, then their blob references."""
+        rows = [row for row, _ in created]
+        first_id = db.execute(insert(SuratMasuk).values(rows)).lastrowid
+        # Read the ids back rather than counting up from LAST_INSERT_ID(): the step
+        # is auto_increment_increment, not 1, on Galera / multi-primary setups.
+        # Paths are unique within a job (duplicates are skipped), and earlier
+        # rows with the same file are excluded by id.
+        ids: Dict[str, int] = {}
+        for record_id, file_path in (
+            db.query(SuratMasuk.id, SuratMasuk.file_path)
+            .filter(
+                SuratMasuk.id >= first_id,
+                SuratMasuk.created_by == self.user_id,
+                SuratMasuk.file_path.in_([row["file_path"] for row in rows]),
+            )
+            .order_by(SuratMasuk.id)
+        ):
+            ids.setdefault(file_path, record_id)
+        for row in rows:
+            blob_service.acquire(db, "surat_masuk", ids[row["file_path"]], row["file_path"])
+
+    def _summarize(self, batch_no: int) -> None:
+        files = self.report["files"]
+        self.report["processed"] = len(files)
+        for key in ("created", "duplicate", "failed"):
+            self.report[key] = sum(1 for item in files if item["status"] == key)
+        self.report["batches_done"] = batch_no
+
+    def run(self) -> Dict[str, Any]:
+        meta_path = self.options.get("metadata")
+        if meta_path:
+            self.metadata = load_metadata(Path(meta_path))
+
+        with zipfile.ZipFile(self.archive) as zf:
+            entries = archive_entries(zf)
+            if len(entries) > settings.BULK_MAX_FILES:
+                raise ValueError(f"Archive holds {len(entries)} files, the limit is {settings.BULK_MAX_FILES}")
+            size = max(1, settings.BULK_BATCH_SIZE)
+            batches = [entries[i:i + size] for i in range(0, len(entries), size)]
+            self.report.update(total=len(entries), batches=len(batches))
+
+            with ThreadPoolExecutor(
+                max_workers=max(1, settings.BULK_WORKERS), thread_name_prefix="bulk-ocr"
+            ) as pool:
+                # Unpack batch N+1 while batch N is being OCR'd
+                in_flight: deque = deque()
+                for batch_no, batch in enumerate(batches, start=1):
+                    todo = [info for info in batch if info.filename not in self.done]
+                    if not todo:
+                        continue
+                    in_flight.append((self._unpack(zf, todo, pool), batch_no))
+                    if len(in_flight) > 1:
+                        self._commit(*in_flight.popleft())
+                while in_flight:
+                    self._commit(*in_flight.popleft())
+
+        self._summarize(len(batches))
+        return self.report
+
+
+def _remove_uploads(ingest: BulkIngest) -> None:
+    """The archive and CSV are not needed once the job has finished."""
+    for path in (ingest.archive, ingest.options.get("metadata")):
+        if path:
+            file_service.delete_file(path)
+
+
+def run_bulk_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Execute (or resume) a bulk ingestion job."""
+    db = SessionLocal()
+    try:
+        job = db.query(OcrJob).filter(OcrJob.job_id == job_id).first()
+        if not job:
+            logger.error("Bulk job %s not found", job_id)
+            return None
+        job.status = StatusJob.RUNNING
+        job.stage = "started"
+        job.error = None
+        db.commit()
+        ingest = BulkIngest(job)
+    finally:
+        db.close()
+
+    try:
+        report = ingest.run()
+    except Exception as exc:
+        logger.exception("Bulk job %s failed", job_id)
+        db = SessionLocal()
+        try:
+            db.query(OcrJob).filter(OcrJob.job_id == job_id).update({
+                "status": StatusJob.FAILED, "stage": "failed",
+                "error": str(exc)[:2000], "result": ingest.report,
+            })
+            db.commit()
+        finally:
+            db.close()
+        return None  # Uploads are kept for POST /jobs/{job_id}/retry
+
+    db = SessionLocal()
+    try:
+        db.query(OcrJob).filter(OcrJob.job_id == job_id).update({
+            "status": StatusJob.DONE, "progress": 100, "stage": "done", "result": report,
+        })
+        db.commit()
+    finally:
+        db.close()
+    _remove_uploads(ingest)
+    logger.info(
+        "Bulk job %s: %d created, %d duplicate, %d failed",
+        job_id, report["created"], report["duplicate"], report["failed"],
+    )
+    return report
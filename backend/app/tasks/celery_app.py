@@ -0,0 +1,20 @@
+"""
+Celery application (used when JOB_QUEUE_BACKEND=celery)
+Start a worker from the backend/ directory:
+    celery -A app.tasks.celery_app worker --loglevel=info
+"""
+from celery import Celery
+
+from app.core.config import settings
+from app.tasks.detect_jobs import run_detect_job
+
+celery_app = Celery("arsipsurat", broker=settings.REDIS_URL, backend=settings.REDIS_URL)
+celery_app.conf.update(
+    task_acks_late=True,  # a crashed worker's job goes back on the queue
+    worker_prefetch_multiplier=1,  # OCR jobs are long; don't hoard them
+)
+
+
+@celery_app.task(name="detect.run")
+def detect_job_task(job_id: str):
+    run_detect_job(job_id)
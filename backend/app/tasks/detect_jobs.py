@@ -0,0 +1,391 @@
+"""
+Detect Jobs
+OCR + field-detection work executed outside the request cycle.
+Job state lives in the ocr_jobs table so any API worker can report it.
+
+Job modes:
+  detect   — OCR + field detection (/detect with background=true)
+  fulltext — OCR of the whole document after a header-first /detect; the
+             text is attached to the surat row confirmed with its job id
+  enrich   — the AI answer of a hybrid /detect that ran past its latency
+             budget; it fills fields left blank on the surat row
+             confirmed with its job id
+  bulk     — a ZIP of letters registered as surat masuk rows (bulk_ingest)
+"""
+import asyncio
+import logging
+import re
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.ocr_job import OcrJob, StatusJob
+from app.models.surat_keluar import SuratKeluar
+from app.models.surat_masuk import SuratMasuk
+from app.services.ai_extraction_service import ai_extraction_service
+from app.services.detection_service import DETECT_FIELDS, detection_service
+from app.services.file_service import StoredUpload
+from app.services.ocr_service import ocr_service
+from app.tasks.bulk_ingest import run_bulk_job
+from app.tasks.queue import job_queue
+
+logger = logging.getLogger(__name__)
+
+SURAT_MODELS = {"surat_masuk": SuratMasuk, "surat_keluar": SuratKeluar}
+
+# Columns an enrich job may fill, and only while they are blank
+ENRICH_COLUMNS = {"surat_masuk": ("nomor_surat", "isi_singkat"), "surat_keluar": ("isi_singkat",)}
+AUTO_NOMOR = re.compile(r"SM/\d{14}")  # Placeholder set by create_surat_masuk
+
+# AI calls still running for enrich jobs (asyncio keeps only weak references)
+_pending_ai = set()
+
+
+def create_job(
+    db: Session,
+    kind: str,
+    method: str,
+    file_path: str,
+    mime_type: str,
+    file_size: int,
+    original_filename: str,
+    user_id: int,
+    mode: str = "detect",
+    result: Optional[Dict[str, Any]] = None,
+) -> OcrJob:
+    """
+    Insert a queued job row (commit is done here so workers can see it).
+    `result` seeds the row, e.g. with the options of a bulk job.
+    """
+    job = OcrJob(
+        job_id=str(uuid.uuid4()),
+        kind=kind,
+        method=method,
+        mode=mode,
+        file_path=file_path,
+        file_type=mime_type,
+        file_size=file_size,
+        original_filename=original_filename,
+        status=StatusJob.QUEUED,
+        progress=0,
+        result=result,
+        created_by=user_id,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def job_to_response(job: OcrJob) -> Dict[str, Any]:
+    """Shape a job row like the synchronous /detect response plus job status."""
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "method": job.method,
+        "mode": job.mode,
+        "status": job.status,
+        "progress": job.progress,
+        "stage": job.stage,
+        "file_token": job.file_path,
+        "file_size": job.file_size,
+        "original_filename": job.original_filename,
+        "mime_type": job.file_type,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+def _update(job_id: str, **values) -> None:
+    """Write progress in its own short transaction."""
+    db = SessionLocal()
+    try:
+        db.query(OcrJob).filter(OcrJob.job_id == job_id).update(values)
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        logger.warning("Failed to update job %s: %s", job_id, exc)
+    finally:
+        db.close()
+
+
+def run_detect_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Execute one detect job. Safe to call from a thread, a Celery worker,
+    or again after a crash (a job that is already done is skipped).
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(OcrJob).filter(OcrJob.job_id == job_id).first()
+        if not job:
+            logger.error("Detect job %s not found", job_id)
+            return None
+        if job.status == StatusJob.DONE:
+            return job.result
+        kind, file_path, mime_type, method = job.kind, job.file_path, job.file_type, job.method
+        mode = job.mode
+    finally:
+        db.close()
+
+    if mode == "fulltext":
+        return _run_fulltext_job(job_id, kind, file_path, mime_type)
+    if mode == "enrich":
+        return _run_enrich_job(job_id, kind, file_path)
+    if mode == "bulk":
+        return run_bulk_job(job_id)
+
+    _update(job_id, status=StatusJob.RUNNING, progress=1, stage="started", error=None)
+
+    def progress(pct: int, stage: str) -> None:
+        _update(job_id, progress=pct, stage=stage)
+
+    try:
+        result = detection_service.run(kind, file_path, mime_type, method, progress=progress)
+    except Exception as exc:
+        logger.exception("Detect job %s failed", job_id)
+        _update(job_id, status=StatusJob.FAILED, stage="failed", error=str(exc)[:2000])
+        return None
+
+    _update(job_id, status=StatusJob.DONE, progress=100, stage="done", result=result)
+    return result
+
+
+async def detect_upload(
+    db: Session,
+    kind: str,
+    stored: StoredUpload,
+    original_filename: str,
+    method: str,
+    user_id: int,
+    header_first: bool = False,
+    background: bool = False,
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    The /detect flow for a file already in storage (direct or resumable upload).
+    Returns (payload, queued); with background=True a detect job is queued
+    and its job_to_response() is returned with queued=True.
+    Otherwise OCR runs in a worker thread and the AI call (if any) on the
+    async client; enrich/fulltext jobs are created for hybrid answers past
+    the latency budget and for the pages skipped by header-first.
+    """
+    file_path, mime_type, file_size = stored.file_path, stored.mime_type, stored.file_size
+    if background:
+        job = create_job(
+            db, kind, method, file_path, mime_type, file_size, original_filename, user_id,
+        )
+        job_queue.enqueue(job.job_id)
+        return job_to_response(job), True
+
+    result, ai_pending = await detection_service.arun(
+        kind, file_path, mime_type, method,
+        max_pages=settings.OCR_HEADER_PAGES if header_first else None,
+        file_hash=stored.sha256,
+    )
+    if ai_pending is not None:
+        # Hybrid ran out of its latency budget: the AI answer enriches the record later
+        job = create_job(
+            db, kind, method, file_path, mime_type, file_size,
+            original_filename, user_id, mode="enrich",
+        )
+        track_enrichment(job.job_id, kind, ai_pending)
+        result["enrich_job_id"] = job.job_id
+    if not result.get("ocr_complete", True):
+        # Header-first: finish the remaining pages in the background
+        job = create_job(
+            db, kind, method, file_path, mime_type, file_size,
+            original_filename, user_id, mode="fulltext",
+        )
+        job_queue.enqueue(job.job_id)
+        result["fulltext_job_id"] = job.job_id
+    return {
+        "file_token": file_path,
+        "file_size": file_size,
+        "sha256": stored.sha256,
+        "original_filename": original_filename,
+        "mime_type": mime_type,
+        **result,
+    }, False
+
+
+# ─────────────────────────────────────────────────────────────
+# Full-text OCR after a header-first detect
+# ─────────────────────────────────────────────────────────────
+
+def _run_fulltext_job(job_id: str, kind: str, file_path: str, mime_type: str) -> Optional[Dict[str, Any]]:
+    """OCR every page, store the text on the job, then on the saved record (if any)."""
+    _update(job_id, status=StatusJob.RUNNING, progress=1, stage="ocr", error=None)
+    ocr_result: Dict[str, Any] = {}
+    total, seen = 1, set()
+    try:
+        for event, data in ocr_service.iter_process(file_path, mime_type):
+            if event == "start":
+                total = max(1, data["pages"])
+            elif event == "page" and data["page"] not in seen:
+                seen.add(data["page"])
+                _update(job_id, progress=min(95, 100 * len(seen) // total))
+            elif event == "done":
+                ocr_result = data
+    except Exception as exc:
+        logger.exception("Full-text job %s failed", job_id)
+        _update(job_id, status=StatusJob.FAILED, stage="failed", error=str(exc)[:2000])
+        return None
+
+    result = {
+        "ocr_text": ocr_result.get("text", ""),
+        "ocr_confidence": ocr_result.get("confidence"),
+        "keywords": ocr_result.get("keywords", []),
+        "ocr_complete": True,
+    }
+    _update(job_id, status=StatusJob.DONE, progress=100, stage="done", result=result)
+
+    # The record may already have been confirmed while OCR was running
+    db = SessionLocal()
+    try:
+        attach_fulltext(db, job_id)
+    finally:
+        db.close()
+    return result
+
+
+def _linked_job(db: Session, job_id: str, mode: str, record: Any = None) -> Optional[OcrJob]:
+    """
+    The `mode` job `job_id`. Given the saved surat `record` (confirm
+    endpoints) the job is first linked to it, provided the record was saved
+    from the job's file; the job itself passes none and uses the stored link.
+    """
+    job = db.query(OcrJob).filter(OcrJob.job_id == job_id, OcrJob.mode == mode).first()
+    if not job or job.kind not in SURAT_MODELS:
+        return None
+    if record is not None:
+        if record.__tablename__ != job.kind or record.file_path != job.file_path:
+            return None
+        job.surat_id = record.id
+        db.commit()  # Visible to the job before it checks, whichever finishes last
+    return job
+
+
+def attach_fulltext(db: Session, job_id: str, record: Any = None) -> bool:
+    """
+    Copy full-text job `job_id`'s OCR result onto the surat row it is
+    linked to (see _linked_job). Called both by the job and by the confirm
+    endpoints, so the text lands whichever of the two finishes last.
+    Returns True if updated.
+    """
+    try:
+        job = _linked_job(db, job_id, "fulltext", record)
+        if (
+            not job or job.surat_id is None or job.status != StatusJob.DONE
+            or not job.result or not job.result.get("ocr_text")
+        ):
+            return False
+        model = SURAT_MODELS[job.kind]
+        updated = (
+            db.query(model)
+            .filter(model.id == job.surat_id, model.deleted_at == None)
+            .update(
+                {
+                    "ocr_text": job.result["ocr_text"],
+                    "ocr_confidence": job.result.get("ocr_confidence") or None,
+                    "keywords": job.result.get("keywords") or None,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        return bool(updated)
+    except Exception as exc:
+        db.rollback()
+        logger.warning("Failed to attach full OCR text of job %s: %s", job_id, exc)
+        return False
+
+
+# ─────────────────────────────────────────────────────────────
+# AI enrichment after a hybrid detect ran out of budget
+# ─────────────────────────────────────────────────────────────
+
+def track_enrichment(job_id: str, kind: str, task: asyncio.Task) -> None:
+    """
+    Finish enrich job `job_id` from an AI call that is still running after
+    /detect returned. Must be called on the event loop that owns `task`.
+    If the process stops first, the job is re-run by job_queue.recover().
+    """
+    _update(job_id, status=StatusJob.RUNNING, progress=50, stage="ai", error=None)
+    loop = asyncio.get_running_loop()
+    _pending_ai.add(task)
+
+    def done(t: asyncio.Task) -> None:
+        _pending_ai.discard(t)
+        ai_result = None if t.cancelled() or t.exception() else t.result()
+        # DB writes off the event loop
+        loop.run_in_executor(None, complete_enrichment, job_id, kind, ai_result)
+
+    task.add_done_callback(done)
+
+
+def _run_enrich_job(job_id: str, kind: str, file_path: str) -> Optional[Dict[str, Any]]:
+    """Re-run the AI call of an enrich job whose original call was lost."""
+    _update(job_id, status=StatusJob.RUNNING, progress=50, stage="ai", error=None)
+    return complete_enrichment(job_id, kind, ai_extraction_service.extract_from_file(file_path))
+
+
+def complete_enrichment(job_id: str, kind: str, ai_result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Store the AI fields on the job, then on the saved record (if any)."""
+    error = ai_result.pop("_error", None) if ai_result is not None else {"message": "AI call did not finish"}
+    if error:
+        _update(job_id, status=StatusJob.FAILED, stage="failed", error=str(error.get("message"))[:2000])
+        return None
+
+    result = {"detected": {f: ai_result.get(f, {"value": None, "detected": False}) for f in DETECT_FIELDS[kind]}}
+    _update(job_id, status=StatusJob.DONE, progress=100, stage="done", result=result)
+
+    # The record may already have been confirmed while the AI was answering
+    db = SessionLocal()
+    try:
+        attach_enrichment(db, job_id)
+    finally:
+        db.close()
+    return result
+
+
+def _is_blank(column: str, value: Any) -> bool:
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return True
+    return column == "nomor_surat" and bool(AUTO_NOMOR.fullmatch(str(value)))
+
+
+def attach_enrichment(db: Session, job_id: str, record: Any = None) -> bool:
+    """
+    Fill blank ENRICH_COLUMNS of the surat row linked to enrich job
+    `job_id` from its AI answer. Values the user entered are never
+    overwritten. Like attach_fulltext(), called by both the job and the
+    confirm endpoints. Returns True if a column was filled.
+    """
+    try:
+        job = _linked_job(db, job_id, "enrich", record)
+        if not job or job.surat_id is None or job.status != StatusJob.DONE or not job.result:
+            return False
+        kind = job.kind
+        model = SURAT_MODELS[kind]
+        record = db.query(model).filter(model.id == job.surat_id, model.deleted_at == None).first()
+        if record is None:
+            return False
+        detected = job.result.get("detected") or {}
+        filled = False
+        for column in ENRICH_COLUMNS.get(kind, ()):
+            field = detected.get(column) or {}
+            if field.get("detected") and _is_blank(column, getattr(record, column)):
+                limit = getattr(model.__table__.c[column].type, "length", None)
+                setattr(record, column, str(field["value"]).strip()[:limit])
+                filled = True
+        if filled:
+            db.commit()
+        return filled
+    except Exception as exc:
+        db.rollback()
+        logger.warning("Failed to attach AI fields of job %s: %s", job_id, exc)
+        return False
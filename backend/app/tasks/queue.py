@@ -0,0 +1,110 @@
+"""
+Job Queue
+Dispatches detect jobs to a backend chosen with JOB_QUEUE_BACKEND:
+
+  - inprocess : bounded thread pool inside the API process (no Redis needed).
+                Jobs are persisted in ocr_jobs, so queued/running jobs left
+                behind by a restart are picked up again on startup.
+  - celery    : Celery worker fed through REDIS_URL (see app.tasks.celery_app).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InProcessBackend:
+    """Runs jobs on a thread pool; OCR pages still fan out to the OCR process pool."""
+
+    name = "inprocess"
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or settings.JOB_WORKERS
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="detect-job"
+            )
+        return self._executor
+
+    def submit(self, job_id: str) -> None:
+        from app.tasks.detect_jobs import run_detect_job
+
+        self._get_executor().submit(run_detect_job, job_id)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class CeleryBackend:
+    """Sends jobs to Celery workers (`celery -A app.tasks.celery_app worker`)."""
+
+    name = "celery"
+
+    def submit(self, job_id: str) -> None:
+        from app.tasks.celery_app import detect_job_task
+
+        detect_job_task.delay(job_id)
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JobQueue:
+    """Facade over the configured backend."""
+
+    def __init__(self):
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            choice = settings.JOB_QUEUE_BACKEND.lower()
+            self._backend = CeleryBackend() if choice == "celery" else InProcessBackend()
+        return self._backend
+
+    def enqueue(self, job_id: str) -> None:
+        self.backend.submit(job_id)
+
+    def recover(self) -> List[str]:
+        """
+        Re-submit jobs that were queued or running when the process stopped.
+        Only meaningful for the in-process backend; Celery keeps its own queue.
+        """
+        if self.backend.name != "inprocess":
+            return []
+
+        from app.database import SessionLocal
+        from app.models.ocr_job import OcrJob, StatusJob
+
+        db = SessionLocal()
+        try:
+            job_ids = [
+                row.job_id for row in db.query(OcrJob.job_id).filter(
+                    OcrJob.status.in_([StatusJob.QUEUED, StatusJob.RUNNING]),
+                    OcrJob.deleted_at == None,
+                ).all()
+            ]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            self.enqueue(job_id)
+        if job_ids:
+            logger.info("Re-queued %d unfinished detect job(s)", len(job_ids))
+        return job_ids
+
+    def shutdown(self) -> None:
+        if self._backend is not None:
+            self._backend.shutdown()
+
+
+# Singleton
+job_queue = JobQueue()
@@ -0,0 +1,87 @@
+"""
+Server-Sent Events helpers
+Bridges a blocking (event, data) generator — run in a worker thread — to
+a StreamingResponse. When the client disconnects the shared cancel event
+is set, so the producer stops at its next checkpoint instead of finishing
+work nobody will read.
+"""
+import asyncio
+import json
+import threading
+from typing import Any, AsyncIterator, Callable, Iterable, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+KEEPALIVE_SECONDS = 15.0
+
+Event = Tuple[str, Any]
+_END = object()
+
+
+def format_sse(event: str, data: Any) -> str:
+    """One SSE frame: `event:` line plus a single-line JSON `data:` payload."""
+    payload = json.dumps(jsonable_encoder(data), ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_events(
+    request: Request,
+    produce: Callable[[threading.Event], Iterable[Event]],
+    first: Iterable[Event] = (),
+) -> AsyncIterator[str]:
+    """
+    Run `produce(cancel)` in a thread and yield its events as SSE frames.
+    `first` events are sent before the producer starts. Errors raised by the
+    producer are sent as an "error" event.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancel = threading.Event()
+
+    def pump() -> None:
+        try:
+            for item in produce(cancel):
+                if cancel.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as exc:
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", {"message": str(exc)}))
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _END)
+
+    for event, data in first:
+        yield format_sse(event, data)
+
+    worker = loop.run_in_executor(None, pump)
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # Comment frame keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            if item is _END:
+                break
+            yield format_sse(*item)
+    finally:
+        # Normal end, client disconnect or task cancellation
+        cancel.set()
+        if worker.done():
+            worker.exception()
+
+
+def sse_response(
+    request: Request,
+    produce: Callable[[threading.Event], Iterable[Event]],
+    first: Iterable[Event] = (),
+) -> StreamingResponse:
+    return StreamingResponse(
+        stream_events(request, produce, first),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
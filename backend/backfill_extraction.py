@@ -0,0 +1,173 @@
+"""
+Re-run field extraction over stored surat_masuk.ocr_text
+Run after changing extraction rules (and bumping EXTRACTION_VERSION):
+
+Usage:
+    python backfill_extraction.py                  # resume / start the backfill
+    python backfill_extraction.py --workers 8 --chunk-size 2000
+    python backfill_extraction.py --reset          # ignore the checkpoint, start over
+    python backfill_extraction.py --force          # also redo rows already at this version
+    python backfill_extraction.py --dry-run --limit 5000
+
+Rows are read in id order in chunks (keyset pagination, only id + ocr_text),
+extracted in a process pool while the next chunk is fetched, and written
+back with one bulk UPDATE per chunk into extracted_fields /
+extraction_version. User-confirmed columns (nomor_surat, pengirim, ...) are
+never touched. After every chunk the last id is saved to the checkpoint
+file, so an interrupted run continues where it stopped.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import or_
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.surat_masuk import SuratMasuk
+from app.services.extraction_service import EXTRACTION_VERSION, extraction_service
+
+DEFAULT_CHECKPOINT = Path(settings.STORAGE_DIR) / "backfill_extraction.json"
+
+
+# ─────────────────────────────────────────────────────────────
+# Checkpoint
+# ─────────────────────────────────────────────────────────────
+
+def load_checkpoint(path: Path, reset: bool = False) -> Dict[str, Any]:
+    """Last processed id for the current EXTRACTION_VERSION (fresh state otherwise)."""
+    if reset:
+        return {"version": EXTRACTION_VERSION, "last_id": 0, "processed": 0}
+    try:
+        state = json.loads(path.read_text(encoding="utf-8"))
+        if state.get("version") == EXTRACTION_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"version": EXTRACTION_VERSION, "last_id": 0, "processed": 0}
+
+
+def save_checkpoint(path: Path, state: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, path)  # atomic — a crash never leaves a half-written checkpoint
+
+
+# ─────────────────────────────────────────────────────────────
+# Backfill
+# ─────────────────────────────────────────────────────────────
+
+def fetch_chunk(db, after_id: int, size: int, force: bool) -> List[Tuple[int, str]]:
+    query = db.query(SuratMasuk.id, SuratMasuk.ocr_text).filter(
+        SuratMasuk.id > after_id,
+        SuratMasuk.ocr_text != None,
+        SuratMasuk.deleted_at == None,
+    )
+    if not force:
+        query = query.filter(
+            or_(SuratMasuk.extraction_version == None, SuratMasuk.extraction_version != EXTRACTION_VERSION)
+        )
+    return query.order_by(SuratMasuk.id).limit(size).all()
+
+
+def write_chunk(db, ids: List[int], results: List[Dict[str, Any]]) -> None:
+    db.bulk_update_mappings(
+        SuratMasuk,
+        [
+            {"id": row_id, "extracted_fields": fields, "extraction_version": EXTRACTION_VERSION}
+            for row_id, fields in zip(ids, results)
+        ],
+    )
+    db.commit()
+
+
+def backfill(args: argparse.Namespace) -> int:
+    checkpoint = Path(args.checkpoint)
+    state = load_checkpoint(checkpoint, reset=args.reset)
+    if state["last_id"]:
+        print(f"↻ Resuming after id {state['last_id']} ({state['processed']} rows already done)")
+
+    workers = args.workers or os.cpu_count() or 1
+    db = SessionLocal()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    # One extra thread runs the extraction so fetching the next chunk overlaps it
+    runner = ThreadPoolExecutor(max_workers=1)
+    pending: Optional[Tuple[List[int], Future]] = None
+    started = time.perf_counter()
+    done_this_run = 0
+    fetched_until = state["last_id"]
+
+    try:
+        while True:
+            remaining = args.limit - done_this_run if args.limit else None
+            size = min(args.chunk_size, remaining) if remaining is not None else args.chunk_size
+            rows = fetch_chunk(db, fetched_until, size, args.force) if size > 0 else []
+
+            if pending is not None:
+                ids, future = pending
+                results = future.result()
+                if not args.dry_run:
+                    write_chunk(db, ids, results)
+                    state["last_id"] = ids[-1]
+                    state["processed"] += len(ids)
+                    save_checkpoint(checkpoint, state)
+                done_this_run += len(ids)
+                rate = done_this_run / max(time.perf_counter() - started, 1e-6)
+                print(f"  ✓ {done_this_run} rows (up to id {ids[-1]}), {rate:.0f} rows/s", flush=True)
+                pending = None
+
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            texts = [row.ocr_text for row in rows]
+            fetched_until = ids[-1]
+            pending = (ids, runner.submit(
+                extraction_service.extract_many, texts, pool, args.pool_chunk_size
+            ))
+    except KeyboardInterrupt:
+        db.rollback()
+        print(f"\n⚠️  Interrupted — resume later from id {state['last_id']}")
+        return 130
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Backfill failed after id {state['last_id']}: {e}")
+        return 1
+    finally:
+        runner.shutdown(wait=False, cancel_futures=True)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    suffix = " (dry run, nothing written)" if args.dry_run else ""
+    print(f"✅ Extracted {done_this_run} rows in {elapsed:.1f}s with {workers} worker(s){suffix}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-run field extraction over surat_masuk.ocr_text")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per DB read / bulk update")
+    parser.add_argument("--workers", type=int, default=0, help="extraction processes (0 = CPU count)")
+    parser.add_argument("--pool-chunk-size", type=int, default=64, help="texts per worker task")
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many rows (0 = all)")
+    parser.add_argument("--checkpoint", default=str(DEFAULT_CHECKPOINT), help="checkpoint file")
+    parser.add_argument("--reset", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--force", action="store_true", help="redo rows already at EXTRACTION_VERSION")
+    parser.add_argument("--dry-run", action="store_true", help="extract but do not write or checkpoint")
+    args = parser.parse_args(argv)
+
+    print(f"▶ Extraction backfill (rules v{EXTRACTION_VERSION})")
+    return backfill(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
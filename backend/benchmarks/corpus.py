@@ -0,0 +1,124 @@
+"""
+Benchmark corpus
+Loads corpus/manifest.json and generates the scanned variants of each
+reference document (cached under corpus/generated/, which is gitignored).
+
+Variants:
+  scan_200dpi     image-only PDF rasterised at 200 DPI (forces the OCR path)
+  scan_noisy      as above + Gaussian noise and a 0.7° skew (photocopy-like)
+  image_png       first page as a 200 DPI PNG (image upload path)
+  bundle_4_pages  scan_200dpi repeated to 4 pages (page-parallel OCR)
+"""
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+GENERATED_DIR = CORPUS_DIR / "generated"
+
+
+@dataclass
+class CorpusDocument:
+    name: str
+    path: Path
+    mime_type: str
+    expected: Dict[str, Optional[str]] = field(default_factory=dict)
+    variant: str = "original"
+
+
+def _mime_for(path: Path) -> str:
+    return {
+        ".pdf": "application/pdf",
+        ".png": "image/png",
+        ".jpg": "image/jpeg",
+        ".jpeg": "image/jpeg",
+    }.get(path.suffix.lower(), "application/octet-stream")
+
+
+def _rasterise(src: Path, dst: Path, dpi: int, noisy: bool = False, pages: int = 0) -> None:
+    """Render every page of `src` and write an image-only PDF to `dst`."""
+    import fitz  # PyMuPDF
+
+    out = fitz.open()
+    with fitz.open(src) as doc:
+        images = []
+        for page in doc:
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            png = _degrade(pix) if noisy else pix.tobytes("png")
+            images.append((page.rect, png))
+        if pages:
+            images = [images[i % len(images)] for i in range(pages)]
+        for rect, png in images:
+            new_page = out.new_page(width=rect.width, height=rect.height)
+            new_page.insert_image(new_page.rect, stream=png)
+    out.save(dst)
+    out.close()
+
+
+def _degrade(pix) -> bytes:
+    """Add sensor noise and a small skew to a grayscale pixmap; returns PNG bytes."""
+    import cv2
+    import numpy as np
+
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    rng = np.random.default_rng(42)  # deterministic so runs are comparable
+    noisy = np.clip(img.astype(np.int16) + rng.normal(0, 18, img.shape), 0, 255).astype(np.uint8)
+    h, w = noisy.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), 0.7, 1.0)
+    skewed = cv2.warpAffine(noisy, matrix, (w, h), borderValue=255)
+    ok, buf = cv2.imencode(".png", skewed)
+    return buf.tobytes()
+
+
+def _first_page_png(src: Path, dst: Path, dpi: int) -> None:
+    import fitz  # PyMuPDF
+
+    with fitz.open(src) as doc:
+        doc[0].get_pixmap(dpi=dpi).save(dst)
+
+
+def build_variant(src: Path, name: str, variant: str) -> Path:
+    """Create (once) and return the path of a generated variant."""
+    GENERATED_DIR.mkdir(parents=True, exist_ok=True)
+    suffix = ".png" if variant == "image_png" else ".pdf"
+    dst = GENERATED_DIR / f"{name}__{variant}{suffix}"
+    if dst.exists() and dst.stat().st_mtime >= src.stat().st_mtime:
+        return dst
+
+    if variant == "scan_200dpi":
+        _rasterise(src, dst, dpi=200)
+    elif variant == "scan_noisy":
+        _rasterise(src, dst, dpi=200, noisy=True)
+    elif variant == "image_png":
+        _first_page_png(src, dst, dpi=200)
+    elif variant == "bundle_4_pages":
+        _rasterise(src, dst, dpi=200, pages=4)
+    else:
+        raise ValueError(f"Unknown variant: {variant}")
+    return dst
+
+
+def load_corpus(manifest: Optional[Path] = None, with_variants: bool = True) -> List[CorpusDocument]:
+    """Reference documents from the manifest plus their generated variants."""
+    manifest = manifest or CORPUS_DIR / "manifest.json"
+    spec = json.loads(manifest.read_text(encoding="utf-8"))
+
+    docs: List[CorpusDocument] = []
+    for entry in spec["documents"]:
+        src = (manifest.parent / entry["file"]).resolve()
+        if not src.exists():
+            print(f"⚠️  Corpus file missing, skipped: {src}")
+            continue
+        expected = entry.get("expected", {})
+        docs.append(CorpusDocument(entry["name"], src, _mime_for(src), expected))
+
+        if with_variants:
+            for variant in entry.get("variants", []):
+                try:
+                    path = build_variant(src, entry["name"], variant)
+                except Exception as exc:
+                    print(f"⚠️  Could not build variant {variant} of {entry['name']}: {exc}")
+                    continue
+                docs.append(CorpusDocument(entry["name"], path, _mime_for(path), expected, variant))
+    return docs
@@ -0,0 +1,90 @@
+"""
+ExtractionService micro-benchmark.
+Run from the backend/ directory:
+    python -m benchmarks.run_extraction_benchmark [--repeat 20]
+
+Times extract_all() of the current service against the frozen pre-rewrite
+implementation (benchmarks/legacy_extraction.py) on synthetic OCR texts of
+growing size, and fails if the two ever return different fields.
+
+Texts (built from corpus/sample_letter.txt):
+  letter               one letter page
+  letter_x200          the letter repeated 200 times (fields found early)
+  body_<n>_pages       n pages of body text without any field — every
+                       pattern has to scan the whole text (the legacy
+                       penerima pattern is quadratic here, so n stays small)
+  body_then_letter     40 body pages followed by the letter
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.legacy_extraction import ExtractionService as LegacyExtractionService
+
+SAMPLE_LETTER = Path(__file__).parent / "corpus" / "sample_letter.txt"
+
+BODY_WORDS = (
+    "kegiatan pelaksanaan anggaran personel wilayah keamanan laporan terlampir "
+    "sebagaimana mestinya tersebut diatas untuk dapat dilaksanakan dengan penuh "
+    "rasa tanggung jawab serta melaporkan hasil pelaksanaannya kepada pimpinan"
+).split()
+LINES_PER_PAGE = 45
+
+
+def body_pages(pages: int, seed: int = 42) -> str:
+    rng = random.Random(seed)  # deterministic so runs are comparable
+    return "\n".join(
+        " ".join(rng.choice(BODY_WORDS) for _ in range(12)) for _ in range(pages * LINES_PER_PAGE)
+    )
+
+
+def build_texts() -> Dict[str, str]:
+    letter = SAMPLE_LETTER.read_text(encoding="utf-8")
+    return {
+        "letter": letter,
+        "letter_x200": letter * 200,
+        "body_10_pages": body_pages(10),
+        "body_40_pages": body_pages(40),
+        "body_then_letter": body_pages(40) + "\n" + letter,
+    }
+
+
+def time_ms(func: Callable[[str], object], text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ExtractionService.extract_all")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per text (best is reported)")
+    args = parser.parse_args(argv)
+
+    from app.services.extraction_service import ExtractionService
+
+    legacy, current = LegacyExtractionService(), ExtractionService()
+    failed = False
+
+    print(f"{'text':18} {'chars':>9} {'legacy ms':>10} {'current ms':>11} {'speedup':>8}")
+    for name, text in build_texts().items():
+        if legacy.extract_all(text) != current.extract_all(text):
+            print(f"❌ {name}: output differs from the legacy implementation")
+            failed = True
+            continue
+        # Small texts need many more runs for a stable number
+        repeat = args.repeat * 50 if len(text) < 10_000 else args.repeat
+        old_ms = time_ms(legacy.extract_all, text, repeat)
+        new_ms = time_ms(current.extract_all, text, repeat)
+        print(f"{name:18} {len(text):>9} {old_ms:>10.3f} {new_ms:>11.3f} {old_ms / new_ms:>7.2f}×")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+OCR + extraction benchmark.
+Run from the backend/ directory:
+    python -m benchmarks.run_ocr_benchmark [--repeat 3] [--compare results/old.json]
+
+For every corpus document (see benchmarks/corpus.py) it measures:
+  - per-stage wall time (text layer, render, preprocess, tesseract,
+    keywords, extract_all), profiled sequentially on one core
+  - end-to-end OCRService.process_file time with the real pipeline
+    (page pool, adaptive DPI) and pages/second
+  - field-detection accuracy against the manifest's expected values
+  - peak RSS of this process and of the OCR worker processes
+Results are written as JSON to benchmarks/results/ so runs can be diffed
+across commits with --compare.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import CorpusDocument, load_corpus
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+# ─────────────────────────────────────────────────────────────
+# Measurement helpers
+# ─────────────────────────────────────────────────────────────
+
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """Peak resident set size of this process and its (OCR worker) children."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"self": None, "children": None}
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    div = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / div, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / div, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def _norm(value: Optional[str]) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+def score_fields(detected: Dict[str, dict], expected: Dict[str, Optional[str]]) -> Dict[str, bool]:
+    """
+    A field is correct when the expected value (normalised) is contained in
+    the detected one, or — for an expected null — when nothing was detected.
+    """
+    scores = {}
+    for key, want in expected.items():
+        got = detected.get(key, {})
+        if want is None:
+            scores[key] = not got.get("detected")
+        else:
+            scores[key] = bool(got.get("detected")) and _norm(want) in _norm(got.get("value"))
+    return scores
+
+
+# ─────────────────────────────────────────────────────────────
+# Stage profile (sequential, single core)
+# ─────────────────────────────────────────────────────────────
+
+def profile_stages(doc: CorpusDocument) -> Dict[str, float]:
+    """Time each pipeline stage separately for one document (ms)."""
+    from PIL import Image
+
+    from app.core.config import settings
+    from app.services import image_preprocess
+    from app.services.extraction_service import extraction_service
+    from app.services.ocr_engine import recognize
+    from app.services.ocr_service import ocr_service
+
+    stages: Dict[str, float] = defaultdict(float)
+    texts: List[str] = []
+
+    def timed(stage: str, func, *args):
+        started = time.perf_counter()
+        value = func(*args)
+        stages[stage] += (time.perf_counter() - started) * 1000
+        return value
+
+    if doc.mime_type == "application/pdf":
+        import fitz  # PyMuPDF
+
+        digital = timed("text_layer", ocr_service._pdf_digital_pages, str(doc.path))
+        dpi = settings.OCR_BASE_DPI if settings.OCR_ADAPTIVE_DPI else settings.OCR_MAX_DPI
+        with fitz.open(doc.path) as pdf:
+            for i, page_text in enumerate(digital):
+                if len(page_text.strip()) >= settings.PDF_TEXT_LAYER_MIN_CHARS:
+                    texts.append(page_text)
+                    continue
+                pix = timed("render", lambda: pdf[i].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY))
+                prepared = timed(
+                    "preprocess", image_preprocess.preprocess_array, image_preprocess.pixmap_to_array(pix)
+                )
+                texts.append(timed("tesseract", recognize, prepared.image)["text"])
+    else:
+        img = timed("render", lambda: Image.open(doc.path).convert("RGB"))
+        prepared = timed("preprocess", image_preprocess.preprocess, img)
+        texts.append(timed("tesseract", recognize, prepared.image)["text"])
+
+    text = "\n".join(texts)
+    timed("keywords", ocr_service.extract_keywords, text)
+    timed("extraction", extraction_service.extract_all, text)
+    return {k: round(v, 2) for k, v in stages.items()}
+
+
+# ─────────────────────────────────────────────────────────────
+# End-to-end run
+# ─────────────────────────────────────────────────────────────
+
+def run_document(doc: CorpusDocument, repeat: int) -> Dict[str, object]:
+    from app.services.extraction_service import extraction_service
+    from app.services.ocr_service import ocr_service
+
+    wall_ms: List[float] = []
+    result: Dict[str, object] = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = ocr_service.process_file(str(doc.path), doc.mime_type)
+        wall_ms.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    detected = extraction_service.extract_all(result.get("text", ""))
+    extract_ms = (time.perf_counter() - started) * 1000
+
+    pages = result.get("pages") or []
+    median_ms = statistics.median(wall_ms)
+    scores = score_fields(detected, doc.expected)
+    return {
+        "name": doc.name,
+        "variant": doc.variant,
+        "file": doc.path.name,
+        "pages": len(pages),
+        "ocr_pages": sum(1 for p in pages if p.get("source") == "ocr"),
+        "ocr_confidence": result.get("confidence"),
+        "process_file_ms": {
+            "median": round(median_ms, 2),
+            "min": round(min(wall_ms), 2),
+            "max": round(max(wall_ms), 2),
+        },
+        "extract_all_ms": round(extract_ms, 2),
+        "pages_per_second": round(len(pages) / (median_ms / 1000), 3) if pages and median_ms else 0.0,
+        "stages_ms": profile_stages(doc),
+        "fields": scores,
+        "accuracy": round(sum(scores.values()) / len(scores), 3) if scores else None,
+    }
+
+
+def summarise(documents: List[Dict[str, object]]) -> Dict[str, object]:
+    total_pages = sum(d["pages"] for d in documents)
+    total_s = sum(d["process_file_ms"]["median"] for d in documents) / 1000
+    stages: Dict[str, float] = defaultdict(float)
+    for d in documents:
+        for stage, ms in d["stages_ms"].items():
+            stages[stage] += ms
+    field_scores = [ok for d in documents for ok in d["fields"].values()]
+    return {
+        "documents": len(documents),
+        "pages": total_pages,
+        "process_file_s": round(total_s, 3),
+        "pages_per_second": round(total_pages / total_s, 3) if total_s else 0.0,
+        "stages_ms": {k: round(v, 2) for k, v in stages.items()},
+        "field_accuracy": round(sum(field_scores) / len(field_scores), 3) if field_scores else None,
+    }
+
+
+def compare(current: Dict[str, object], previous_path: Path) -> None:
+    """Print summary deltas against an earlier result file."""
+    previous = json.loads(previous_path.read_text(encoding="utf-8"))
+    cur, prev = current["summary"], previous["summary"]
+    print(f"\nCompared with {previous_path.name} (commit {previous.get('commit')}):")
+    for key in ("process_file_s", "pages_per_second", "field_accuracy"):
+        a, b = prev.get(key), cur.get(key)
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) and a:
+            print(f"  {key:18} {a:>10} → {b:<10} ({(b - a) / a * 100:+.1f}%)")
+        else:
+            print(f"  {key:18} {a} → {b}")
+    for stage in sorted(set(prev["stages_ms"]) | set(cur["stages_ms"])):
+        a, b = prev["stages_ms"].get(stage), cur["stages_ms"].get(stage)
+        print(f"  stage {stage:12} {a} → {b} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the OCR + extraction pipeline")
+    parser.add_argument("--repeat", type=int, default=3, help="process_file runs per document")
+    parser.add_argument("--manifest", type=Path, default=None, help="alternative corpus manifest")
+    parser.add_argument("--no-variants", action="store_true", help="skip generated scan variants")
+    parser.add_argument("--output", type=Path, default=None, help="result JSON path")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier result JSON to diff against")
+    args = parser.parse_args(argv)
+
+    from app.services.ocr_cache import ocr_cache
+    from app.services.ocr_engine import page_ocr, settings_fingerprint
+
+    # Measure the pipeline, not the cache
+    ocr_cache.enabled = False
+
+    corpus = load_corpus(args.manifest, with_variants=not args.no_variants)
+    if not corpus:
+        print("❌ Empty corpus")
+        return 1
+
+    page_ocr.start()
+    documents = []
+    try:
+        for doc in corpus:
+            print(f"▶ {doc.name} [{doc.variant}] …", flush=True)
+            row = run_document(doc, args.repeat)
+            print(
+                f"  {row['pages']} page(s), {row['process_file_ms']['median']} ms, "
+                f"{row['pages_per_second']} pages/s, accuracy {row['accuracy']}"
+            )
+            documents.append(row)
+    finally:
+        page_ocr.shutdown()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ocr_settings": settings_fingerprint(),
+        "ocr_engine": page_ocr.stats(),
+        "peak_rss_mb": peak_rss_mb(),
+        "summary": summarise(documents),
+        "documents": documents,
+    }
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}_{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n✅ Results written to {output}")
+    print(json.dumps(report["summary"], indent=2))
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Content-addressed letter storage maintenance
+Letters are stored once per SHA-256 under STORAGE_DIR/blobs (see
+file_service / blob_service). Run from the backend/ directory:
+
+Usage:
+    python blob_storage.py migrate                 # convert legacy file_path values
+    python blob_storage.py migrate --dry-run       # only report what would change
+    python blob_storage.py gc                      # remove unreferenced blobs
+    python blob_storage.py gc --min-age-hours 0 --dry-run
+
+migrate walks surat_masuk and surat_keluar in id order and, for every
+file_path still in the old dated UUID layout, hashes the file, places it
+at its blob path (hard link, or copy across filesystems), points every
+record, job and upload session with that path at the blob, and adds the
+record's reference (soft-deleted records too). Legacy files are only
+removed after their batch is committed, so an interrupted run loses
+nothing; rows already on blobs are skipped, so just run it again.
+Identical files collapse into one blob — the report shows the space freed.
+
+gc removes blobs without references once untouched for
+BLOB_ORPHAN_TTL_HOURS (uploads detected but never confirmed). Schedule
+it e.g. daily from cron; do not run it during migrate.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.models.ocr_job import OcrJob
+from app.models.surat_keluar import SuratKeluar
+from app.models.surat_masuk import SuratMasuk
+from app.models.upload_session import UploadSession
+from app.services.blob_service import blob_service
+from app.services.file_service import file_service
+from app.services.ocr_cache import sha256_file
+
+SURAT_TABLES = (("surat_masuk", SuratMasuk), ("surat_keluar", SuratKeluar))
+
+
+def _mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f}MB"
+
+
+# ─────────────────────────────────────────────────────────────
+# Migrate
+# ─────────────────────────────────────────────────────────────
+
+def repoint(db, old_path: str, new_path: str) -> None:
+    """Every row that stores `old_path` follows the file to its blob."""
+    for _, model in SURAT_TABLES:
+        db.query(model).filter(model.file_path == old_path).update(
+            {"file_path": new_path}, synchronize_session=False
+        )
+    for model in (OcrJob, UploadSession):
+        db.query(model).filter(model.file_path == old_path).update(
+            {"file_path": new_path}, synchronize_session=False
+        )
+
+
+def migrate_table(
+    db, kind: str, model, args: argparse.Namespace, moved: Dict[str, str], stats: Dict[str, int]
+) -> None:
+    """Convert one surat table in batches of --batch-size rows."""
+    last_id = 0
+    seen = set()  # Hashes met in this run (dry run: duplicates within the legacy files)
+    while True:
+        rows = (
+            db.query(model.id, model.file_path)
+            .filter(model.id > last_id)
+            .order_by(model.id)
+            .limit(args.batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        converted: List[Path] = []  # Legacy files to remove once the batch is committed
+        for row in rows:
+            path = moved.get(row.file_path, row.file_path)
+            if file_service.blob_sha256(path) is None:
+                legacy = Path(path)
+                if not legacy.is_file():
+                    stats["missing"] += 1
+                    print(f"  ⚠️  {kind} #{row.id}: file not found: {path}")
+                    continue
+                sha256 = sha256_file(str(legacy))
+                size = legacy.stat().st_size
+                if sha256 in seen or file_service.blob_path(sha256, legacy.name).exists():
+                    stats["deduplicated"] += 1
+                    stats["bytes_freed"] += size
+                seen.add(sha256)
+                stats["converted"] += 1
+                if args.dry_run:
+                    continue
+                new_path = file_service.link_into_storage(legacy, sha256, kind)
+                repoint(db, path, new_path)
+                moved[path] = new_path
+                converted.append(legacy)
+                path = new_path
+            if not args.dry_run:
+                blob_service.acquire(db, kind, row.id, path)
+        if not args.dry_run:
+            db.commit()
+            for legacy in converted:
+                try:
+                    legacy.unlink()
+                except FileNotFoundError:
+                    pass
+        last_id = rows[-1].id
+        stats["rows"] += len(rows)
+        print(f"  ✓ {kind}: up to id {last_id} ({stats['converted']} file(s) converted)", flush=True)
+
+
+def migrate(args: argparse.Namespace) -> int:
+    stats = {"rows": 0, "converted": 0, "deduplicated": 0, "missing": 0, "bytes_freed": 0}
+    moved: Dict[str, str] = {}
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        for kind, model in SURAT_TABLES:
+            migrate_table(db, kind, model, args, moved, stats)
+    except KeyboardInterrupt:
+        db.rollback()
+        print("\n⚠️  Interrupted — run again to continue (converted rows are skipped)")
+        return 130
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Migration failed: {e}")
+        return 1
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    suffix = " (dry run, nothing written)" if args.dry_run else ""
+    print(
+        f"✅ {stats['rows']} rows checked in {elapsed:.1f}s: {stats['converted']} file(s) converted, "
+        f"{stats['deduplicated']} duplicate(s) merged ({_mb(stats['bytes_freed'])} freed), "
+        f"{stats['missing']} missing{suffix}"
+    )
+    return 0
+
+
+# ─────────────────────────────────────────────────────────────
+# Garbage collection
+# ─────────────────────────────────────────────────────────────
+
+def gc(args: argparse.Namespace) -> int:
+    try:
+        stats = blob_service.collect_garbage(args.min_age_hours, dry_run=args.dry_run)
+    except Exception as e:
+        print(f"❌ Garbage collection failed: {e}")
+        return 1
+    suffix = " (dry run, nothing removed)" if args.dry_run else ""
+    print(
+        f"✅ {stats['scanned']} blob(s) scanned, "
+        f"{stats['removed']} unreferenced removed ({_mb(stats['bytes'])}){suffix}"
+    )
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the content-addressed letter storage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser("migrate", help="move legacy file_path values to blobs")
+    migrate_parser.add_argument("--batch-size", type=int, default=500, help="rows per commit")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="hash and report, change nothing")
+    migrate_parser.set_defaults(run=migrate)
+
+    gc_parser = commands.add_parser("gc", help="remove blobs no record references")
+    gc_parser.add_argument("--min-age-hours", type=float, default=None, help="default BLOB_ORPHAN_TTL_HOURS")
+    gc_parser.add_argument("--dry-run", action="store_true", help="report what would be removed")
+    gc_parser.set_defaults(run=gc)
+
+    args = parser.parse_args(argv)
+    print(f"▶ Blob storage: {args.command}")
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,7 +17,7 @@ load_dotenv()
 
 API_KEY = os.getenv("OPENROUTER_API_KEY", "")
 MODEL   = os.getenv("OPENROUTER_MODEL", "z-ai/glm-4.5-air:free")
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
+API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
 
 if not API_KEY:
     print("ERROR: OPENROUTER_API_KEY not set in .env")
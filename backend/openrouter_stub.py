@@ -0,0 +1,204 @@
+"""
+Local OpenRouter stub for testing the AI extraction path without the
+real provider (rate limits, retries, circuit breaker, payload sizes).
+Run from the backend/ directory:
+    python openrouter_stub.py [--port 8099] [--script 429,503,200] [--delay 0.5]
+
+then point the backend at it in .env:
+    OPENROUTER_API_URL=http://127.0.0.1:8099/api/v1/chat/completions
+    OPENROUTER_API_KEY=stub
+
+Each POST takes the next status code from --script; once the script is used
+up every request gets --then (default 200). A 200 carries a fixed letter as
+the model's JSON answer. GET /stats returns the requests seen so far, and
+POST /script replaces the remaining script, e.g.
+    curl -X POST -d '503,503,503,503,503' http://127.0.0.1:8099/script
+
+In tests, use StubServer directly and patch the service instance: it copies
+the URL and key out of settings when it is created, and its pooled clients
+keep the key in their headers, so patch before its first call:
+    from unittest import mock
+    from app.services.ai_cache import ai_cache
+    from app.services.ai_extraction_service import ai_extraction_service as ai
+
+    with StubServer(script=[429, 200]) as stub, \\
+            mock.patch.object(ai, "api_url", stub.url), \\
+            mock.patch.object(ai, "api_key", "stub"), \\
+            mock.patch.object(ai_cache, "enabled", False):  # A cached answer never reaches the stub
+        ...
+        assert stub.stats()["requests"] == 2
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+
+SAMPLE_ANSWER = {
+    "nomor_surat": "B/123/IV/2024",
+    "tanggal_surat": "2024-04-19",
+    "pengirim": "Kepolisian Resor Contoh",
+    "penerima": "Kapolda Contoh",
+    "perihal": "Undangan rapat koordinasi",
+    "isi_singkat": "Undangan rapat koordinasi pengamanan kegiatan.",
+}
+
+ERROR_MESSAGES = {
+    429: "Rate limit exceeded (stub)",
+    500: "Internal server error (stub)",
+    502: "Bad gateway (stub)",
+    503: "Provider overloaded (stub)",
+    504: "Upstream timeout (stub)",
+}
+
+
+class StubServer:
+    """OpenAI-compatible chat completions endpoint with scripted status codes."""
+
+    def __init__(
+        self,
+        script: Iterable[int] = (),
+        then: int = 200,
+        delay: float = 0.0,
+        retry_after: Optional[float] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.then = then
+        self.delay = delay
+        self.retry_after = retry_after
+        self._script = deque(script)
+        self._lock = threading.Lock()
+        self._requests: List[Dict[str, object]] = []
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1/chat/completions"
+
+    def set_script(self, script: Iterable[int]) -> None:
+        with self._lock:
+            self._script = deque(script)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            statuses: Dict[str, int] = {}
+            for req in self._requests:
+                statuses[str(req["status"])] = statuses.get(str(req["status"]), 0) + 1
+            return {
+                "requests": len(self._requests),
+                "statuses": statuses,
+                "bytes_received": sum(req["bytes"] for req in self._requests),
+                "remaining_script": list(self._script),
+            }
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ─────────────────────────────────────────────────────────────
+    # HTTP handling
+    # ─────────────────────────────────────────────────────────────
+
+    def _next_status(self, size: int) -> int:
+        with self._lock:
+            status = self._script.popleft() if self._script else self.then
+            self._requests.append({"status": status, "bytes": size, "at": time.time()})
+            return status
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):  # Keep test output quiet
+                pass
+
+            def _send(self, status: int, body: dict, headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._send(200, stub.stats())
+                else:
+                    self._send(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                if self.path.rstrip("/") == "/script":
+                    codes = [int(c) for c in body.decode().replace(" ", "").split(",") if c]
+                    stub.set_script(codes)
+                    self._send(200, {"script": codes})
+                    return
+
+                status = stub._next_status(len(body))
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if status == 200:
+                    self._send(200, {
+                        "id": "stub",
+                        "model": "stub",
+                        "choices": [{
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": json.dumps(SAMPLE_ANSWER)},
+                        }],
+                    })
+                    return
+                headers = {}
+                if status == 429 and stub.retry_after is not None:
+                    headers["Retry-After"] = f"{stub.retry_after:g}"
+                message = ERROR_MESSAGES.get(status, f"HTTP {status} (stub)")
+                self._send(status, {"error": {"code": status, "message": message}}, headers)
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local OpenRouter stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--script", default="", help="comma-separated status codes, e.g. 429,503,200")
+    parser.add_argument("--then", type=int, default=200, help="status once the script is used up")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After header on 429")
+    args = parser.parse_args(argv)
+
+    script = [int(c) for c in args.script.split(",") if c.strip()]
+    stub = StubServer(script, args.then, args.delay, args.retry_after, args.host, args.port)
+    print(f"✅ OpenRouter stub listening on {stub.url}")
+    print(f"   script: {script or '-'} then {args.then}, delay {args.delay}s")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stub stopped")
+    finally:
+        stub._server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""
+Watch-folder ingestion daemon
+Registers the PDFs/images that network copiers save to a shared folder as
+draft surat masuk (status "draft") for a clerk to review, instead of each
+scan being uploaded by hand. Run from the backend/ directory:
+
+Usage:
+    python watch_folder.py /mnt/scans                 # or WATCH_FOLDER_DIR in .env
+    python watch_folder.py /mnt/scans --workers 4 --method hybrid --user admin
+    python watch_folder.py /mnt/scans --poll          # force the polling watcher
+
+Changes are picked up with inotify (through watchfiles, which comes with
+uvicorn[standard]); without it the folder is scanned every
+WATCH_POLL_INTERVAL seconds. A file is taken once its size and mtime have
+not changed for WATCH_SETTLE_SECONDS, since copiers write in pieces. Then,
+on a pool of WATCH_WORKERS threads, each scan is:
+  1. hashed and looked up in the ledger — content seen before is moved to
+     _duplicates/ instead of being registered twice
+  2. moved into the letter storage (STORAGE_DIR/blobs, one file per content)
+  3. recorded as a draft surat_masuk row
+  4. OCR'd, with the detected fields written into the draft
+Files that cannot be ingested go to _failed/ with a .error.txt beside them.
+The ledger (STORAGE_DIR/watch_folder.json) maps content hashes to drafts,
+so a restart never registers a scan twice.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.database import SessionLocal
+from app.models.surat_masuk import StatusSurat, SuratMasuk
+from app.models.user import User
+from app.services.blob_service import blob_service
+from app.services.detection_service import DETECT_METHODS, detection_service
+from app.services.file_service import StoredUpload, file_service
+from app.services.ocr_cache import sha256_file
+from app.services.ocr_engine import page_ocr
+from app.tasks.bulk_ingest import build_row
+
+try:
+    from watchfiles import Change, watch
+except ImportError:  # Polling fallback
+    watch = None
+
+DEFAULT_LEDGER = Path(settings.STORAGE_DIR) / "watch_folder.json"
+DUPLICATES_DIR = "_duplicates"
+FAILED_DIR = "_failed"
+
+# Files still being written by the copier or another tool
+TEMP_SUFFIXES = (".tmp", ".part", ".crdownload", ".partial")
+
+
+def is_candidate(path: Path) -> bool:
+    return not path.name.startswith((".", "~")) and not path.name.lower().endswith(TEMP_SUFFIXES)
+
+
+# ─────────────────────────────────────────────────────────────
+# Ledger
+# ─────────────────────────────────────────────────────────────
+
+class Ledger:
+    """Content hash → draft created for it, saved atomically after each change."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._entries: Dict[str, Dict[str, Any]] = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def claim(self, sha256: str, source: str) -> Optional[Dict[str, Any]]:
+        """Reserve a hash for ingestion; returns the existing entry if it is already taken."""
+        with self._lock:
+            if sha256 in self._entries:
+                return self._entries[sha256]
+            self._entries[sha256] = {"source": source, "status": "pending"}
+            return None
+
+    def release(self, sha256: str) -> None:
+        with self._lock:
+            self._entries.pop(sha256, None)
+
+    def record(self, sha256: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[sha256] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            done = {key: value for key, value in self._entries.items() if value.get("status") != "pending"}
+            tmp.write_text(json.dumps(done, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)  # atomic — a crash never leaves a half-written ledger
+
+
+# ─────────────────────────────────────────────────────────────
+# Settling: wait until a file has stopped growing
+# ─────────────────────────────────────────────────────────────
+
+class Settler:
+    """Candidate files with their last (size, mtime) and since when it has not changed."""
+
+    def __init__(self, settle_seconds: float):
+        self.settle_seconds = settle_seconds
+        self._files: Dict[Path, Tuple[int, float, float]] = {}
+
+    def touch(self, path: Path) -> None:
+        if path not in self._files:
+            self._files[path] = (-1, 0.0, time.monotonic())
+
+    def ready(self, limit: int) -> List[Path]:
+        """Up to `limit` files unchanged for settle_seconds; they stop being tracked."""
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime, since) in list(self._files.items()):
+            try:
+                stat = path.stat()
+            except OSError:
+                del self._files[path]  # Gone (moved away or deleted)
+                continue
+            if (stat.st_size, stat.st_mtime) != (size, mtime):
+                self._files[path] = (stat.st_size, stat.st_mtime, now)
+            elif stat.st_size > 0 and now - since >= self.settle_seconds and len(ready) < limit:
+                del self._files[path]
+                ready.append(path)
+        return ready
+
+
+# ─────────────────────────────────────────────────────────────
+# Ingestion
+# ─────────────────────────────────────────────────────────────
+
+class WatchFolder:
+    def __init__(self, folder: Path, ledger: Ledger, user_id: int, method: str, workers: int):
+        self.folder = folder
+        self.ledger = ledger
+        self.user_id = user_id
+        self.method = method
+        self.workers = max(1, workers)
+        self.settler = Settler(settings.WATCH_SETTLE_SECONDS)
+        self.stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="watch-ingest")
+        self._in_flight: Set[Path] = set()
+        self._lock = threading.Lock()
+        self.counts = {"created": 0, "duplicate": 0, "failed": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def _set_aside(self, path: Path, subdir: str, error: Optional[str] = None) -> None:
+        target_dir = self.folder / subdir
+        target_dir.mkdir(exist_ok=True)
+        target = target_dir / path.name
+        if target.exists():
+            target = target_dir / f"{path.stem}-{datetime.now():%Y%m%d%H%M%S}{path.suffix}"
+        try:
+            os.replace(path, target)
+        except OSError as exc:
+            print(f"❌ Could not move {path.name} to {subdir}/: {exc}")
+            return
+        if error:
+            target.with_name(target.name + ".error.txt").write_text(error + "\n", encoding="utf-8")
+
+    def _create_draft(self, stored: StoredUpload, name: str) -> Tuple[int, str]:
+        row, _ = build_row(stored, name, {}, {}, self._options(), self.user_id)
+        db = SessionLocal()
+        try:
+            surat = SuratMasuk(**row, status=StatusSurat.DRAFT)
+            db.add(surat)
+            db.flush()
+            blob_service.acquire(db, "surat_masuk", surat.id, stored.file_path)
+            db.commit()
+            return surat.id, surat.nomor_surat
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _fill_draft(self, surat_id: int, stored: StoredUpload, name: str, result: Dict[str, Any]) -> List[str]:
+        """Write OCR text and detected fields into a draft nobody has reviewed yet."""
+        row, missing = build_row(stored, name, result, {}, self._options(), self.user_id)
+        keep = ("tanggal_terima", "priority", "kategori_id", "created_by", "original_filename")
+        keep += tuple(field for field in ("nomor_surat",) if field in missing)  # Keep the draft's placeholder
+        values = {key: value for key, value in row.items() if key not in keep and not key.startswith("file_")}
+        db = SessionLocal()
+        try:
+            db.query(SuratMasuk).filter(
+                SuratMasuk.id == surat_id, SuratMasuk.status == StatusSurat.DRAFT
+            ).update(values, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return missing
+
+    @staticmethod
+    def _options() -> Dict[str, Any]:
+        return {"tanggal_terima": date.today().isoformat(), "priority": "sedang"}
+
+    def ingest(self, path: Path) -> None:
+        name = path.name
+        sha256 = None
+        try:
+            file_service.validate_filename(name)
+            sha256 = sha256_file(str(path))
+            known = self.ledger.claim(sha256, name)
+            if known is not None:
+                sha256 = None  # Not ours to release
+                self._set_aside(path, DUPLICATES_DIR)
+                self._count("duplicate")
+                print(f"↩️  {name}: already registered (surat masuk #{known.get('surat_id', '?')})")
+                return
+            stored = file_service.move_into_storage(path, name, "surat_masuk", date.today())
+            surat_id, nomor = self._create_draft(stored, name)
+            self.ledger.record(sha256, {
+                "source": name, "surat_id": surat_id, "file_path": stored.file_path,
+                "ingested_at": datetime.now().isoformat(timespec="seconds"),
+            })
+        except Exception as exc:
+            if sha256:
+                self.ledger.release(sha256)
+            detail = exc.detail if isinstance(exc, HTTPException) else str(exc)
+            if path.exists():
+                self._set_aside(path, FAILED_DIR, str(detail))
+            self._count("failed")
+            print(f"❌ {name}: {detail}")
+            return
+
+        self._count("created")
+        try:
+            result = detection_service.run(
+                "surat_masuk", stored.file_path, stored.mime_type, self.method, file_hash=stored.sha256
+            )
+            missing = self._fill_draft(surat_id, stored, name, result)
+        except Exception as exc:
+            print(f"⚠️  {name}: draft #{surat_id} created, OCR/extraction failed: {exc}")
+            return
+        note = f" — to fill in: {', '.join(missing)}" if missing else ""
+        print(f"✅ {name}: draft #{surat_id} ({nomor}){note}")
+
+    # ── Watching ──────────────────────────────────────────────────────────────
+    def scan(self) -> None:
+        """Track every candidate file currently in the folder."""
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and is_candidate(Path(entry.path)):
+                self.settler.touch(Path(entry.path))
+
+    def _done(self, path: Path) -> None:
+        with self._lock:
+            self._in_flight.discard(path)
+
+    def dispatch(self) -> None:
+        """Hand settled files to the pool, never more than 2×workers at once."""
+        with self._lock:
+            room = 2 * self.workers - len(self._in_flight)
+        for path in self.settler.ready(max(0, room)):
+            with self._lock:
+                if path in self._in_flight:
+                    continue
+                self._in_flight.add(path)
+            future = self._pool.submit(self.ingest, path)
+            future.add_done_callback(lambda _, path=path: self._done(path))
+
+    def run(self, force_poll: bool = False) -> None:
+        self.scan()  # Files that arrived while the daemon was down
+        if watch is not None and not force_poll:
+            print(f"👀 Watching {self.folder} (inotify)")
+            for changes in watch(
+                self.folder, watch_filter=None, recursive=False, stop_event=self.stop,
+                yield_on_timeout=True, rust_timeout=1000, raise_interrupt=False,
+            ):
+                for change, changed in changes:
+                    path = Path(changed)
+                    if change != Change.deleted and path.parent == self.folder and is_candidate(path):
+                        self.settler.touch(path)
+                self.dispatch()
+        else:
+            print(f"👀 Watching {self.folder} (polling every {settings.WATCH_POLL_INTERVAL:g}s)")
+            while not self.stop.is_set():
+                self.scan()
+                self.dispatch()
+                self.stop.wait(settings.WATCH_POLL_INTERVAL)
+
+    def shutdown(self) -> None:
+        """Finish the scans already being processed."""
+        self._pool.shutdown(wait=True)
+
+
+def resolve_user(username: str) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == username, User.is_active == True).first()
+        return user.id if user else None
+    finally:
+        db.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Register scans dropped in a folder as draft surat masuk")
+    parser.add_argument("folder", nargs="?", default=settings.WATCH_FOLDER_DIR, help="folder to watch")
+    parser.add_argument("--workers", type=int, default=settings.WATCH_WORKERS, help="scans processed in parallel")
+    parser.add_argument("--method", default=settings.WATCH_METHOD, choices=DETECT_METHODS, help="detection method")
+    parser.add_argument("--user", default="admin", help="username recorded as creator of the drafts")
+    parser.add_argument("--ledger", default=str(DEFAULT_LEDGER), help="ledger of ingested content hashes")
+    parser.add_argument("--poll", action="store_true", help="poll the folder instead of using inotify")
+    args = parser.parse_args(argv)
+
+    if not args.folder:
+        print("❌ No folder given (argument or WATCH_FOLDER_DIR)")
+        return 2
+    folder = Path(args.folder).resolve()
+    if not folder.is_dir():
+        print(f"❌ Not a directory: {folder}")
+        return 2
+    user_id = resolve_user(args.user)
+    if user_id is None:
+        print(f"❌ Active user '{args.user}' not found")
+        return 2
+
+    daemon = WatchFolder(folder, Ledger(Path(args.ledger)), user_id, args.method, args.workers)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: daemon.stop.set())
+
+    print(f"▶ Watch-folder ingestion: {args.workers} worker(s), method {args.method}, drafts by {args.user}")
+    page_ocr.start()
+    try:
+        daemon.run(force_poll=args.poll)
+    finally:
+        print("🛑 Stopping — finishing scans in progress...")
+        daemon.shutdown()
+        page_ocr.shutdown()
+    counts = daemon.counts
+    print(f"✅ Done: {counts['created']} draft(s), {counts['duplicate']} duplicate(s), {counts['failed']} failed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
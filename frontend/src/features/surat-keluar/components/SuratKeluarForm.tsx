@@ -181,6 +181,8 @@ export function SuratKeluarForm() {
                 priority: values.priority,
                 ocr_text: detectResult?.ocr_text || undefined,
                 ocr_confidence: detectResult?.ocr_confidence ?? undefined,
+                fulltext_job_id: detectResult?.fulltext_job_id,
+                enrich_job_id: detectResult?.enrich_job_id,
             })
             toast.success("Surat keluar berhasil disimpan! Nomor surat di-generate otomatis.")
             navigate("/surat-keluar")
@@ -197,6 +197,8 @@ export function SuratMasukForm() {
                 priority: values.priority,
                 ocr_text: detectResult?.ocr_text || undefined,
                 ocr_confidence: detectResult?.ocr_confidence ?? undefined,
+                fulltext_job_id: detectResult?.fulltext_job_id,
+                enrich_job_id: detectResult?.enrich_job_id,
             })
             toast.success("Surat masuk berhasil disimpan!")
             navigate("/surat-masuk")
@@ -27,6 +27,9 @@ export interface DetectKeluarResult {
     };
     /** Present when AI extraction returned an error (e.g. 401, 429) */
     ai_error?: { code: number; message: string };
+    /** Jobs still finishing the result; pass them on to confirm() */
+    fulltext_job_id?: string;
+    enrich_job_id?: string;
 }
 
 export interface ConfirmSuratKeluarPayload {
@@ -40,6 +43,8 @@ export interface ConfirmSuratKeluarPayload {
     priority?: string;
     ocr_text?: string;
     ocr_confidence?: number;
+    fulltext_job_id?: string;
+    enrich_job_id?: string;
 }
 
 export const suratKeluarService = {
@@ -79,6 +84,8 @@ export const suratKeluarService = {
         if (payload.priority) formData.append('priority', payload.priority);
         if (payload.ocr_text) formData.append('ocr_text', payload.ocr_text);
         if (payload.ocr_confidence != null) formData.append('ocr_confidence', payload.ocr_confidence.toString());
+        if (payload.fulltext_job_id) formData.append('fulltext_job_id', payload.fulltext_job_id);
+        if (payload.enrich_job_id) formData.append('enrich_job_id', payload.enrich_job_id);
         const response = await api.post<SuratKeluar>('/surat-keluar', formData, {
             headers: { 'Content-Type': 'multipart/form-data' }
         });
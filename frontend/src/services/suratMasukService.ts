@@ -29,6 +29,9 @@ export interface DetectResult {
     };
     /** Present when AI extraction returned an error (e.g. 401, 429) */
     ai_error?: { code: number; message: string };
+    /** Jobs still finishing the result; pass them on to confirm() */
+    fulltext_job_id?: string;
+    enrich_job_id?: string;
 }
 
 export interface ConfirmSuratMasukPayload {
@@ -43,6 +46,8 @@ export interface ConfirmSuratMasukPayload {
     priority?: string;
     ocr_text?: string;
     ocr_confidence?: number;
+    fulltext_job_id?: string;
+    enrich_job_id?: string;
 }
 
 export const suratMasukService = {
@@ -91,6 +96,8 @@ export const suratMasukService = {
         if (payload.priority) formData.append('priority', payload.priority);
         if (payload.ocr_text) formData.append('ocr_text', payload.ocr_text);
         if (payload.ocr_confidence != null) formData.append('ocr_confidence', payload.ocr_confidence.toString());
+        if (payload.fulltext_job_id) formData.append('fulltext_job_id', payload.fulltext_job_id);
+        if (payload.enrich_job_id) formData.append('enrich_job_id', payload.enrich_job_id);
         const response = await api.post<SuratMasuk>('/surat-masuk', formData, {
             headers: { 'Content-Type': 'multipart/form-data' }
         });